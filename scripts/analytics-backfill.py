@@ -0,0 +1,91 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Analytics Backfill Tool for PRTD
+Pulls long GA4 history as parallel date shards that resume after interruption
+"""
+
+import os
+import sys
+import argparse
+import datetime
+
+from prtd_analytics import DEFAULT_CREDENTIALS_PATH
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.backfill import BACKFILL_DIR, BACKFILL_REPORTS, DEFAULT_CONCURRENCY, Backfill
+
+def parse_date(value: str) -> datetime.date:
+    """Accept an ISO date, 'yesterday', or 'NNdaysAgo'."""
+    today = datetime.date.today()
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - datetime.timedelta(days=1)
+    if value.endswith("daysAgo"):
+        return today - datetime.timedelta(days=int(value[:-len("daysAgo")]))
+    return datetime.date.fromisoformat(value)
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Backfill GA4 history into local date shards")
+    parser.add_argument("reports", nargs="+", choices=list(BACKFILL_REPORTS) + ["all"],
+                        help="report definitions to backfill")
+    parser.add_argument("--start", type=parse_date, default=parse_date("395daysAgo"),
+                        help="first day: ISO date or NNdaysAgo (default ~13 months)")
+    parser.add_argument("--end", type=parse_date, default=parse_date("yesterday"),
+                        help="last day, inclusive (default yesterday)")
+    parser.add_argument("--shard", choices=["day", "week"], default="day")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"parallel requests (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--output", default=str(BACKFILL_DIR), help="shard directory root")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and refetch everything")
+    args = parser.parse_args()
+
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', DEFAULT_CREDENTIALS_PATH)
+    property_id = os.getenv('GA4_PROPERTY_ID')
+
+    if not property_id:
+        print("❌ GA4_PROPERTY_ID environment variable not set!")
+        sys.exit(1)
+
+    if not os.path.exists(credentials_path):
+        print(f"❌ Credentials file not found: {credentials_path}")
+        sys.exit(1)
+
+    if args.start > args.end:
+        print(f"❌ --start {args.start} is after --end {args.end}")
+        sys.exit(1)
+
+    credentials = load_credentials(credentials_path, scopes=['https://www.googleapis.com/auth/analytics.readonly'])
+    client = validated_client(create_data_client(credentials))
+    property_name = f"properties/{property_id}"
+
+    names = list(BACKFILL_REPORTS) if "all" in args.reports else args.reports
+
+    print(f"🔄 Backfilling {', '.join(names)} from {args.start} to {args.end}")
+    print("=" * 60)
+
+    any_failed = False
+    for name in names:
+        backfill = Backfill(client, property_name, name, BACKFILL_REPORTS[name],
+                            output_dir=args.output, shard=args.shard, concurrency=args.concurrency)
+        try:
+            result = backfill.run(args.start, args.end, restart=args.restart)
+        except ValueError as e:
+            print(f"❌ {str(e)}")
+            any_failed = True
+            continue
+
+        print(f"📁 {name}: {result['fetched']} fetched, {result['skipped']} resumed, "
+              f"{len(result['failed'])} failed → {result['output_dir']}")
+        any_failed = any_failed or bool(result['failed'])
+
+    if any_failed:
+        print("\n⚠️  Some shards failed; rerun the same command to resume")
+        sys.exit(1)
+
+    print("\n✅ Backfill complete")
+
+if __name__ == "__main__":
+    main()
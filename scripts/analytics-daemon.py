@@ -0,0 +1,94 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Analytics Daemon for PRTD
+Keeps GA4 clients warm so health and validation checks answer instantly
+"""
+
+import os
+import sys
+import json
+from typing import Optional
+
+from prtd_analytics import DEFAULT_CREDENTIALS_PATH
+from prtd_analytics.daemon import (
+    DEFAULT_SOCKET_PATH,
+    DaemonNotRunning,
+    send_command
+)
+
+USAGE = """Usage:
+  analytics-daemon.py serve [cache_ttl_seconds]
+  analytics-daemon.py health [--fresh] [--json]
+  analytics-daemon.py validate [--fresh] [--json]
+  analytics-daemon.py ping
+  analytics-daemon.py stop"""
+
+def serve(cache_ttl: Optional[int]):
+    """Start the daemon in the foreground."""
+    # Only the server needs the Google client libraries
+    from prtd_analytics.daemon import AnalyticsDaemon
+
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', DEFAULT_CREDENTIALS_PATH)
+    property_id = os.getenv('GA4_PROPERTY_ID')
+
+    if not property_id:
+        print("❌ GA4_PROPERTY_ID environment variable not set!")
+        sys.exit(1)
+
+    if not os.path.exists(credentials_path):
+        print(f"❌ Credentials file not found: {credentials_path}")
+        sys.exit(1)
+
+    daemon = AnalyticsDaemon(property_id, credentials_path, cache_ttl=cache_ttl)
+
+    print(f"🔌 Analytics daemon listening on {daemon.socket_path}")
+    print(f"♻️  Cached results are reused for {daemon.cache_ttl} seconds")
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Daemon stopped by user")
+
+def run_client(command: str, flags: list):
+    """Send a command to the running daemon and print its reply."""
+    try:
+        reply = send_command(command, fresh="--fresh" in flags)
+    except DaemonNotRunning:
+        print(f"❌ Analytics daemon not running on {DEFAULT_SOCKET_PATH}")
+        print("Start it with: analytics-daemon.py serve")
+        sys.exit(1)
+
+    if "--json" in flags:
+        print(json.dumps(reply.get("result"), indent=2))
+    elif reply.get("output"):
+        print(reply["output"], end="")
+    elif reply.get("result") is not None:
+        print(json.dumps(reply["result"], indent=2))
+
+    if reply.get("cached"):
+        print(f"♻️  Served from daemon cache ({reply['age_seconds']:.0f}s old, use --fresh to re-query)")
+
+    if not reply.get("ok"):
+        print(f"❌ {reply.get('error', 'Daemon command failed')}")
+        sys.exit(1)
+
+def main():
+    """Main entry point."""
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        print(USAGE)
+        return
+
+    command = sys.argv[1]
+
+    if command == "serve":
+        cache_ttl = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        serve(cache_ttl)
+    elif command in ["health", "validate", "ping", "stop"]:
+        run_client(command, sys.argv[2:])
+    else:
+        print(f"❌ Unknown command: {command}")
+        print(USAGE)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Analytics Dataset Export for PRTD
+Converts backfilled report rows and run history into date-partitioned columnar files
+"""
+
+import argparse
+import datetime
+
+from prtd_analytics.backfill import BACKFILL_DIR, BACKFILL_REPORTS, load_shards
+from prtd_analytics.columnar import DATASET_DIR, FORMATS, export_history, export_shards, list_datasets, read_table
+from prtd_analytics.history import HISTORY_DB_PATH, HistoryIndex
+
+def export_backfill(args):
+    """Export stored backfill shards."""
+    names = list(BACKFILL_REPORTS) if "all" in args.reports else args.reports
+    for name in names:
+        shards = load_shards(name, args.backfill_dir, args.since, args.until)
+        files = export_shards(name, shards, args.format, args.compression, args.output)
+        print(f"✅ {name}: {len(shards)} shards → {files} {args.format} files in {args.output}/{name}")
+
+def export_runs(args):
+    """Export per-run metrics from the history index."""
+    index = HistoryIndex(args.db)
+    try:
+        files = export_history(index, args.since or "2000-01-01", args.until or datetime.date.today().isoformat(),
+                               args.format, args.compression, args.output)
+    finally:
+        index.close()
+    print(f"✅ run_metrics: {files} {args.format} files in {args.output}/run_metrics")
+
+def show_datasets(args):
+    """List exported datasets."""
+    print("\n🗄️  Exported datasets")
+    print("=" * 60)
+    datasets = list_datasets(args.output)
+    if not datasets:
+        print("ℹ️  Nothing exported yet")
+    for name, info in datasets.items():
+        print(f"{name:<16} {info['format']:<8} {info['days']:>4} days  "
+              f"{info['first']} → {info['last']}  {info['bytes'] / 1024:,.0f} KiB")
+
+def scan_dataset(args):
+    """Scan a dataset and print its shape."""
+    table = read_table(args.dataset, args.since, args.until, args.columns, args.output)
+    print(f"\n🔍 {args.dataset}: {table.num_rows:,} rows, {table.nbytes / 1024:,.0f} KiB in memory")
+    print("=" * 60)
+    print(table.schema)
+    for row in table.slice(0, args.head).to_pylist():
+        print(row)
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Export PRTD analytics data as columnar datasets")
+    parser.add_argument("--output", default=str(DATASET_DIR), help="dataset root directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_export_options(command):
+        command.add_argument("--format", choices=list(FORMATS), default="parquet",
+                             help="parquet (zstd) or arrow (IPC, memory-mappable)")
+        command.add_argument("--compression", help="override codec, e.g. lz4 or zstd")
+        command.add_argument("--since", help="first day to export (ISO date)")
+        command.add_argument("--until", help="last day to export (ISO date)")
+
+    backfill = commands.add_parser("backfill", help="export backfilled report shards")
+    backfill.add_argument("reports", nargs="+", choices=list(BACKFILL_REPORTS) + ["all"])
+    backfill.add_argument("--backfill-dir", default=str(BACKFILL_DIR))
+    add_export_options(backfill)
+    backfill.set_defaults(handler=export_backfill)
+
+    runs = commands.add_parser("runs", help="export per-run metrics from the history index")
+    runs.add_argument("--db", default=HISTORY_DB_PATH)
+    add_export_options(runs)
+    runs.set_defaults(handler=export_runs)
+
+    datasets = commands.add_parser("list", help="list exported datasets")
+    datasets.set_defaults(handler=show_datasets)
+
+    scan = commands.add_parser("scan", help="read a dataset back (memory-mapped)")
+    scan.add_argument("dataset")
+    scan.add_argument("--since", help="first day (ISO date)")
+    scan.add_argument("--until", help="last day (ISO date)")
+    scan.add_argument("--columns", nargs="+")
+    scan.add_argument("--head", type=int, default=5, help="rows to print")
+    scan.set_defaults(handler=scan_dataset)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Analytics History Query Tool for PRTD
+Answers time-range and trend questions from the indexed run history
+"""
+
+import re
+import argparse
+import datetime
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.history import AGGREGATES, BUCKET_FORMATS, HISTORY_DB_PATH, HistoryIndex
+
+def parse_time(value: str) -> str:
+    """Accept '30d', '12h', '2w' (ago) or an ISO date/datetime."""
+    match = re.fullmatch(r"(\d+)([hdw])", value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        delta = {"h": datetime.timedelta(hours=amount),
+                 "d": datetime.timedelta(days=amount),
+                 "w": datetime.timedelta(weeks=amount)}[unit]
+        return (datetime.datetime.now() - delta).isoformat()[:19]
+    return datetime.datetime.fromisoformat(value).isoformat()[:19]
+
+def show_series(index: HistoryIndex, args):
+    """Print a metric's aggregated values per bucket."""
+    rows = index.metric_series(args.metric, args.since, args.until,
+                               bucket=args.bucket, aggregate=args.agg, kind=args.kind)
+
+    print(f"\n📈 {args.metric} ({args.agg} per {args.bucket})")
+    print("=" * 60)
+
+    if not rows:
+        print("ℹ️  No indexed values in this range")
+        print("💡 Run 'analytics-history.py import' to index archived reports")
+        return
+
+    peak = max(abs(value) for _, value, _ in rows) or 1
+    for bucket, value, samples in rows:
+        bar = "█" * max(1, round(abs(value) / peak * 30))
+        print(f"{bucket:<17} {value:>12,.2f}  {bar}  ({samples} runs)")
+
+    first, last = rows[0][1], rows[-1][1]
+    if first:
+        change = (last - first) / abs(first) * 100
+        trend = "📈" if change > 0 else "📉" if change < 0 else "➡️"
+        print(f"\n{trend} Trend: {first:,.2f} → {last:,.2f} ({change:+.1f}%)")
+
+def show_runs(index: HistoryIndex, args):
+    """Print runs in the range."""
+    rows = index.runs(args.since, args.until, kind=args.kind)
+
+    print(f"\n🗂️  Runs ({len(rows)})")
+    print("=" * 60)
+    for kind, run_at, status, score, report_path in rows:
+        score_text = f"{score:5.1f}" if score is not None else "    -"
+        print(f"{run_at}  {kind:<10} {str(status or '-'):<10} {score_text}  {report_path or ''}")
+
+def show_metrics(index: HistoryIndex, args):
+    """Print every indexed metric name."""
+    print("\n🏷️  Indexed metrics")
+    print("=" * 60)
+    for name, samples, first_seen, last_seen in index.metric_names():
+        print(f"{name:<36} {samples:>6} values  {first_seen[:10]} → {last_seen[:10]}")
+
+def import_reports(index: HistoryIndex, args):
+    """Index archived JSON reports."""
+    total = 0
+    for pattern in args.patterns:
+        total += index.import_reports(pattern)
+    print(f"✅ Indexed {total} new reports into {index.path}")
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Query the PRTD analytics run history")
+    parser.add_argument("--db", default=HISTORY_DB_PATH, help="history database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_range(command):
+        command.add_argument("--since", type=parse_time, default=parse_time("30d"),
+                             help="start: 30d, 12h, 2w or an ISO date (default 30d)")
+        command.add_argument("--until", type=parse_time,
+                             default=(datetime.datetime.now() + datetime.timedelta(seconds=1)).isoformat()[:19],
+                             help="end: same formats as --since (default now)")
+        command.add_argument("--kind", choices=["health", "validation", "realtime"])
+
+    query = commands.add_parser("query", help="aggregate a metric over time")
+    query.add_argument("metric", help="e.g. funnel.conversion_rate (see 'metrics')")
+    query.add_argument("--bucket", choices=list(BUCKET_FORMATS), default="day")
+    query.add_argument("--agg", choices=list(AGGREGATES), default="avg")
+    add_range(query)
+    query.set_defaults(handler=show_series)
+
+    runs = commands.add_parser("runs", help="list runs in a time range")
+    add_range(runs)
+    runs.set_defaults(handler=show_runs)
+
+    metrics = commands.add_parser("metrics", help="list indexed metric names")
+    metrics.set_defaults(handler=show_metrics)
+
+    importer = commands.add_parser("import", help="index archived JSON reports")
+    importer.add_argument("patterns", nargs="*", default=[
+        str(DATA_DIR / "health-check-*.json*"),
+        str(DATA_DIR / "analytics-validation-*.json*"),
+        str(DATA_DIR / "realtime-monitor-*.json*"),
+    ])
+    importer.set_defaults(handler=import_reports)
+
+    args = parser.parse_args()
+
+    index = HistoryIndex(args.db)
+    try:
+        args.handler(index, args)
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Ad-hoc Analytics Queries for PRTD
+Answers group-by / filter / top-N questions from exported datasets instead of live GA4 reports
+"""
+
+import sys
+import json
+import time
+import argparse
+
+from prtd_analytics.adhoc import LocalQuery, parse_filter, parse_measure, parse_order, run_query
+from prtd_analytics.columnar import DATASET_DIR, list_datasets
+
+def print_table(table):
+    """Print rows as aligned columns."""
+    records = [list(row.values()) for row in table.to_pylist()]
+    numeric = [all(isinstance(row[i], (int, float)) for row in records if row[i] is not None)
+               for i in range(table.num_columns)]
+    rows = [["" if v is None else f"{v:,}" if isinstance(v, int) else f"{v:,.2f}" if isinstance(v, float) else str(v)
+             for v in row] for row in records]
+    widths = [max([len(name)] + [len(row[i]) for row in rows]) for i, name in enumerate(table.column_names)]
+
+    def line(values):
+        return "  ".join(v.rjust(w) if n else v.ljust(w) for v, w, n in zip(values, widths, numeric))
+
+    print(line(table.column_names))
+    print(line(["-" * w for w in widths]))
+    for row in rows:
+        print(line(row))
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(
+        description="Query exported PRTD datasets locally (no GA4 calls)",
+        epilog="filters: field=value, field=a,b (any of), field^=prefix, field$=suffix, "
+               "field*=substring, field~=regex"
+    )
+    parser.add_argument("dataset", nargs="?", help="dataset name, e.g. deals, engagement, events")
+    parser.add_argument("--by", nargs="+", default=[], help="columns to group by")
+    parser.add_argument("--metric", nargs="+", default=[],
+                        help="measures: eventCount (sum), max:totalUsers, mean:eventCount, count")
+    parser.add_argument("--where", action="append", default=[], help="filter; repeat to AND several")
+    parser.add_argument("--since", help="first day (ISO date)")
+    parser.add_argument("--until", help="last day (ISO date)")
+    parser.add_argument("--order", default="", help="comma-separated sort columns, '-' prefix for descending, "
+                                                    "e.g. --order=date,-eventCount (default: first measure, descending)")
+    parser.add_argument("--top", type=int, default=20, help="rows to show (0 for all)")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    parser.add_argument("--root", default=str(DATASET_DIR), help="dataset root directory")
+    args = parser.parse_args()
+
+    if not args.dataset:
+        datasets = list_datasets(args.root)
+        print("🗄️  Datasets available for querying:")
+        for name, info in datasets.items():
+            print(f"  • {name}: {info['days']} days, {info['first']} → {info['last']}")
+        if not datasets:
+            print("ℹ️  Nothing exported yet; run analytics-backfill.py and analytics-export.py backfill first")
+        return
+
+    try:
+        query = LocalQuery(
+            dataset=args.dataset,
+            group_by=args.by,
+            measures=[parse_measure(m) for m in args.metric],
+            filters=[parse_filter(w) for w in args.where],
+            order_by=[parse_order(o.strip()) for o in args.order.split(",") if o.strip()],
+            limit=args.top,
+            since=args.since,
+            until=args.until
+        )
+        started = time.perf_counter()
+        result = run_query(query, args.root)
+        elapsed = time.perf_counter() - started
+    except FileNotFoundError as e:
+        print(f"❌ {str(e)}")
+        print("💡 Export it with: scripts/analytics-export.py backfill <report>")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result.to_pylist(), default=str, indent=2))
+        return
+
+    window = f"{args.since or 'start'} → {args.until or 'latest'}"
+    print(f"\n🔍 {args.dataset} ({window})")
+    print("=" * 60)
+    if result.num_rows:
+        print_table(result)
+    else:
+        print("ℹ️  No matching rows")
+    print(f"\n⏱️  {result.num_rows:,} rows in {elapsed * 1000:.0f} ms (local data, no GA4 calls)")
+
+if __name__ == "__main__":
+    main()
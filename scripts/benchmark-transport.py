@@ -0,0 +1,185 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+GA4 Transport Benchmark for PRTD
+Measures RunReport latency and throughput per transport config against local stand-ins
+"""
+
+import gzip
+import json
+import time
+import argparse
+import threading
+import statistics
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+from google.analytics.data_v1beta.types import (
+    RunReportRequest,
+    RunReportResponse,
+    Dimension,
+    Metric,
+    DateRange
+)
+
+from prtd_analytics.transport import PRESETS, create_data_client
+
+SERVICE_NAME = "google.analytics.data.v1beta.BetaAnalyticsData"
+
+def build_sample_request() -> RunReportRequest:
+    """The event-count query the health check issues most often."""
+    return RunReportRequest(
+        property="properties/0",
+        dimensions=[Dimension(name="eventName"), Dimension(name="customEvent:slug")],
+        metrics=[Metric(name="eventCount"), Metric(name="totalUsers")],
+        date_ranges=[DateRange(start_date="7daysAgo", end_date="today")]
+    )
+
+def build_sample_response(row_count: int) -> RunReportResponse:
+    """A canned response shaped like a deal × event report."""
+    events = ['page_view', 'view_item', 'select_item', 'click_external_deal', 'scroll']
+    rows = []
+    for i in range(row_count):
+        rows.append({
+            "dimension_values": [{"value": events[i % len(events)]}, {"value": f"deal-slug-{i}"}],
+            "metric_values": [{"value": str(1000 - i % 1000)}, {"value": str(100 - i % 100)}]
+        })
+
+    return RunReportResponse(
+        dimension_headers=[{"name": "eventName"}, {"name": "customEvent:slug"}],
+        metric_headers=[{"name": "eventCount", "type_": "TYPE_INTEGER"},
+                        {"name": "totalUsers", "type_": "TYPE_INTEGER"}],
+        rows=rows,
+        row_count=row_count
+    )
+
+def start_grpc_stand_in(response: RunReportResponse, delay_ms: float):
+    """Serve RunReport over plaintext gRPC on a free local port."""
+    def run_report(request, context):
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return response
+
+    handler = grpc.method_handlers_generic_handler(SERVICE_NAME, {
+        "RunReport": grpc.unary_unary_rpc_method_handler(
+            run_report,
+            request_deserializer=RunReportRequest.deserialize,
+            response_serializer=RunReportResponse.serialize
+        )
+    })
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+def start_rest_stand_in(response: RunReportResponse, delay_ms: float):
+    """Serve RunReport as JSON over HTTP/1.1 keep-alive on a free local port."""
+    body = RunReportResponse.to_json(response).encode()
+    gzipped_body = gzip.compress(body)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay_ms:
+                time.sleep(delay_ms / 1000)
+
+            payload = body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                payload = gzipped_body
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def benchmark_config(name: str, host: str, requests_per_config: int, concurrency: int) -> dict:
+    """Time RunReport calls for one preset."""
+    client = create_data_client(None, PRESETS[name], host=host, insecure=True)
+    request = build_sample_request()
+
+    # Warm up the connection so setup cost isn't counted as request latency
+    for _ in range(min(5, requests_per_config)):
+        client.run_report(request=request)
+
+    def timed_call(_):
+        start = time.perf_counter()
+        client.run_report(request=request)
+        return (time.perf_counter() - start) * 1000
+
+    wall_start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed_call, range(requests_per_config)))
+    wall_seconds = time.perf_counter() - wall_start
+
+    return {
+        "config": name,
+        "requests": requests_per_config,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "throughput_rps": round(requests_per_config / wall_seconds, 1)
+    }
+
+def main():
+    """Main benchmark function."""
+    parser = argparse.ArgumentParser(description="Benchmark GA4 Data API transport configurations")
+    parser.add_argument("--requests", type=int, default=500, help="requests per configuration")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel callers")
+    parser.add_argument("--rows", type=int, default=200, help="rows in the canned response")
+    parser.add_argument("--delay-ms", type=float, default=0, help="simulated server time per request")
+    parser.add_argument("--configs", nargs="+", default=list(PRESETS), choices=list(PRESETS))
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("🏁 GA4 TRANSPORT BENCHMARK")
+    print(f"Requests: {args.requests} per config | Concurrency: {args.concurrency} | "
+          f"Rows: {args.rows} | Server delay: {args.delay_ms}ms")
+    print("=" * 60)
+
+    response = build_sample_response(args.rows)
+    grpc_server, grpc_host = start_grpc_stand_in(response, args.delay_ms)
+    rest_server, rest_host = start_rest_stand_in(response, args.delay_ms)
+
+    results = []
+    try:
+        for name in args.configs:
+            host = grpc_host if PRESETS[name].transport == "grpc" else rest_host
+            result = benchmark_config(name, host, args.requests, args.concurrency)
+            results.append(result)
+            print(f"⏱️  {name:<22} p50 {result['p50_ms']:>7.2f}ms | "
+                  f"p99 {result['p99_ms']:>7.2f}ms | {result['throughput_rps']:>8.1f} req/s")
+    finally:
+        grpc_server.stop(None)
+        rest_server.shutdown()
+
+    fastest = min(results, key=lambda r: r["p99_ms"])
+    print("=" * 60)
+    print(f"🏆 Lowest p99: {fastest['config']}")
+    print("💡 Select it for the monitors with PRTD_GA4_TRANSPORT / PRTD_GA4_KEEPALIVE_MS / PRTD_GA4_COMPRESSION")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\n📁 Benchmark results saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
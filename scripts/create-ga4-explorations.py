@@ -13,8 +13,7 @@ from google.analytics.admin_v1beta.types import (
     CreateCustomDimensionRequest,
     CustomDimension
 )
-from google.oauth2 import service_account
-import requests
+from prtd_analytics.auth import load_credentials, get_access_token
 
 # Configuration
 PROPERTY_ID = "502239171"
@@ -23,7 +22,7 @@ CREDENTIALS_PATH = "/home/deploy/prtd-ga4-credentials.json"
 def initialize_client():
     """Initialize the Analytics Admin API client."""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             CREDENTIALS_PATH,
             scopes=[
                 'https://www.googleapis.com/auth/analytics.edit',
@@ -40,9 +39,8 @@ def initialize_client():
 def create_exploration_via_api(credentials, exploration_config):
     """Create a GA4 exploration using the REST API."""
     try:
-        # Get access token
-        credentials.refresh(requests.Request())
-        access_token = credentials.token
+        # Get access token (reused from the shared token cache when still valid)
+        access_token = get_access_token(credentials)
         
         # GA4 API endpoint for creating explorations
         url = f"https://analyticsdata.googleapis.com/v1beta/properties/{PROPERTY_ID}:runReport"
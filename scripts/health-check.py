@@ -5,34 +5,30 @@ Continuous monitoring and alerting for analytics tracking health
 """
 
 import os
-import json
 import time
 import smtplib
 import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, List, Optional
-from dataclasses import dataclass
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    RunReportRequest,
-    RunRealtimeReportRequest,
-    Dimension,
-    Metric,
-    DateRange,
-    MinuteRange
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.query import compile_request, realtime_report
+from prtd_analytics.baselines import (
+    BASELINE_PATH,
+    BaselineModel,
+    backfill_from_reports,
+    edit_baselines,
+    extract_health_metrics
 )
-from google.oauth2 import service_account
+from prtd_analytics.history import record_report
+from prtd_analytics.metrics import MetricsSnapshot, get_metrics_core
+from prtd_analytics.writer import get_writer
+from prtd_analytics.rules import RuleSet, event_metrics, load_rules
 
-@dataclass
-class HealthThreshold:
-    """Health check threshold configuration."""
-    metric_name: str
-    min_value: Optional[int] = None
-    max_value: Optional[int] = None
-    critical_min: Optional[int] = None
-    warning_message: str = ""
-    critical_message: str = ""
+# How many standard deviations below its weekday/hour baseline a metric may fall
+BASELINE_Z_THRESHOLD = 2.5
 
 class PRTDHealthChecker:
     def __init__(self, property_id: str, credentials_path: str):
@@ -41,63 +37,53 @@ class PRTDHealthChecker:
         self.property_name = f"properties/{property_id}"
         
         # Set up credentials
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             credentials_path,
             scopes=['https://www.googleapis.com/auth/analytics.readonly']
         )
         
         # Initialize the client
-        self.client = BetaAnalyticsDataClient(credentials=credentials)
-        
-        # Health thresholds
-        self.thresholds = {
-            'daily_page_views': HealthThreshold(
-                metric_name='page_views',
-                min_value=50,
-                critical_min=10,
-                warning_message="Daily page views below expected range",
-                critical_message="Critical: Very low daily page views"
-            ),
-            'daily_deal_clicks': HealthThreshold(
-                metric_name='click_external_deal',
-                min_value=5,
-                critical_min=1,
-                warning_message="Deal clicks below expected range",
-                critical_message="Critical: No deal clicks detected"
-            ),
-            'conversion_rate': HealthThreshold(
-                metric_name='conversion_rate',
-                min_value=2.0,  # 2% minimum
-                critical_min=0.5,
-                warning_message="Conversion rate below target",
-                critical_message="Critical: Very low conversion rate"
-            ),
-            'tracking_errors': HealthThreshold(
-                metric_name='tracking_errors',
-                max_value=5,
-                warning_message="Elevated tracking errors detected",
-                critical_message="Critical: High tracking error rate"
-            )
-        }
+        self.client = validated_client(create_data_client(credentials))
+        
+        # Shared with the validator; whichever runs first fetches
+        self.metrics_core = get_metrics_core()
+        
+        # Health thresholds from analytics-rules.json, compiled once
+        self.thresholds = load_rules("health")
+        self.rules = RuleSet(self.thresholds)
+        
+        # Learned per-metric baselines; static thresholds apply until they warm up
+        self.baselines = BaselineModel.load(BASELINE_PATH)
         
         # Alert history
         self.alert_history = []
         self.last_health_score = 100
     
+    def _snapshot(self) -> MetricsSnapshot:
+        """Event, funnel and attribution data for the last 7 days, fetched at most once per run."""
+        return self.metrics_core.get(self.client, self.property_name)
+    
+    def _is_low(self, metric: str, value: float, static_min: float):
+        """Compare a value to its baseline, or to the static floor while the baseline warms up."""
+        score = self.baselines.score(metric, value, datetime.datetime.now())
+        if score is None:
+            return value < static_min, None
+        return score["z"] < -BASELINE_Z_THRESHOLD, score
+    
+    def _describe(self, issue: str, score: Optional[Dict]) -> str:
+        """Append the baseline expectation to an issue message."""
+        if score is None:
+            return issue
+        return f"{issue} (expected ~{score['expected']:g} for this hour)"
+    
     def check_core_tracking_health(self) -> Dict:
         """Check if core tracking events are functioning."""
         print("🔍 Checking core tracking health...")
         
-        # Check events from last 24 hours
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[Dimension(name="eventName")],
-            metrics=[Metric(name="eventCount")],
-            date_ranges=[DateRange(start_date="yesterday", end_date="today")]
-        )
-        
         try:
-            response = self.client.run_report(request=request)
+            # Events from last 24 hours, with the total summed by GA4
+            snapshot = self._snapshot()
+            found_events = snapshot.recent_event_counts()
             
             # Required events
             required_events = [
@@ -105,15 +91,9 @@ class PRTDHealthChecker:
                 'click_external_deal', 'conversion'
             ]
             
-            found_events = {}
-            for row in response.rows:
-                event_name = row.dimension_values[0].value
-                event_count = int(row.metric_values[0].value)
-                found_events[event_name] = event_count
-            
             # Evaluate health
             missing_events = [e for e in required_events if e not in found_events]
-            total_events = sum(found_events.values())
+            total_events = snapshot.recent_total_events()
             
             health_score = max(0, 100 - (len(missing_events) * 20))
             
@@ -137,55 +117,49 @@ class PRTDHealthChecker:
         """Check conversion funnel health."""
         print("📊 Checking conversion funnel health...")
         
-        # Get funnel events from last 7 days
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[Dimension(name="eventName")],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")]
-        )
-        
         try:
-            response = self.client.run_report(request=request)
-            
-            funnel_data = {}
-            for row in response.rows:
-                event_name = row.dimension_values[0].value
-                event_count = int(row.metric_values[0].value)
-                users = int(row.metric_values[1].value)
-                
-                if event_name in ['view_item', 'select_item', 'click_external_deal']:
-                    funnel_data[event_name] = {
-                        "events": event_count,
-                        "users": users
-                    }
-            
-            # Calculate conversion rates
-            view_item = funnel_data.get('view_item', {}).get('events', 0)
-            select_item_events = funnel_data.get('select_item', {}).get('events', 0)
-            external_click = funnel_data.get('click_external_deal', {}).get('events', 0)
-            
-            click_rate = (select_item_events / view_item * 100) if view_item > 0 else 0
-            conversion_rate = (external_click / view_item * 100) if view_item > 0 else 0
+            # Funnel events from last 7 days
+            snapshot = self._snapshot()
+            funnel = snapshot.funnel()
+            funnel_data = funnel["funnel_data"]
+            view_item = funnel["view_item_events"]
+            click_rate = funnel["click_rate"]
+            conversion_rate = funnel["conversion_rate"]
             
             # Health evaluation
             health_score = 100
             issues = []
+            baseline = {}
             
-            if view_item < 100:  # Low traffic
+            low_traffic, baseline["funnel.view_item"] = self._is_low("funnel.view_item", view_item, 100)
+            if low_traffic:
                 health_score -= 20
-                issues.append("Low deal page views")
+                issues.append(self._describe("Low deal page views", baseline["funnel.view_item"]))
             
-            if click_rate < 10:  # Poor engagement
+            low_clicks, baseline["funnel.click_rate"] = self._is_low("funnel.click_rate", click_rate, 10)
+            if low_clicks:  # Poor engagement
                 health_score -= 30
-                issues.append(f"Low click rate: {click_rate:.1f}%")
+                issues.append(self._describe(f"Low click rate: {click_rate:.1f}%", baseline["funnel.click_rate"]))
             
-            if conversion_rate < 2:  # Poor conversion
+            low_conversion, baseline["funnel.conversion_rate"] = self._is_low(
+                "funnel.conversion_rate", conversion_rate, 2
+            )
+            if low_conversion:  # Poor conversion
                 health_score -= 40
-                issues.append(f"Low conversion rate: {conversion_rate:.1f}%")
+                issues.append(self._describe(f"Low conversion rate: {conversion_rate:.1f}%",
+                                             baseline["funnel.conversion_rate"]))
+            
+            # Per-deal breakdown: informational, does not affect the score
+            try:
+                deal_funnel = snapshot.deal_funnel().summary()
+            except Exception as e:
+                deal_funnel = {"error": f"Failed to build per-deal funnel: {str(e)}"}
+                issues.append(deal_funnel["error"])
+            else:
+                if deal_funnel["underperformers"]:
+                    issues.append(f"{len(deal_funnel['underperformers'])} deals converting far below their category")
+                if not deal_funnel["data_quality"]["exact"]:
+                    issues.append("Per-deal funnel is approximate: " + "; ".join(deal_funnel["data_quality"]["notes"]))
             
             status = "healthy" if health_score >= 80 else "warning" if health_score >= 50 else "critical"
             
@@ -193,8 +167,11 @@ class PRTDHealthChecker:
                 "status": status,
                 "health_score": max(0, health_score),
                 "funnel_data": funnel_data,
+                "deal_funnel": deal_funnel,
+                "view_item_events": view_item,
                 "click_rate": round(click_rate, 2),
                 "conversion_rate": round(conversion_rate, 2),
+                "baseline": baseline,
                 "issues": issues
             }
             
@@ -211,17 +188,11 @@ class PRTDHealthChecker:
         
         try:
             # Get global realtime metrics
-            request = RunRealtimeReportRequest(
-                property=self.property_name,
-                dimensions=[],
-                metrics=[
-                    Metric(name="activeUsers"),
-                    Metric(name="eventCount")
-                ],
-                minute_ranges=[MinuteRange(start_minutes_ago=29, end_minutes_ago=0)]
-            )
+            spec = realtime_report(dimensions=[], metrics=["activeUsers", "eventCount"])
             
-            response = self.client.run_realtime_report(request=request)
+            response = self.client.run_realtime_report(
+                request=compile_request(self.property_name, spec)
+            )
             
             active_users = 0
             total_events = 0
@@ -235,12 +206,13 @@ class PRTDHealthChecker:
             health_score = 100
             issues = []
             
-            if active_users == 0:
+            low_activity, score = self._is_low("realtime.active_users", active_users, 2)
+            if low_activity and active_users == 0:
                 health_score = 50
-                issues.append("No active users in last 29 minutes")
-            elif active_users < 2:
+                issues.append(self._describe("No active users in last 29 minutes", score))
+            elif low_activity:
                 health_score -= 20
-                issues.append("Low user activity")
+                issues.append(self._describe("Low user activity", score))
             
             if total_events == 0 and active_users > 0:
                 health_score -= 30
@@ -253,6 +225,7 @@ class PRTDHealthChecker:
                 "health_score": health_score,
                 "active_users": active_users,
                 "total_events": total_events,
+                "baseline": {"realtime.active_users": score},
                 "issues": issues
             }
             
@@ -267,37 +240,19 @@ class PRTDHealthChecker:
         """Check partner attribution tracking health."""
         print("🤝 Checking partner attribution health...")
         
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="customEvent:partner"),
-                Dimension(name="sourceMedium")
-            ],
-            metrics=[Metric(name="eventCount")],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")]
-        )
-        
         try:
-            response = self.client.run_report(request=request)
+            attribution = self._snapshot().attribution().summary()
             
-            partners = {}
-            utm_tracking = {}
-            
-            for row in response.rows:
-                partner = row.dimension_values[0].value
-                source_medium = row.dimension_values[1].value
-                events = int(row.metric_values[0].value)
-                
-                if partner and partner != "(not set)":
-                    partners[partner] = partners.get(partner, 0) + events
-                
-                if "PRTD" in source_medium:
-                    utm_tracking[source_medium] = utm_tracking.get(source_medium, 0) + events
+            partners = {k: v["total_events"] for k, v in attribution["partners"].items()}
+            utm_tracking = {k: v["total_events"] for k, v in attribution["prtd_sources"].items()}
             
             # Health evaluation
             health_score = 100
             issues = []
             
+            if not attribution["data_quality"]["exact"]:
+                issues.append("Attribution is approximate: " + "; ".join(attribution["data_quality"]["notes"]))
+            
             if len(partners) == 0:
                 health_score -= 40
                 issues.append("No partner attribution data")
@@ -307,9 +262,10 @@ class PRTDHealthChecker:
                 issues.append("UTM tracking not working")
             
             total_attributed_events = sum(partners.values())
-            if total_attributed_events < 10:
+            low_volume, score = self._is_low("attribution.total_events", total_attributed_events, 10)
+            if low_volume:
                 health_score -= 20
-                issues.append("Low partner attribution volume")
+                issues.append(self._describe("Low partner attribution volume", score))
             
             status = "healthy" if health_score >= 80 else "warning" if health_score >= 50 else "critical"
             
@@ -317,8 +273,11 @@ class PRTDHealthChecker:
                 "status": status,
                 "health_score": max(0, health_score),
                 "partners": partners,
+                "campaigns": {k: v["total_events"] for k, v in attribution["campaigns"].items()},
                 "utm_tracking": utm_tracking,
                 "total_attributed_events": total_attributed_events,
+                "baseline": {"attribution.total_events": score},
+                "data_quality": attribution["data_quality"],
                 "issues": issues
             }
             
@@ -329,12 +288,15 @@ class PRTDHealthChecker:
                 "error": f"Failed to check attribution health: {str(e)}"
             }
     
-    def run_comprehensive_health_check(self) -> Dict:
-        """Run all health checks and generate overall score."""
+    def run_comprehensive_health_check(self, fresh: bool = False) -> Dict:
+        """Run all health checks and generate overall score; `fresh` refetches the shared snapshot."""
         print("🏥 Running comprehensive analytics health check...\n")
         
         timestamp = datetime.datetime.now().isoformat()
         
+        # Fetched (or refetched) once here; the checks below read the same snapshot
+        snapshot = self.metrics_core.get(self.client, self.property_name, refresh=fresh)
+        
         # Run all health checks
         checks = {
             "core_tracking": self.check_core_tracking_health(),
@@ -361,6 +323,14 @@ class PRTDHealthChecker:
         
         overall_score = total_score / check_count if check_count > 0 else 0
         
+        # Configured threshold rules
+        threshold_violations = self.evaluate_thresholds(checks)
+        for violation in threshold_violations:
+            if violation["level"] == "critical":
+                critical_issues.append(violation["message"])
+            else:
+                warning_issues.append(violation["message"])
+        
         # Determine overall status
         if overall_score >= 80:
             overall_status = "healthy"
@@ -372,15 +342,21 @@ class PRTDHealthChecker:
             overall_status = "critical"
             status_emoji = "🔴"
         
+        if any(v["level"] == "critical" for v in threshold_violations):
+            overall_status = "critical"
+            status_emoji = "🔴"
+        
         # Compile results
         health_report = {
             "timestamp": timestamp,
+            "snapshot_at": snapshot.fetched_at,
             "overall_status": overall_status,
             "overall_score": round(overall_score, 1),
             "status_emoji": status_emoji,
             "checks": checks,
             "critical_issues": critical_issues,
             "warning_issues": warning_issues,
+            "threshold_violations": threshold_violations,
             "recommendations": self._generate_recommendations(checks)
         }
         
@@ -428,8 +404,38 @@ class PRTDHealthChecker:
         # Store for alerting
         self.last_health_score = overall_score
         
+        # Learn from this run (O(1) per metric)
+        self.update_baselines(health_report)
+        
         return health_report
     
+    def evaluate_thresholds(self, checks: Dict) -> List[Dict]:
+        """Check every configured threshold rule against this run's metrics in one pass."""
+        metrics = extract_health_metrics({"checks": checks})
+        
+        found_events = checks.get("core_tracking", {}).get("found_events")
+        if found_events is not None:
+            # The core check saw every event in its window, so absent ones really are zero
+            metrics.update({m: 0.0 for m in self.rules.metrics if m.startswith("events.")})
+            metrics.update(event_metrics(found_events))
+        
+        return self.rules.evaluate(metrics)
+    
+    def update_baselines(self, health_report: Dict):
+        """Fold a health report's metrics into the baselines and persist them."""
+        when = datetime.datetime.fromisoformat(health_report["timestamp"])
+        metrics = extract_health_metrics(health_report)
+        snapshot_at = health_report.get("snapshot_at")
+        
+        try:
+            with edit_baselines(BASELINE_PATH) as baselines:
+                baselines.update_run(metrics, when, snapshot_at)
+            # Also picks up updates other runs saved since this one loaded
+            self.baselines = baselines
+        except OSError as e:
+            self.baselines.update_run(metrics, when, snapshot_at)
+            print(f"⚠️  Could not save baselines: {str(e)}")
+    
     def _generate_recommendations(self, checks: Dict) -> List[str]:
         """Generate actionable recommendations based on health check results."""
         recommendations = []
@@ -450,6 +456,10 @@ class PRTDHealthChecker:
         if funnel.get("click_rate", 0) < 10:
             recommendations.append("🎯 Improve deal card design to increase click rate")
         
+        for deal in funnel.get("deal_funnel", {}).get("underperformers", [])[:3]:
+            recommendations.append(f"🔍 Review {deal['deal']}: {deal['conversion_rate']}% conversion "
+                                   f"vs {deal['category_rate']}% for {deal['category']}")
+        
         # Real-time recommendations
         realtime = checks.get("realtime_tracking", {})
         if realtime.get("active_users", 0) == 0:
@@ -536,12 +546,7 @@ Full report available in the monitoring dashboard.
                 health_report = self.run_comprehensive_health_check()
                 
                 # Save report
-                timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
-                report_file = f"/home/deploy/prtd/health-check-{timestamp}.json"
-                
-                with open(report_file, 'w') as f:
-                    json.dump(health_report, f, indent=2)
-                
+                report_file = save_health_report(health_report)
                 print(f"📁 Health report saved: {report_file}")
                 
                 # Wait for next check
@@ -555,8 +560,34 @@ Full report available in the monitoring dashboard.
                 print(f"❌ Health check failed: {str(e)}")
                 time.sleep(60)  # Wait 1 minute before retry
 
+def save_health_report(health_report: Dict) -> str:
+    """Queue a health report for the background writer; it is indexed once on disk."""
+    timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    report_file = f"/home/deploy/prtd/health-check-{timestamp}.json"
+    
+    return get_writer().submit(
+        report_file, health_report,
+        on_written=lambda path, report: record_report("health", report, path)
+    )
+
+def backfill_baselines(pattern: str):
+    """Rebuild the baselines from archived health reports."""
+    with edit_baselines(BASELINE_PATH) as baselines:
+        report_count = backfill_from_reports(baselines, pattern)
+    
+    print(f"📈 Baselines fitted from {report_count} archived health reports")
+    print(f"📁 Saved: {BASELINE_PATH}")
+
 def main():
     """Main health check function."""
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill-baselines":
+        # Learn baselines from archived reports; no GA4 access needed
+        pattern = sys.argv[2] if len(sys.argv) > 2 else "/home/deploy/prtd/health-check-*.json*"
+        backfill_baselines(pattern)
+        return
+    
     # Configuration
     credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', '/home/deploy/prtd-ga4-credentials.json')
     property_id = os.getenv('GA4_PROPERTY_ID')
@@ -573,8 +604,6 @@ def main():
     health_checker = PRTDHealthChecker(property_id, credentials_path)
     
     # Parse command line arguments
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "continuous":
         # Continuous monitoring mode
         interval = int(sys.argv[2]) if len(sys.argv) > 2 else 60
@@ -584,12 +613,7 @@ def main():
         health_report = health_checker.run_comprehensive_health_check()
         
         # Save report
-        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
-        report_file = f"/home/deploy/prtd/health-check-{timestamp}.json"
-        
-        with open(report_file, 'w') as f:
-            json.dump(health_report, f, indent=2)
-        
+        report_file = save_health_report(health_report)
         print(f"\n📁 Health report saved: {report_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Click Log Ingestion for PRTD
+Tails the app log for /api/track-click entries and stores per-deal, per-minute counts
+"""
+
+import os
+import sys
+import time
+import argparse
+import datetime
+
+from prtd_analytics.clicklog import APP_LOG_PATH, CLICK_DB_PATH, ClickStore
+from prtd_analytics.deals import DealCatalog
+
+def show_top_deals(store: ClickStore, minutes: int, limit: int):
+    """Print the most clicked deals over the last few minutes."""
+    until = datetime.datetime.now(datetime.timezone.utc)
+    since = until - datetime.timedelta(minutes=minutes)
+    top = store.top_deals(since, until, limit)
+
+    print(f"\n🖱️  Top deals by first-party clicks (last {minutes} minutes)")
+    print("=" * 60)
+    if not top:
+        print("ℹ️  No clicks recorded")
+        return
+
+    catalog = DealCatalog()
+    for deal_id, slug, clicks in top:
+        label = catalog.label(deal_id) if catalog.get(deal_id) else catalog.label(slug or deal_id)
+        print(f"  • {label}: {clicks} clicks")
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Ingest first-party deal clicks from the app log")
+    parser.add_argument("--log", default=APP_LOG_PATH, help=f"log file (default {APP_LOG_PATH})")
+    parser.add_argument("--db", default=CLICK_DB_PATH, help="click count database")
+    parser.add_argument("--follow", action="store_true", help="keep tailing the log")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between reads with --follow")
+    parser.add_argument("--top", type=int, default=10, help="deals to show after ingesting (0 for none)")
+    parser.add_argument("--minutes", type=int, default=60, help="window for --top")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"❌ Log file not found: {args.log}")
+        sys.exit(1)
+
+    store = ClickStore(args.db)
+    try:
+        while True:
+            started = time.perf_counter()
+            result = store.ingest(args.log)
+            elapsed = time.perf_counter() - started
+
+            if result["rotated"] or result["truncated"]:
+                print(f"🔄 {args.log} was rotated; reading it from the start")
+            if result["clicks"] or result["skipped"] or not args.follow:
+                print(f"✅ {result['clicks']} clicks ingested in {elapsed * 1000:.0f} ms "
+                      f"(offset {result['offset']:,})")
+            if result["skipped"]:
+                print(f"⚠️  {result['skipped']} click entries had no deal or timestamp")
+
+            if not args.follow:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n⏹️  Ingestion stopped by user")
+    finally:
+        if args.top:
+            show_top_deals(store, args.minutes, args.top)
+        store.close()
+
+if __name__ == "__main__":
+    main()
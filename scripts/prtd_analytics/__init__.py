@@ -0,0 +1,31 @@
+"""
+Shared Analytics Helpers for PRTD
+Common plumbing used by the GA4 monitoring and validation scripts
+"""
+
+import os
+import importlib.util
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+# Where reports, caches and sockets live on the deploy host
+DATA_DIR = Path(os.getenv('PRTD_DATA_DIR', '/home/deploy/prtd'))
+
+DEFAULT_CREDENTIALS_PATH = '/home/deploy/prtd-ga4-credentials.json'
+
+_loaded_scripts = {}
+
+def load_script(filename: str):
+    """Import one of the hyphenated scripts in scripts/ as a module."""
+    if filename in _loaded_scripts:
+        return _loaded_scripts[filename]
+    
+    path = SCRIPTS_DIR / filename
+    module_name = "prtd_script_" + path.stem.replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    
+    _loaded_scripts[filename] = module
+    return module
@@ -0,0 +1,159 @@
+"""
+Ad-hoc Local Queries for PRTD
+Group-by, filter and top-N over exported columnar datasets, without calling GA4
+"""
+
+import re
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from prtd_analytics.columnar import DATASET_DIR, open_dataset, read_table
+from prtd_analytics.query import FilterSpec, OrderSpec
+
+AGGREGATES = ("sum", "max", "min", "mean", "count")
+
+# CLI filter operators, in the order they are tried
+OPERATORS = (
+    ("^=", "begins_with"),
+    ("$=", "ends_with"),
+    ("*=", "contains"),
+    ("~=", "partial_regexp"),
+    ("=", "exact"),
+)
+
+@dataclass(frozen=True)
+class Measure:
+    """One aggregated column; `count` counts rows and needs no column."""
+    column: str
+    function: str = "sum"
+
+    def __post_init__(self):
+        if self.function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {self.function}")
+
+    @property
+    def name(self) -> str:
+        if self.function == "count":
+            return "count"
+        return self.column if self.function == "sum" else f"{self.function}({self.column})"
+
+@dataclass(frozen=True)
+class LocalQuery:
+    """What to group, measure, filter and rank in one exported dataset."""
+    dataset: str
+    group_by: Tuple[str, ...] = ()
+    measures: Tuple[Measure, ...] = ()
+    filters: Tuple[FilterSpec, ...] = ()
+    order_by: Tuple[OrderSpec, ...] = ()
+    limit: int = 0
+    since: Optional[str] = None
+    until: Optional[str] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "group_by", tuple(column_name(c) for c in self.group_by))
+        object.__setattr__(self, "measures", tuple(self.measures))
+        object.__setattr__(self, "filters", tuple(self.filters))
+        object.__setattr__(self, "order_by", tuple(self.order_by))
+
+def column_name(field_name: str) -> str:
+    """Dataset column for a GA4 field; exports drop the customEvent: prefix."""
+    return field_name.replace("customEvent:", "")
+
+def parse_measure(text: str) -> Measure:
+    """'eventCount', 'max:totalUsers' or 'count'."""
+    if text == "count":
+        return Measure("", "count")
+    function, _, column = text.rpartition(":")
+    return Measure(column_name(column), function or "sum")
+
+def parse_filter(text: str) -> FilterSpec:
+    """'eventName=click_external_deal', 'slug^=marriott', 'eventName=view_item,select_item', ..."""
+    for operator, match in OPERATORS:
+        field_name, found, value = text.partition(operator)
+        if found and re.fullmatch(r"[\w:]+", field_name.strip()):
+            field_name, value = column_name(field_name.strip()), value.strip()
+            if match == "exact" and "," in value:
+                return FilterSpec(field_name, [v.strip() for v in value.split(",")], match="in_list")
+            return FilterSpec(field_name, (value,), match=match)
+    raise ValueError(f"Cannot parse filter: {text}")
+
+def parse_order(text: str) -> OrderSpec:
+    """'-eventCount' for descending, 'slug' for ascending."""
+    return OrderSpec(column_name(text.lstrip("-")), desc=text.startswith("-"))
+
+def filter_expression(spec: FilterSpec) -> ds.Expression:
+    """A FilterSpec as a scan predicate, so it is applied while reading."""
+    column = ds.field(column_name(spec.field))
+    if spec.match == "in_list":
+        return column.isin(list(spec.values))
+    if spec.match == "exact":
+        return column == spec.values[0]
+
+    # String kernels do not take dictionary-encoded columns directly
+    text = column.cast(pa.string())
+    value = spec.values[0]
+    if spec.match == "begins_with":
+        return pc.starts_with(text, pattern=value)
+    if spec.match == "ends_with":
+        return pc.ends_with(text, pattern=value)
+    if spec.match == "contains":
+        return pc.match_substring(text, pattern=value)
+    if spec.match == "full_regexp":
+        return pc.match_substring_regex(text, pattern=f"^(?:{value})$")
+    return pc.match_substring_regex(text, pattern=value)
+
+def _decoded(table: pa.Table, columns: Sequence[str]) -> pa.Table:
+    """Dictionary columns as plain strings; sorting does not support dictionaries."""
+    for column in columns:
+        index = table.schema.get_field_index(column)
+        if pa.types.is_dictionary(table.schema.field(index).type):
+            table = table.set_column(index, column, pc.cast(table.column(column), pa.string()))
+    return table
+
+def _result_names(names: Sequence[str], group_by: Sequence[str], measures: Sequence[Measure]) -> list:
+    """Map pyarrow's '<column>_<function>' output names to measure names."""
+    generated = {("count_all" if m.function == "count" else f"{m.column}_{m.function}"): m.name for m in measures}
+    return [name if name in group_by else generated.get(name, name) for name in names]
+
+def run_query(query: LocalQuery, root: Path = DATASET_DIR) -> pa.Table:
+    """Scan only the needed columns and days, then aggregate and rank the result."""
+    schema = open_dataset(query.dataset, root).schema
+    measures = query.measures or (Measure("eventCount") if "eventCount" in schema.names else Measure("", "count"),)
+
+    # Filter columns are evaluated during the scan and need not be read out
+    columns = list(query.group_by)
+    columns += [m.column for m in measures if m.function != "count" and m.column not in columns]
+    referenced = columns + [column_name(f.field) for f in query.filters]
+    missing = [c for c in referenced if c not in schema.names]
+    if missing:
+        raise ValueError(f"Unknown column(s) in {query.dataset}: {', '.join(sorted(set(missing)))}. "
+                         f"Available: {', '.join(schema.names)}")
+
+    expression = None
+    for spec in query.filters:
+        predicate = filter_expression(spec)
+        expression = predicate if expression is None else expression & predicate
+
+    # A bare row count still has to read something; the partition column is free
+    table = read_table(query.dataset, query.since, query.until, columns or ["date"], root, filter=expression)
+
+    # Group on the dictionary codes (one shared dictionary per column across files)
+    # and decode only the aggregated rows
+    aggregations = [([], "count_all") if m.function == "count" else (m.column, m.function) for m in measures]
+    result = table.unify_dictionaries().group_by(list(query.group_by)).aggregate(aggregations)
+    result = _decoded(result, query.group_by)
+    result = result.rename_columns(_result_names(result.column_names, query.group_by, measures))
+    result = result.select(list(query.group_by) + [m.name for m in measures])
+
+    order = query.order_by or (OrderSpec(measures[0].name),)
+    unknown = [o.field for o in order if o.field not in result.column_names]
+    if unknown:
+        raise ValueError(f"Cannot order by {', '.join(unknown)}; choose from {', '.join(result.column_names)}")
+    result = result.sort_by([(o.field, "descending" if o.desc else "ascending") for o in order])
+
+    return result.slice(0, query.limit) if query.limit else result
@@ -0,0 +1,186 @@
+"""
+Partner Attribution Rollups for PRTD
+Collects partner × source/medium × campaign × event counts and rolls them up per window
+"""
+
+import functools
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from prtd_analytics.query import PAGE_SIZE, ReportSpec, event_filter
+from prtd_analytics.sampling import fetch_exact
+
+# vendor_id is the registered partner dimension, sent with every deal event as the
+# lowercased, underscored partner name
+ATTRIBUTION_DIMENSIONS = ("date", "customEvent:vendor_id", "sourceMedium", "campaignName", "eventName")
+
+# Values GA4 reports when a dimension was not sent
+UNSET_VALUES = {'', '(not set)'}
+
+# Columns that can be rolled up, in ATTRIBUTION_DIMENSIONS order after date
+ROLLUP_KEYS = ("partner", "source_medium", "campaign", "event")
+
+def attribution_spec(days_back: int = 7, events: Sequence[str] = ()) -> ReportSpec:
+    """Attribution rows for the last `days_back` days, optionally for some events only."""
+    return ReportSpec(
+        dimensions=ATTRIBUTION_DIMENSIONS,
+        metrics=("eventCount",),
+        date_range=(f"{days_back}daysAgo", "today"),
+        filters=(event_filter(*events),) if events else ()
+    )
+
+@dataclass(frozen=True)
+class SourceMedium:
+    """A parsed 'source / medium' value."""
+    raw: str
+    source: str
+    medium: str
+
+    @property
+    def is_prtd(self) -> bool:
+        """Traffic tagged by PRTD links (utm_source=prtd or utm_medium=partner)."""
+        return 'prtd' in self.source.lower() or 'partner' in self.medium.lower()
+
+@functools.lru_cache(maxsize=4096)
+def parse_source_medium(value: str) -> SourceMedium:
+    """Split 'source / medium' once per distinct value."""
+    source, _, medium = value.partition(" / ")
+    return SourceMedium(value, source.strip(), medium.strip())
+
+class _Interner:
+    """Maps distinct strings to dense integer ids."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+class AttributionLedger:
+    """Daily event counts keyed by interned partner, source/medium, campaign and event."""
+
+    def __init__(self):
+        self.dates = _Interner()
+        self.columns = {key: _Interner() for key in ROLLUP_KEYS}
+        self._rows: List[tuple] = []
+        self._arrays = None
+        self.quality: Optional[Dict] = None
+
+    def add(self, date: str, partner: str, source_medium: str, campaign: str, event: str, count: int):
+        """Record one report row."""
+        self._rows.append((
+            self.dates(date),
+            self.columns["partner"](partner),
+            self.columns["source_medium"](source_medium),
+            self.columns["campaign"](campaign),
+            self.columns["event"](event),
+            count
+        ))
+        self._arrays = None
+
+    @classmethod
+    def from_rows(cls, rows) -> "AttributionLedger":
+        """Build from report rows with ATTRIBUTION_DIMENSIONS and one eventCount metric."""
+        return cls.from_values(
+            ([d.value for d in row.dimension_values], (row.metric_values[0].value,)) for row in rows
+        )
+
+    @classmethod
+    def from_values(cls, rows) -> "AttributionLedger":
+        """Build from (dimension values, (eventCount,)) tuples."""
+        ledger = cls()
+        for dimensions, metrics in rows:
+            ledger.add(*dimensions, int(metrics[0]))
+        return ledger
+
+    @classmethod
+    def fetch(cls, client, property_name: str, days_back: int = 7,
+              events: Sequence[str] = (), page_size: int = PAGE_SIZE) -> "AttributionLedger":
+        """Every attribution row for the last `days_back` days, fetched exactly via fetch_exact."""
+        exact = fetch_exact(client, property_name, attribution_spec(days_back, events), page_size=page_size)
+        ledger = cls.from_values(exact.rows)
+        ledger.quality = exact.quality()
+        return ledger
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """Column arrays over all rows, built once per batch of additions."""
+        if self._arrays is None:
+            table = np.array(self._rows, dtype=np.int64).reshape(-1, len(ROLLUP_KEYS) + 2)
+            day_numbers = np.array(
+                [datetime.datetime.strptime(d, "%Y%m%d").toordinal() for d in self.dates.values],
+                dtype=np.int64
+            )
+            self._arrays = {
+                "day": day_numbers[table[:, 0]] if len(table) else table[:, 0],
+                **{key: table[:, i + 1] for i, key in enumerate(ROLLUP_KEYS)},
+                "count": table[:, -1]
+            }
+        return self._arrays
+
+    def _mask(self, since: Optional[str], until: Optional[str], events: Sequence[str]) -> np.ndarray:
+        """Rows inside [since, until] (ISO dates, inclusive) for the given events."""
+        columns = self._columns()
+        mask = np.ones(len(columns["count"]), dtype=bool)
+
+        if since:
+            mask &= columns["day"] >= datetime.date.fromisoformat(since).toordinal()
+        if until:
+            mask &= columns["day"] <= datetime.date.fromisoformat(until).toordinal()
+        if events:
+            event_ids = [self.columns["event"].ids[e] for e in events if e in self.columns["event"].ids]
+            mask &= np.isin(columns["event"], event_ids)
+
+        return mask
+
+    def rollup(self, by: str, since: Optional[str] = None, until: Optional[str] = None,
+               events: Sequence[str] = ()) -> Dict[str, Dict]:
+        """Total and per-event counts for each partner, source_medium or campaign in a window."""
+        columns = self._columns()
+        mask = self._mask(since, until, events)
+
+        keys = columns[by][mask]
+        event_ids = columns["event"][mask]
+        counts = columns["count"][mask]
+
+        n_keys = len(self.columns[by].values)
+        n_events = len(self.columns["event"].values)
+        matrix = np.bincount(keys * n_events + event_ids, weights=counts,
+                             minlength=n_keys * n_events).reshape(n_keys, n_events).astype(np.int64)
+        totals = matrix.sum(axis=1)
+
+        event_names = self.columns["event"].values
+        return {
+            self.columns[by].values[k]: {
+                "total_events": int(totals[k]),
+                "events": {event_names[e]: int(matrix[k, e]) for e in np.flatnonzero(matrix[k])}
+            }
+            for k in np.flatnonzero(totals)
+        }
+
+    def summary(self, since: Optional[str] = None, until: Optional[str] = None,
+                events: Sequence[str] = ()) -> Dict:
+        """Partner, campaign and source/medium rollups for one window."""
+        partners = self.rollup("partner", since, until, events)
+        sources = self.rollup("source_medium", since, until, events)
+        campaigns = self.rollup("campaign", since, until, events)
+
+        attributed = {k: v for k, v in partners.items() if k not in UNSET_VALUES}
+        prtd_sources = {k: v for k, v in sources.items() if parse_source_medium(k).is_prtd}
+
+        return {
+            "total_events": sum(v["total_events"] for v in sources.values()),
+            "total_attributed_events": sum(v["total_events"] for v in attributed.values()),
+            "partners": attributed,
+            "campaigns": {k: v for k, v in campaigns.items() if k not in UNSET_VALUES},
+            "source_medium": sources,
+            "prtd_sources": prtd_sources,
+            "data_quality": self.quality
+        }
@@ -0,0 +1,127 @@
+"""
+Shared GA4 Credentials for PRTD
+Service account credentials backed by a cross-process access-token cache
+"""
+
+import os
+import json
+import fcntl
+import datetime
+import contextlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from google.auth import _helpers
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+from prtd_analytics import DATA_DIR
+
+DEFAULT_TOKEN_CACHE_PATH = os.getenv('PRTD_TOKEN_CACHE', str(DATA_DIR / '.ga4-token-cache.json'))
+
+# Cached tokens closer than this to expiry are treated as stale, on top of the
+# refresh threshold google-auth already applies before each request
+EXPIRY_MARGIN = _helpers.REFRESH_THRESHOLD + datetime.timedelta(minutes=1)
+
+class TokenCache:
+    """File-locked store of bearer tokens keyed by account and scopes."""
+
+    def __init__(self, path: str = DEFAULT_TOKEN_CACHE_PATH):
+        self.path = Path(path)
+        self.lock_path = Path(f"{path}.lock")
+
+    @contextlib.contextmanager
+    def locked(self, exclusive: bool = True):
+        """Hold the cache lock; writers take it exclusively."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[Tuple[str, datetime.datetime]]:
+        """Return (token, expiry) if a usable token is cached. Caller holds the lock."""
+        entry = self._read().get(key)
+        if not entry:
+            return None
+
+        expiry = datetime.datetime.fromisoformat(entry["expiry"])
+        if expiry - EXPIRY_MARGIN <= _helpers.utcnow():
+            return None
+
+        return entry["token"], expiry
+
+    def put(self, key: str, token: str, expiry: datetime.datetime):
+        """Store a token, dropping expired entries. Caller holds the exclusive lock."""
+        now = _helpers.utcnow()
+        entries = {
+            k: v for k, v in self._read().items()
+            if datetime.datetime.fromisoformat(v["expiry"]) > now
+        }
+        entries[key] = {"token": token, "expiry": expiry.isoformat()}
+
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+class CachedCredentials(service_account.Credentials):
+    """Service account credentials that share minted tokens across processes."""
+
+    token_cache = TokenCache()
+
+    def _token_cache_key(self) -> str:
+        mode = "jwt" if self._always_use_jwt_access else "oauth"
+        scopes = " ".join(sorted(self._scopes or self._default_scopes or []))
+        return f"{self.service_account_email}|{self._token_uri}|{mode}|{scopes}"
+
+    def load_cached_token(self) -> bool:
+        """Adopt a still-valid cached token, if any."""
+        try:
+            with self.token_cache.locked(exclusive=False):
+                cached = self.token_cache.get(self._token_cache_key())
+        except OSError:
+            return False
+
+        if cached:
+            self.token, self.expiry = cached
+        return cached is not None
+
+    def refresh(self, request):
+        """Reuse a cached token, or mint one while other processes wait for it."""
+        key = self._token_cache_key()
+
+        try:
+            with self.token_cache.locked():
+                cached = self.token_cache.get(key)
+                if cached:
+                    self.token, self.expiry = cached
+                    return
+
+                super().refresh(request)
+                self.token_cache.put(key, self.token, self.expiry)
+        except OSError:
+            # Cache directory unavailable (e.g. local dev); fall back to a private token
+            super().refresh(request)
+
+def load_credentials(credentials_path: str, scopes: List[str]) -> CachedCredentials:
+    """Load service account credentials primed from the shared token cache."""
+    credentials = CachedCredentials.from_service_account_file(credentials_path, scopes=scopes)
+    credentials.load_cached_token()
+    return credentials
+
+def get_access_token(credentials: CachedCredentials) -> str:
+    """Return a valid bearer token, refreshing through the cache only when needed."""
+    if not credentials.valid:
+        credentials.refresh(Request())
+    return credentials.token
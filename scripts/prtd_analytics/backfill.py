@@ -0,0 +1,236 @@
+"""
+Date-Sharded Backfill for PRTD
+Fetches long date ranges as day/week shards in parallel, resumable via a checkpoint
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as api_exceptions
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.query import ReportSpec, canonical_hash, event_filter, field_filter, report
+from prtd_analytics.sampling import ExactFetcher
+from prtd_analytics.funnel import deal_funnel_spec
+from prtd_analytics.attribution import attribution_spec
+
+BACKFILL_DIR = DATA_DIR / 'backfill'
+
+DEFAULT_CONCURRENCY = 4      # the Data API allows 10 concurrent requests per property
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 2.0
+
+# Errors worth retrying with backoff; anything else fails the shard immediately
+RETRYABLE_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+)
+
+# Report definitions that can be backfilled; the date range is replaced per shard
+BACKFILL_REPORTS: Dict[str, ReportSpec] = {
+    "events": report(dimensions=["date", "eventName"], metrics=["eventCount", "totalUsers"]),
+    "deal_funnel": deal_funnel_spec(),
+    "attribution": attribution_spec(),
+    # The breakdowns show-basic-tracking.py and show-engagement-data.py query live
+    "deals": report(
+        dimensions=["date", "eventName", "customEvent:slug", "customEvent:deal_id", "customEvent:category",
+                    "customEvent:vendor_id", "customEvent:cta_id"],
+        metrics=["eventCount", "totalUsers"]
+    ),
+    # The app sends every content interaction as content_engagement, telling image,
+    # text and section ones apart by interaction_type; one report per view keeps
+    # each under GA4's nine-dimension limit
+    "engagement": report(
+        dimensions=["date", "eventName", "customEvent:slug", "customEvent:category",
+                    "customEvent:interaction_type", "customEvent:content_piece",
+                    "customEvent:engagement_quality"],
+        metrics=["eventCount"],
+        filters=[event_filter("content_engagement")]
+    ),
+    "image_engagement": report(
+        dimensions=["date", "eventName", "customEvent:slug", "customEvent:interaction_type",
+                    "customEvent:image_index", "customEvent:view_duration"],
+        metrics=["eventCount"],
+        filters=[event_filter("content_engagement"),
+                 field_filter("customEvent:interaction_type", "image_", match="begins_with")]
+    ),
+    "section_engagement": report(
+        dimensions=["date", "eventName", "customEvent:slug", "customEvent:interaction_type",
+                    "customEvent:content_piece", "customEvent:time_in_section",
+                    "customEvent:interaction_count"],
+        metrics=["eventCount", "totalUsers"],
+        filters=[event_filter("content_engagement"),
+                 field_filter("customEvent:interaction_type", "section_engagement")]
+    ),
+    "engagement_scores": report(
+        dimensions=["date", "eventName", "customEvent:slug", "customEvent:engagement_score",
+                    "customEvent:engagement_quality"],
+        metrics=["eventCount"],
+        filters=[event_filter("engagement_quality_score")]
+    ),
+}
+
+def date_shards(start: datetime.date, end: datetime.date, shard: str = "day") -> List[Tuple[datetime.date, datetime.date]]:
+    """Split [start, end] into inclusive day or ISO-week ranges."""
+    shards = []
+    current = start
+    while current <= end:
+        if shard == "week":
+            shard_end = min(current + datetime.timedelta(days=6 - current.weekday()), end)
+        else:
+            shard_end = current
+        shards.append((current, shard_end))
+        current = shard_end + datetime.timedelta(days=1)
+    return shards
+
+def shard_spec(spec: ReportSpec, start: datetime.date, end: datetime.date) -> ReportSpec:
+    """The report restricted to one shard, keeping a date dimension so days stay separable."""
+    dimensions = spec.dimensions if "date" in spec.dimensions else ("date",) + spec.dimensions
+    return spec.with_changes(dimensions=dimensions, date_range=(start.isoformat(), end.isoformat()))
+
+def _write_json_atomic(path: Path, payload: Dict):
+    """Write JSON through a temp file and rename so readers never see a partial file."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+class Backfill:
+    """One report backfilled over a date range into BACKFILL_DIR/<name>/."""
+
+    def __init__(self, client, property_name: str, name: str, spec: ReportSpec,
+                 output_dir: Path = BACKFILL_DIR, shard: str = "day",
+                 concurrency: int = DEFAULT_CONCURRENCY):
+        self.client = client
+        self.property_name = property_name
+        self.name = name
+        self.spec = spec
+        self.shard = shard
+        self.concurrency = concurrency
+        self.output_dir = Path(output_dir) / name
+        self.checkpoint_path = self.output_dir / 'checkpoint.json'
+        self.spec_hash = canonical_hash(property_name, spec)
+        self._lock = threading.Lock()
+        self.fetcher = ExactFetcher(client, property_name, concurrency=2)
+        self.completed: Dict[str, Dict] = {}
+
+    def shard_path(self, start: datetime.date, end: datetime.date) -> Path:
+        return self.output_dir / f"{start.isoformat()}_{end.isoformat()}.json"
+
+    def load_checkpoint(self, restart: bool = False):
+        """Resume from the checkpoint unless it belongs to a different report definition."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if restart or not self.checkpoint_path.exists():
+            self.completed = {}
+            return
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        if checkpoint.get("spec_hash") != self.spec_hash or checkpoint.get("shard") != self.shard:
+            raise ValueError(f"Checkpoint in {self.output_dir} was written for a different report "
+                             "definition or shard size; rerun with --restart")
+
+        # Only trust shards whose files actually made it to disk
+        self.completed = {key: info for key, info in checkpoint.get("completed", {}).items()
+                          if (self.output_dir / info["file"]).exists()}
+
+    def _save_checkpoint(self):
+        _write_json_atomic(self.checkpoint_path, {
+            "report": self.name,
+            "property": self.property_name,
+            "spec": self.spec.to_dict(),
+            "spec_hash": self.spec_hash,
+            "shard": self.shard,
+            "updated": datetime.datetime.now().isoformat(),
+            "completed": self.completed
+        })
+
+    def fetch_shard(self, start: datetime.date, end: datetime.date) -> Dict:
+        """Fetch every row of one shard, retrying transient API errors with backoff."""
+        spec = shard_spec(self.spec, start, end)
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                exact = self.fetcher.run(spec)
+                break
+            except RETRYABLE_ERRORS:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+
+        payload = {
+            "report": self.name,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "dimensions": list(spec.dimensions),
+            "metrics": list(spec.metrics),
+            "fetched_at": datetime.datetime.now().isoformat(),
+            "data_quality": exact.quality(),
+            "rows": [[list(dimensions), metrics] for dimensions, metrics in exact.rows]
+        }
+
+        path = self.shard_path(start, end)
+        _write_json_atomic(path, payload)
+
+        with self._lock:
+            self.completed[start.isoformat()] = {"file": path.name, "end": end.isoformat(),
+                                                 "rows": len(exact.rows), "exact": exact.exact}
+            self._save_checkpoint()
+
+        return self.completed[start.isoformat()]
+
+    def run(self, start: datetime.date, end: datetime.date, restart: bool = False) -> Dict:
+        """Fetch all pending shards in parallel. Returns counts of done, skipped and failed shards."""
+        self.load_checkpoint(restart)
+
+        shards = date_shards(start, end, self.shard)
+        pending = [(s, e) for s, e in shards
+                   if self.completed.get(s.isoformat(), {}).get("end") != e.isoformat()]
+        print(f"📦 {self.name}: {len(shards)} {self.shard} shards, "
+              f"{len(shards) - len(pending)} already done, {len(pending)} to fetch")
+
+        failed = {}
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.fetch_shard, s, e): (s, e) for s, e in pending}
+            for future in as_completed(futures):
+                s, e = futures[future]
+                try:
+                    info = future.result()
+                    done += 1
+                    flag = "✅" if info["exact"] else "⚠️  approximate,"
+                    print(f"  {flag} {s} → {e}: {info['rows']:,} rows ({done}/{len(pending)})")
+                except Exception as exc:
+                    failed[s.isoformat()] = str(exc)
+                    print(f"  ❌ {s} → {e}: {str(exc)}")
+
+        return {
+            "report": self.name,
+            "shards": len(shards),
+            "fetched": done,
+            "skipped": len(shards) - len(pending),
+            "failed": failed,
+            "output_dir": str(self.output_dir)
+        }
+
+def load_shards(name: str, output_dir: Path = BACKFILL_DIR, start: Optional[str] = None,
+                end: Optional[str] = None) -> List[Dict]:
+    """Read stored shards of a report, optionally limited to shards starting in [start, end]."""
+    shard_dir = Path(output_dir) / name
+    shards = []
+    for path in sorted(shard_dir.glob("*_*.json")):
+        shard_start = path.name.split("_")[0]
+        if (start and shard_start < start) or (end and shard_start > end):
+            continue
+        with open(path) as f:
+            shards.append(json.load(f))
+    return shards
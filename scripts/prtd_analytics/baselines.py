@@ -0,0 +1,253 @@
+"""
+Adaptive Health Baselines for PRTD
+Seasonal EWMA baselines per metric, day of week and hour of day
+"""
+
+import os
+import glob
+import fcntl
+import datetime
+import contextlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.writer import load_report
+
+BASELINE_PATH = DATA_DIR / 'health-baselines.npz'
+
+DEFAULT_ALPHA = 0.2          # weight of the newest observation in its weekday/hour slot
+MIN_SAMPLES = 4              # slots with fewer observations defer to static thresholds
+RELATIVE_STD_FLOOR = 0.05    # never treat a slot as tighter than ±5% of its mean
+SLOTS = (7, 24)              # day of week × hour of day
+
+# Scalar values tracked per health run: metric -> (check name, result key)
+HEALTH_METRICS = {
+    'core.total_events': ('core_tracking', 'total_events'),
+    'funnel.view_item': ('conversion_funnel', 'view_item_events'),
+    'funnel.click_rate': ('conversion_funnel', 'click_rate'),
+    'funnel.conversion_rate': ('conversion_funnel', 'conversion_rate'),
+    'realtime.active_users': ('realtime_tracking', 'active_users'),
+    'realtime.total_events': ('realtime_tracking', 'total_events'),
+    'attribution.total_events': ('partner_attribution', 'total_attributed_events'),
+}
+
+# Metrics read from the shared GA4 snapshot; re-runs on the same snapshot must not refold them
+SNAPSHOT_METRICS = tuple(metric for metric, (check_name, _) in HEALTH_METRICS.items()
+                         if check_name != 'realtime_tracking')
+
+def extract_health_metrics(health_report: Dict) -> Dict[str, float]:
+    """Pull the tracked scalar metrics out of a health report."""
+    checks = health_report.get('checks', {})
+    metrics = {}
+
+    for metric, (check_name, key) in HEALTH_METRICS.items():
+        value = checks.get(check_name, {}).get(key)
+        if isinstance(value, (int, float)):
+            metrics[metric] = float(value)
+
+    return metrics
+
+class BaselineModel:
+    """Exponentially weighted mean and variance for every metric/weekday/hour slot."""
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.metrics: List[str] = []
+        self.mean = np.zeros((0,) + SLOTS, dtype=np.float32)
+        self.var = np.zeros((0,) + SLOTS, dtype=np.float32)
+        self.count = np.zeros((0,) + SLOTS, dtype=np.uint32)
+        # fetched_at of the newest metrics snapshot folded in
+        self.snapshot_at = 0.0
+
+    def _index(self, metric: str) -> int:
+        """Row for a metric, adding an empty one the first time it is seen."""
+        if metric not in self.metrics:
+            self.metrics.append(metric)
+            empty = np.zeros((1,) + SLOTS)
+            self.mean = np.concatenate([self.mean, empty.astype(np.float32)])
+            self.var = np.concatenate([self.var, empty.astype(np.float32)])
+            self.count = np.concatenate([self.count, empty.astype(np.uint32)])
+        return self.metrics.index(metric)
+
+    def update(self, metric: str, value: float, when: datetime.datetime):
+        """Fold one observation into its slot in O(1)."""
+        slot = (self._index(metric), when.weekday(), when.hour)
+
+        if self.count[slot] == 0:
+            self.mean[slot] = value
+            self.var[slot] = 0.0
+        else:
+            diff = value - float(self.mean[slot])
+            increment = self.alpha * diff
+            self.mean[slot] += increment
+            self.var[slot] = (1 - self.alpha) * (float(self.var[slot]) + diff * increment)
+
+        self.count[slot] += 1
+
+    def update_many(self, values: Dict[str, float], when: datetime.datetime):
+        """Fold one run's metrics into the model."""
+        for metric, value in values.items():
+            self.update(metric, value, when)
+
+    def update_run(self, values: Dict[str, float], when: datetime.datetime,
+                   snapshot_at: Optional[float] = None):
+        """Fold one health run, skipping snapshot metrics already folded from the same snapshot."""
+        if snapshot_at is not None:
+            if snapshot_at <= self.snapshot_at:
+                values = {m: v for m, v in values.items() if m not in SNAPSHOT_METRICS}
+            else:
+                self.snapshot_at = snapshot_at
+        self.update_many(values, when)
+
+    def backfill(self, metric: str, timestamps: Iterable, values: Iterable):
+        """Fit slots from history in one vectorized pass, replacing what they held.
+
+        Produces the same means as feeding the observations through update()
+        in time order.
+        """
+        times = np.asarray(timestamps, dtype='datetime64[m]')
+        observed = np.asarray(values, dtype=np.float64)
+        if times.size == 0:
+            return
+
+        chronological = np.argsort(times, kind='stable')
+        times, observed = times[chronological], observed[chronological]
+
+        days = times.astype('datetime64[D]')
+        weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        hour = (times - days).astype('timedelta64[h]').astype(np.int64)
+        slot = weekday * SLOTS[1] + hour
+
+        # Group by slot while keeping time order within each slot
+        grouped = np.argsort(slot, kind='stable')
+        slot, observed = slot[grouped], observed[grouped]
+
+        n_slots = SLOTS[0] * SLOTS[1]
+        counts = np.bincount(slot, minlength=n_slots)
+        starts = np.cumsum(counts) - counts
+        rank = np.arange(slot.size) - starts[slot]
+        n = counts[slot]
+
+        # EWMA weights: the first observation seeds the slot, later ones decay by age
+        decay = 1 - self.alpha
+        weights = self.alpha * decay ** (n - 1 - rank)
+        first = rank == 0
+        weights[first] = decay ** (n[first] - 1)
+
+        mean = np.bincount(slot, weights=weights * observed, minlength=n_slots)
+        var = np.bincount(slot, weights=weights * (observed - mean[slot]) ** 2, minlength=n_slots)
+
+        index = self._index(metric)
+        seen = counts > 0
+        self.mean[index].reshape(-1)[seen] = mean[seen]
+        self.var[index].reshape(-1)[seen] = var[seen]
+        self.count[index].reshape(-1)[seen] = counts[seen]
+
+    def score(self, metric: str, value: float, when: datetime.datetime) -> Optional[Dict]:
+        """Deviation of a value from its slot baseline, or None while warming up."""
+        if metric not in self.metrics:
+            return None
+
+        slot = (self.metrics.index(metric), when.weekday(), when.hour)
+        samples = int(self.count[slot])
+        if samples < MIN_SAMPLES:
+            return None
+
+        expected = float(self.mean[slot])
+        std = max(float(np.sqrt(self.var[slot])), RELATIVE_STD_FLOOR * abs(expected), 1e-9)
+
+        return {
+            "expected": round(expected, 2),
+            "std": round(std, 2),
+            "z": round((value - expected) / std, 2),
+            "samples": samples
+        }
+
+    def save(self, path: Path = BASELINE_PATH):
+        """Write the model atomically as a compressed .npz."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            metrics=np.array(self.metrics, dtype=str),
+            alpha=np.array(self.alpha),
+            snapshot_at=np.array(self.snapshot_at),
+            mean=self.mean,
+            var=self.var,
+            count=self.count
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = BASELINE_PATH) -> "BaselineModel":
+        """Load a saved model, or start an empty one."""
+        model = cls()
+        if not os.path.exists(path):
+            return model
+
+        with np.load(path) as data:
+            model.alpha = float(data['alpha'])
+            model.metrics = [str(m) for m in data['metrics']]
+            model.mean = data['mean']
+            model.var = data['var']
+            model.count = data['count']
+            if 'snapshot_at' in data.files:
+                model.snapshot_at = float(data['snapshot_at'])
+
+        return model
+
+@contextlib.contextmanager
+def edit_baselines(path: Path = BASELINE_PATH):
+    """Load the saved model under an exclusive lock and save it on exit.
+
+    Cron runs and the daemon each hold the lock for their whole load-update-save,
+    so concurrent updates are applied in turn instead of overwriting each other.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path.with_name(f".{path.stem}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        model = BaselineModel.load(path)
+        yield model
+        model.save(path)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+def backfill_from_reports(model: BaselineModel, pattern: str) -> int:
+    """Fit the model from archived health-check JSON reports. Returns reports used."""
+    timestamps = []
+    columns = {metric: [] for metric in HEALTH_METRICS}
+    snapshots_seen = set()
+
+    for report_path in sorted(glob.glob(pattern)):
+        try:
+            health_report = load_report(report_path)
+        except (OSError, ValueError):
+            continue
+
+        if 'timestamp' not in health_report:
+            continue
+
+        metrics = extract_health_metrics(health_report)
+        snapshot_at = health_report.get('snapshot_at')
+        if snapshot_at is not None:
+            if snapshot_at in snapshots_seen:
+                metrics = {m: v for m, v in metrics.items() if m not in SNAPSHOT_METRICS}
+            snapshots_seen.add(snapshot_at)
+        timestamps.append(health_report['timestamp'][:16])
+        for metric in HEALTH_METRICS:
+            columns[metric].append(metrics.get(metric, np.nan))
+
+    times = np.array(timestamps, dtype='datetime64[m]')
+    for metric, values in columns.items():
+        values = np.array(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        if present.any():
+            model.backfill(metric, times[present], values[present])
+
+    return len(timestamps)
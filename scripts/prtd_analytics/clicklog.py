@@ -0,0 +1,252 @@
+"""
+First-Party Click Log Ingestion for PRTD
+Incrementally parses /api/track-click log lines into per-deal, per-minute counts
+"""
+
+import os
+import re
+import sqlite3
+import datetime
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from prtd_analytics import DATA_DIR
+
+# The Next.js service appends stdout here (deploy/systemd-prtd.service.example)
+APP_LOG_PATH = os.getenv('PRTD_APP_LOG', '/var/log/prtd/app.log')
+CLICK_DB_PATH = os.getenv('PRTD_CLICK_DB', str(DATA_DIR / 'clicks.sqlite'))
+
+MARKER = b"Deal click tracked:"
+
+# console.log prints the click object over several lines once it is long;
+# give up on an entry that never closes rather than buffering the whole log
+MAX_BLOCK_BYTES = 16384
+
+READ_SIZE = 1 << 20
+
+# Rows committed per transaction while catching up on a large log
+COMMIT_EVERY = 5000
+
+# `key: 'value'` pairs as printed by Node's util.inspect (JSON keys also match);
+# inspect switches to "..." or `...` when the value itself contains single quotes
+FIELD = re.compile(r"""["']?(\w+)["']?\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|`((?:[^`\\]|\\.)*)`|([\w.+:-]+))""")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS click_counts (
+    minute INTEGER NOT NULL,
+    deal_id TEXT NOT NULL,
+    slug TEXT,
+    clicks INTEGER NOT NULL,
+    PRIMARY KEY (minute, deal_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS log_offsets (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+@dataclass(frozen=True)
+class Click:
+    """One tracked click, reduced to the fields the counts need."""
+    deal_id: str
+    slug: str
+    minute: int                  # minutes since the Unix epoch, UTC
+
+def parse_click(text: str) -> Optional[Click]:
+    """Parse the object printed after the marker; None if it has no deal or timestamp."""
+    fields = {}
+    for match in FIELD.finditer(text):
+        key, *quoted, bare = match.groups()
+        value = next((v for v in quoted if v is not None), bare)
+        fields[key] = None if value in ("undefined", "null") else value
+        # Values are consumed whole, so a URL or user agent cannot fake a key;
+        # stop once the fields the counts need have been seen
+        if key == "timestamp":
+            break
+
+    deal_id = fields.get("dealId") or fields.get("dealSlug")
+    timestamp = fields.get("timestamp")
+    if not deal_id or not timestamp:
+        return None
+
+    try:
+        moment = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+
+    return Click(deal_id, fields.get("dealSlug") or "", int(moment.timestamp()) // 60)
+
+class ClickLogReader:
+    """Iterates click entries in a log from a byte offset.
+
+    The log is scanned in large chunks for the marker with bytes.find, so
+    unrelated output is never split into lines or decoded. `offset` always
+    points just past the last fully consumed entry or line, so an entry still
+    being written at end of file is re-read complete next time.
+    """
+
+    def __init__(self, path: str, offset: int = 0):
+        self.path = path
+        self.offset = offset
+
+    def __iter__(self) -> Iterator[Optional[Click]]:
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = b""
+
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    return
+                data += chunk
+                base = self.offset
+                position = 0
+
+                while True:
+                    start = data.find(MARKER, position)
+                    if start < 0:
+                        # Nothing pending: everything up to the last newline is consumed
+                        position = data.rfind(b"\n", position) + 1 or position
+                        break
+
+                    line_end = data.find(b"\n", start)
+                    if line_end < 0:
+                        break
+                    first_line = data[start + len(MARKER):line_end]
+                    if first_line.rstrip().endswith(b"}"):
+                        end = line_end + 1
+                    else:
+                        # util.inspect closes a multi-line object with "}" on its own line
+                        close = data.find(b"\n}\n", line_end)
+                        if close < 0 or close - start > MAX_BLOCK_BYTES:
+                            if close < 0 and len(data) - start <= MAX_BLOCK_BYTES:
+                                break
+                            # Never closed: skip the marker line and move on
+                            position = line_end + 1
+                            self.offset = base + position
+                            continue
+                        end = close + 3
+
+                    position = end
+                    self.offset = base + position
+                    yield parse_click(data[start + len(MARKER):end].decode("utf-8", "replace"))
+
+                if position:
+                    self.offset = base + position
+                    data = data[position:]
+
+class ClickStore:
+    """SQLite store of click counts per deal per minute, plus how far each log was read."""
+
+    def __init__(self, path: str = CLICK_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _offset(self, path: str) -> Optional[Tuple[int, int]]:
+        return self.conn.execute("SELECT inode, offset FROM log_offsets WHERE path = ?", (path,)).fetchone()
+
+    def _commit(self, counts: Counter, slugs: Dict[str, str], path: str, inode: int, offset: int):
+        """Counts and the new offset go in one transaction, so a crash never double-counts."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO click_counts (minute, deal_id, slug, clicks) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (minute, deal_id) DO UPDATE SET clicks = clicks + excluded.clicks, "
+                "slug = COALESCE(NULLIF(excluded.slug, ''), slug)",
+                [(minute, deal_id, slugs.get(deal_id, ""), clicks) for (minute, deal_id), clicks in counts.items()]
+            )
+            self.conn.execute(
+                "INSERT INTO log_offsets (path, inode, offset, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET inode = excluded.inode, offset = excluded.offset, "
+                "updated_at = excluded.updated_at",
+                (path, inode, offset, datetime.datetime.now().isoformat())
+            )
+
+    def _ingest_file(self, read_path: str, key_path: str, inode: int, offset: int) -> Dict:
+        reader = ClickLogReader(read_path, offset)
+        counts, slugs = Counter(), {}
+        clicks = skipped = 0
+        pending = 0
+
+        for click in reader:
+            if click is None:
+                skipped += 1
+                continue
+            counts[(click.minute, click.deal_id)] += 1
+            if click.slug:
+                slugs[click.deal_id] = click.slug
+            clicks += 1
+            pending += 1
+            if pending >= COMMIT_EVERY:
+                self._commit(counts, slugs, key_path, inode, reader.offset)
+                counts, slugs, pending = Counter(), {}, 0
+
+        self._commit(counts, slugs, key_path, inode, reader.offset)
+        return {"clicks": clicks, "skipped": skipped, "offset": reader.offset}
+
+    def ingest(self, path: str = APP_LOG_PATH) -> Dict:
+        """Read everything new in a log since the last call."""
+        stat = os.stat(path)
+        stored = self._offset(path)
+        result = {"clicks": 0, "skipped": 0, "rotated": False, "truncated": False}
+
+        offset = 0
+        if stored is not None:
+            inode, offset = stored
+            if inode != stat.st_ino:
+                # logrotate moved the old file aside; finish it before starting the new one
+                result["rotated"] = True
+                rotated = f"{path}.1"
+                if os.path.exists(rotated) and os.stat(rotated).st_ino == inode:
+                    finished = self._ingest_file(rotated, path, inode, offset)
+                    result["clicks"] += finished["clicks"]
+                    result["skipped"] += finished["skipped"]
+                offset = 0
+            elif stat.st_size < offset:
+                # copytruncate rotation
+                result["truncated"] = True
+                offset = 0
+
+        current = self._ingest_file(path, path, stat.st_ino, offset)
+        result["clicks"] += current["clicks"]
+        result["skipped"] += current["skipped"]
+        result["offset"] = current["offset"]
+        return result
+
+    def deal_minutes(self, since: datetime.datetime, until: datetime.datetime,
+                     deal_id: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        """(UTC minute ISO, deal id, clicks) rows in a time range."""
+        sql = "SELECT minute, deal_id, clicks FROM click_counts WHERE minute >= ? AND minute < ?"
+        params = [_epoch_minute(since), _epoch_minute(until)]
+        if deal_id:
+            sql += " AND deal_id = ?"
+            params.append(deal_id)
+        sql += " ORDER BY minute, deal_id"
+        return [(_minute_iso(minute), deal, clicks) for minute, deal, clicks in self.conn.execute(sql, params)]
+
+    def top_deals(self, since: datetime.datetime, until: datetime.datetime,
+                  limit: int = 10) -> List[Tuple[str, str, int]]:
+        """(deal id, slug, clicks) for the most clicked deals in a time range."""
+        return self.conn.execute(
+            "SELECT deal_id, MAX(slug), SUM(clicks) AS total FROM click_counts "
+            "WHERE minute >= ? AND minute < ? GROUP BY deal_id ORDER BY total DESC LIMIT ?",
+            (_epoch_minute(since), _epoch_minute(until), limit)
+        ).fetchall()
+
+def _epoch_minute(moment: datetime.datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return int(moment.timestamp()) // 60
+
+def _minute_iso(minute: int) -> str:
+    return datetime.datetime.fromtimestamp(minute * 60, datetime.timezone.utc).isoformat()[:16]
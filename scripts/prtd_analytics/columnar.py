@@ -0,0 +1,238 @@
+"""
+Columnar Dataset Export for PRTD
+Date-partitioned Parquet / Arrow IPC copies of report rows and run metrics
+"""
+
+import os
+import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from prtd_analytics import DATA_DIR
+
+DATASET_DIR = Path(os.getenv('PRTD_DATASET_DIR', str(DATA_DIR / 'datasets')))
+
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+PARQUET_COMPRESSION = 'zstd'
+
+# Hive-style date partitions: <dataset>/date=YYYY-MM-DD/<part>.<ext>
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+
+def _ga4_date(value: str) -> datetime.date:
+    """'20261018' -> date."""
+    return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+def _metric(value):
+    """Metric values arrive as numbers from fresh fetches or strings from protos."""
+    if isinstance(value, str):
+        return float(value) if any(c in value for c in ".eE") else int(value)
+    return value
+
+def _write_atomic(table: pa.Table, path: Path, fmt: str, compression: Optional[str]):
+    """Write one file via a temp name and rename so scans never see partial files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    if fmt == 'parquet':
+        pq.write_table(table, tmp_path, compression=compression or PARQUET_COMPRESSION)
+    else:
+        # Uncompressed IPC files can be memory-mapped and read without copying
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    os.replace(tmp_path, path)
+
+def _clear_day(directory: Path, keep: Optional[Path] = None):
+    """Delete a day partition's data files other than `keep`."""
+    if not directory.is_dir():
+        return
+    for path in directory.iterdir():
+        if path != keep and path.suffix in FORMATS.values() and not path.name.startswith('.'):
+            path.unlink()
+    if keep is None and not any(directory.iterdir()):
+        directory.rmdir()
+
+def _clear_unwritten(name: str, start: datetime.date, end: datetime.date, written: Iterable[Path],
+                     root: Path = DATASET_DIR):
+    """Clear the days in [start, end] that an export covered but wrote no file for."""
+    written = {path.parent for path in written}
+    for offset in range((end - start).days + 1):
+        directory = Path(root) / name / f"date={(start + datetime.timedelta(days=offset)).isoformat()}"
+        if directory not in written:
+            _clear_day(directory)
+
+def write_partitioned(table: pa.Table, name: str, part: str, fmt: str = 'parquet',
+                      compression: Optional[str] = None, root: Path = DATASET_DIR,
+                      replace: bool = False) -> List[Path]:
+    """Split a table with a 'date' column into one file per day under root/name.
+
+    `part` names the file inside each day's directory, so re-exporting the same
+    source replaces its files instead of duplicating rows. With `replace`, each
+    written day keeps only the new file; older parts and other formats are removed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    written = []
+    dates = table.column("date")
+    data = table.drop_columns(["date"])
+
+    for day in pc.unique(dates).to_pylist():
+        mask = pc.equal(dates, pa.scalar(day, pa.date32()))
+        path = Path(root) / name / f"date={day.isoformat()}" / f"{part}{FORMATS[fmt]}"
+        _write_atomic(data.filter(mask), path, fmt, compression)
+        if replace:
+            _clear_day(path.parent, keep=path)
+        written.append(path)
+
+    return written
+
+def rows_table(dimensions: Sequence[str], metrics: Sequence[str], rows: Iterable) -> pa.Table:
+    """Columnar table from [dimension values, metric values] rows.
+
+    The GA4 'date' dimension becomes a date32 column; other dimensions are
+    dictionary-encoded strings and metrics keep their numeric type.
+    """
+    dim_columns: List[List] = [[] for _ in dimensions]
+    metric_columns: List[List] = [[] for _ in metrics]
+
+    for dimension_values, metric_values in rows:
+        for column, value in zip(dim_columns, dimension_values):
+            column.append(value)
+        for column, value in zip(metric_columns, metric_values):
+            column.append(_metric(value))
+
+    arrays, names = [], []
+    for dimension, values in zip(dimensions, dim_columns):
+        names.append("date" if dimension == "date" else dimension.replace("customEvent:", ""))
+        if dimension == "date":
+            arrays.append(pa.array([_ga4_date(v) for v in values], pa.date32()))
+        else:
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+
+    for metric, values in zip(metrics, metric_columns):
+        names.append(metric)
+        arrays.append(pa.array(values) if values else pa.array([], pa.int64()))
+
+    return pa.Table.from_arrays(arrays, names=names)
+
+def export_shards(name: str, shards: Iterable[Dict], fmt: str = 'parquet',
+                  compression: Optional[str] = None, root: Path = DATASET_DIR) -> int:
+    """Export backfill shards (see prtd_analytics.backfill) as a date-partitioned dataset.
+
+    Every day a shard covers is rewritten whole, so re-exporting a range with a
+    different shard size or format replaces the old files instead of adding to them.
+    """
+    files = 0
+    for shard in shards:
+        start = datetime.date.fromisoformat(shard["start"])
+        end = datetime.date.fromisoformat(shard["end"])
+        written = []
+        if shard["rows"]:
+            table = rows_table(shard["dimensions"], shard["metrics"], shard["rows"])
+            written = write_partitioned(table, name, "backfill", fmt, compression, root, replace=True)
+            files += len(written)
+
+        # Days the shard covers without rows must not keep rows from an older export
+        _clear_unwritten(name, start, end, written, root)
+    return files
+
+def export_history(index, since: str, until: str, fmt: str = 'parquet',
+                   compression: Optional[str] = None, root: Path = DATASET_DIR) -> int:
+    """Export per-run metrics from the history index as the 'run_metrics' dataset.
+
+    `since` and `until` are inclusive ISO dates. Each day in the range is
+    rewritten whole, and days without runs are cleared, so repeated exports
+    stay deduplicated.
+    """
+    start = datetime.date.fromisoformat(since[:10])
+    until_day = datetime.date.fromisoformat(until[:10])
+    rows = index.conn.execute(
+        "SELECT m.run_at, m.kind, m.name, m.value, r.status "
+        "FROM metrics m JOIN runs r ON r.id = m.run_id "
+        "WHERE m.run_at >= ? AND m.run_at < ? ORDER BY m.run_at",
+        (start.isoformat(), (until_day + datetime.timedelta(days=1)).isoformat())
+    ).fetchall()
+    if not rows:
+        _clear_unwritten("run_metrics", start, until_day, [], root)
+        return 0
+
+    run_at = [datetime.datetime.fromisoformat(r[0]) for r in rows]
+    table = pa.table({
+        "date": pa.array([t.date() for t in run_at], pa.date32()),
+        "run_at": pa.array(run_at, pa.timestamp('s')),
+        "kind": pa.array([r[1] for r in rows], pa.string()).dictionary_encode(),
+        "metric": pa.array([r[2] for r in rows], pa.string()).dictionary_encode(),
+        "value": pa.array([r[3] for r in rows], pa.float64()),
+        "status": pa.array([r[4] for r in rows], pa.string()).dictionary_encode(),
+    })
+    written = write_partitioned(table, "run_metrics", "runs", fmt, compression, root, replace=True)
+    _clear_unwritten("run_metrics", start, until_day, written, root)
+    return len(written)
+
+def dataset_format(name: str, root: Path = DATASET_DIR) -> str:
+    """Format of an exported dataset, detected from its files."""
+    for fmt, extension in FORMATS.items():
+        if next((Path(root) / name).glob(f"date=*/*{extension}"), None):
+            return fmt
+    raise FileNotFoundError(f"No exported dataset named '{name}' in {root}")
+
+def open_dataset(name: str, root: Path = DATASET_DIR) -> ds.Dataset:
+    """Open an exported dataset with memory-mapped file access."""
+    fmt = dataset_format(name, root)
+    return ds.dataset(
+        str(Path(root) / name),
+        format='ipc' if fmt == 'arrow' else 'parquet',
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True
+    )
+
+def read_table(name: str, since: Optional[str] = None, until: Optional[str] = None,
+               columns: Optional[Sequence[str]] = None, root: Path = DATASET_DIR,
+               filter: Optional[ds.Expression] = None) -> pa.Table:
+    """Scan a dataset, pruning partitions to [since, until] (ISO dates, inclusive).
+
+    `filter` is pushed into the scan along with the date bounds.
+    """
+    expression = filter
+    if since:
+        lower = ds.field("date") >= pa.scalar(datetime.date.fromisoformat(since), pa.date32())
+        expression = lower if expression is None else expression & lower
+    if until:
+        upper = ds.field("date") <= pa.scalar(datetime.date.fromisoformat(until), pa.date32())
+        expression = upper if expression is None else expression & upper
+
+    return open_dataset(name, root).to_table(columns=list(columns) if columns else None, filter=expression)
+
+def list_datasets(root: Path = DATASET_DIR) -> Dict[str, Dict]:
+    """Exported datasets with their format, day count and size on disk."""
+    datasets = {}
+    if not Path(root).exists():
+        return datasets
+
+    for directory in sorted(Path(root).iterdir()):
+        days = sorted(p.name[5:] for p in directory.glob("date=*"))
+        if not days:
+            continue
+        size = sum(f.stat().st_size for f in directory.glob("date=*/*") if not f.name.startswith('.'))
+        datasets[directory.name] = {
+            "format": dataset_format(directory.name, root),
+            "days": len(days),
+            "first": days[0],
+            "last": days[-1],
+            "bytes": size
+        }
+    return datasets
@@ -0,0 +1,156 @@
+"""
+Warm Analytics Daemon for PRTD
+Keeps the health checker and validator loaded behind a Unix socket
+"""
+
+import io
+import os
+import json
+import time
+import socket
+import socketserver
+import threading
+import contextlib
+from typing import Dict, Optional
+
+from prtd_analytics import DATA_DIR, load_script
+
+DEFAULT_SOCKET_PATH = os.getenv('PRTD_DAEMON_SOCKET', str(DATA_DIR / 'analytics-daemon.sock'))
+
+class DaemonNotRunning(Exception):
+    """Raised by the client when nothing is listening on the socket."""
+
+def send_command(command: str, socket_path: str = DEFAULT_SOCKET_PATH,
+                 timeout: float = 300, **args) -> Dict:
+    """Send a single command to the daemon and return its reply."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        sock.close()
+        raise DaemonNotRunning(f"No analytics daemon listening on {socket_path}") from e
+
+    with sock:
+        request = {"command": command, "args": args}
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        reply = sock.makefile('rb').readline()
+
+    if not reply:
+        return {"ok": False, "error": "Daemon closed the connection without replying"}
+    return json.loads(reply)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON command per connection and writes one JSON reply."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            reply = {"ok": False, "error": "Malformed request"}
+        else:
+            reply = self.server.analytics_daemon.handle(request)
+
+        self.wfile.write(json.dumps(reply, default=str).encode() + b"\n")
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class AnalyticsDaemon:
+    def __init__(self, property_id: str, credentials_path: str,
+                 socket_path: str = DEFAULT_SOCKET_PATH,
+                 cache_ttl: Optional[int] = None):
+        """Load the checkers once so their clients and channels stay warm."""
+        self.socket_path = socket_path
+        self.started_at = time.time()
+
+        health_check = load_script('health-check.py')
+        validate_analytics = load_script('validate-analytics.py')
+        from prtd_analytics.metrics import METRICS_TTL
+
+        # A result outliving its cache must not be re-run on the snapshot it was built from
+        self.cache_ttl = max(cache_ttl or METRICS_TTL, METRICS_TTL)
+
+        self.health_checker = health_check.PRTDHealthChecker(property_id, credentials_path)
+        self.validator = validate_analytics.PRTDAnalyticsValidator(property_id, credentials_path)
+
+        self.commands = {
+            'health': self.health_checker.run_comprehensive_health_check,
+            'validate': self.validator.run_full_validation
+        }
+
+        # command -> {"at", "output", "result"}
+        self._cache = {}
+        # Checks share one GA4 client and redirect stdout, so run them one at a time
+        self._run_lock = threading.Lock()
+        self._server = None
+
+    def handle(self, request: Dict) -> Dict:
+        """Dispatch a decoded request to the matching command."""
+        command = request.get("command")
+        args = request.get("args") or {}
+
+        if command == "ping":
+            return {
+                "ok": True,
+                "result": {
+                    "pid": os.getpid(),
+                    "uptime_seconds": round(time.time() - self.started_at, 1),
+                    "cached": {name: round(time.time() - entry["at"], 1)
+                               for name, entry in self._cache.items()}
+                }
+            }
+
+        if command == "stop":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"ok": True, "result": "stopping"}
+
+        runner = self.commands.get(command)
+        if runner is None:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+
+        with self._run_lock:
+            cached = self._cache.get(command)
+            if cached and not args.get("fresh"):
+                age = time.time() - cached["at"]
+                if age < self.cache_ttl:
+                    return {
+                        "ok": True,
+                        "cached": True,
+                        "age_seconds": round(age, 1),
+                        "output": cached["output"],
+                        "result": cached["result"]
+                    }
+
+            buffer = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(buffer):
+                    result = runner(fresh=bool(args.get("fresh")))
+            except Exception as e:
+                return {"ok": False, "error": str(e), "output": buffer.getvalue()}
+
+            self._cache[command] = {
+                "at": time.time(),
+                "output": buffer.getvalue(),
+                "result": result
+            }
+
+        return {"ok": True, "cached": False, "output": buffer.getvalue(), "result": result}
+
+    def serve_forever(self):
+        """Listen on the Unix socket until stopped."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket from a previous run
+
+        self._server = _UnixServer(self.socket_path, _RequestHandler)
+        self._server.analytics_daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
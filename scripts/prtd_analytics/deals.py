@@ -0,0 +1,85 @@
+"""
+Deal Catalog Index for PRTD
+Joins analytics rows to data/deals.json by deal id or slug
+"""
+
+import os
+import json
+import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from prtd_analytics import SCRIPTS_DIR
+
+DEALS_PATH = Path(os.getenv('PRTD_DEALS_PATH', str(SCRIPTS_DIR.parent / 'data' / 'deals.json')))
+
+# Catalog fields carried into reports
+DEAL_FIELDS = ('id', 'slug', 'title', 'partner', 'category', 'location', 'price', 'currency',
+               'expiresAt', 'expiry')
+
+class DealCatalog:
+    """id→deal and slug→deal indexes, rebuilt only when deals.json changes."""
+
+    def __init__(self, path: Path = DEALS_PATH):
+        self.path = Path(path)
+        self.by_id: Dict[str, Dict] = {}
+        self.by_slug: Dict[str, Dict] = {}
+        self._signature = None
+
+    def refresh(self) -> bool:
+        """Reload if the file's mtime or size changed. Returns True when reloaded."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+
+        with open(self.path) as f:
+            deals = json.load(f)
+
+        by_id, by_slug = {}, {}
+        for deal in deals:
+            record = {field: deal.get(field) for field in DEAL_FIELDS}
+            record['title'] = (record['title'] or '').strip() or None
+            record['expiresAt'] = record['expiresAt'] or None
+            record['expiry'] = record['expiry'] or None
+            if record['id']:
+                by_id[record['id']] = record
+            if record['slug']:
+                by_slug[record['slug']] = record
+
+        self.by_id, self.by_slug = by_id, by_slug
+        self._signature = signature
+        return True
+
+    def get(self, key: Optional[str]) -> Optional[Dict]:
+        """Look up a deal by id or slug (no reload check; call refresh() per batch)."""
+        if not key:
+            return None
+        return self.by_id.get(key) or self.by_slug.get(key)
+
+    def enrich(self, records: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Attach catalog details under 'deal' to records keyed by deal id or slug."""
+        self.refresh()
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        for key, record in records.items():
+            deal = self.get(key)
+            if deal is not None:
+                # The site treats expiresAt as authoritative (see src/lib/dealUtils.ts)
+                expires = deal['expiresAt'] or deal['expiry']
+                deal = dict(deal, expired=bool(expires) and expires < now)
+            record['deal'] = deal
+
+        return records
+
+    def label(self, key: Optional[str]) -> str:
+        """Human-readable 'Title (Partner)' for a deal id or slug, falling back to the key."""
+        deal = self.get(key)
+        if deal is None:
+            return key or "unknown"
+        title = deal['title'] or key
+        return f"{title} ({deal['partner']})" if deal['partner'] else title
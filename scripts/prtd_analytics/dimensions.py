@@ -0,0 +1,151 @@
+"""
+Custom Dimension Reconciliation for PRTD
+Plans and applies custom dimension changes across GA4 properties in parallel
+"""
+
+import time
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from google.api_core import exceptions as api_exceptions
+from google.protobuf import field_mask_pb2
+from google.analytics.admin_v1beta.types import (
+    CustomDimension,
+    CreateCustomDimensionRequest,
+    UpdateCustomDimensionRequest
+)
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0           # Admin API writes per second across all workers
+DEFAULT_BURST = 5
+MAX_ATTEMPTS = 5
+
+# Fields that can be changed on an existing dimension; scope cannot
+MUTABLE_FIELDS = ("display_name", "description")
+
+class RateLimiter:
+    """Token bucket shared by worker threads."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+@dataclass
+class PlanItem:
+    """One change (or non-change) for one dimension on one property."""
+    property_id: str
+    parameter_name: str
+    action: str                          # create | update | unchanged | conflict
+    desired: Dict
+    existing: Optional[CustomDimension] = None
+    changes: List[str] = field(default_factory=list)
+    result: Optional[str] = None         # filled in by apply: ok | exists | error message
+
+    def describe(self) -> str:
+        if self.action == "update":
+            return f"{self.parameter_name}: update {', '.join(self.changes)}"
+        if self.action == "conflict":
+            return f"{self.parameter_name}: scope differs ({self.changes[0]}), needs manual change"
+        return f"{self.parameter_name}: {self.action}"
+
+def _call_with_retry(limiter: RateLimiter, call, *args, **kwargs):
+    """Rate-limited call with backoff on quota errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.acquire()
+        try:
+            return call(*args, **kwargs)
+        except (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests,
+                api_exceptions.ServiceUnavailable):
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(2 ** attempt)
+
+class DimensionReconciler:
+    """Lists, diffs and applies custom dimensions for many properties at once."""
+
+    def __init__(self, client, workers: int = DEFAULT_WORKERS, limiter: Optional[RateLimiter] = None):
+        self.client = client
+        self.workers = workers
+        self.limiter = limiter or RateLimiter()
+
+    def list_existing(self, property_ids: Sequence[str]) -> Dict[str, Dict[str, CustomDimension]]:
+        """Current custom dimensions per property, keyed by parameter name."""
+        def list_property(property_id):
+            dimensions = _call_with_retry(self.limiter, self.client.list_custom_dimensions,
+                                          parent=f"properties/{property_id}")
+            return {d.parameter_name: d for d in dimensions}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return dict(zip(property_ids, executor.map(list_property, property_ids)))
+
+    def plan(self, desired: Sequence[Dict], existing: Dict[str, Dict[str, CustomDimension]]) -> List[PlanItem]:
+        """Diff desired dimensions against each property's current ones."""
+        items = []
+        for property_id, current in existing.items():
+            for config in desired:
+                name = config["parameter_name"]
+                found = current.get(name)
+
+                if found is None:
+                    items.append(PlanItem(property_id, name, "create", config))
+                elif found.scope != config["scope"]:
+                    items.append(PlanItem(property_id, name, "conflict", config, found,
+                                          [f"{CustomDimension.DimensionScope(found.scope).name} "
+                                           f"→ {CustomDimension.DimensionScope(config['scope']).name}"]))
+                else:
+                    changes = [f for f in MUTABLE_FIELDS if getattr(found, f) != config[f]]
+                    items.append(PlanItem(property_id, name, "update" if changes else "unchanged",
+                                          config, found, changes))
+        return items
+
+    def _apply_item(self, item: PlanItem) -> PlanItem:
+        try:
+            if item.action == "create":
+                _call_with_retry(self.limiter, self.client.create_custom_dimension, request=CreateCustomDimensionRequest(
+                    parent=f"properties/{item.property_id}",
+                    custom_dimension=CustomDimension(
+                        parameter_name=item.parameter_name,
+                        display_name=item.desired["display_name"],
+                        description=item.desired["description"],
+                        scope=item.desired["scope"]
+                    )
+                ))
+            else:
+                _call_with_retry(self.limiter, self.client.update_custom_dimension, request=UpdateCustomDimensionRequest(
+                    custom_dimension=CustomDimension(
+                        name=item.existing.name,
+                        **{f: item.desired[f] for f in item.changes}
+                    ),
+                    update_mask=field_mask_pb2.FieldMask(paths=item.changes)
+                ))
+            item.result = "ok"
+        except api_exceptions.AlreadyExists:
+            # Created concurrently by someone else since we listed
+            item.result = "exists"
+        except Exception as e:
+            item.result = str(e)
+        return item
+
+    def apply(self, items: Sequence[PlanItem]) -> List[PlanItem]:
+        """Run every create and update in parallel under the rate limit."""
+        changes = [item for item in items if item.action in ("create", "update")]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self._apply_item, changes))
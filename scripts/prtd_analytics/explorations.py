@@ -0,0 +1,240 @@
+"""
+Exploration Template Executor for PRTD
+Runs the saved GA4 exploration and dashboard templates as Data API reports
+"""
+
+import os
+import re
+import json
+import time
+import datetime
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from google.analytics.data_v1beta.types import BatchRunReportsRequest
+
+from prtd_analytics import DATA_DIR, SCRIPTS_DIR
+from prtd_analytics.query import (
+    PAGE_SIZE,
+    FilterSpec,
+    ReportSpec,
+    canonical_hash,
+    compile_request,
+    descending,
+    iter_rows
+)
+from prtd_analytics.sampling import response_quality
+
+TEMPLATES_DIR = Path(os.getenv('PRTD_TEMPLATES_DIR', str(SCRIPTS_DIR.parent / 'ga4-exploration-templates')))
+EXPLORATION_CACHE_DIR = DATA_DIR / 'exploration-cache'
+
+BATCH_SIZE = 5               # batchRunReports accepts at most 5 requests
+DEFAULT_CONCURRENCY = 3
+DEFAULT_CACHE_TTL = 3600     # seconds; templates use relative date ranges
+DEFAULT_DATE_RANGE = ("30daysAgo", "today")
+
+# Template filter operations -> FilterSpec match types
+OPERATIONS = {
+    "EXACT": "exact",
+    "BEGINS_WITH": "begins_with",
+    "ENDS_WITH": "ends_with",
+    "CONTAINS": "contains",
+    "FULL_REGEXP": "full_regexp",
+    "PARTIAL_REGEXP": "partial_regexp",
+    "IN_LIST": "in_list",
+}
+
+# Dashboard chart filters look like: eventName == 'content_engagement'
+CHART_FILTER = re.compile(r"^\s*([\w:]+)\s*(==|CONTAINS|BEGINS_WITH|ENDS_WITH)\s*'([^']*)'\s*$")
+
+@dataclass(frozen=True)
+class Exploration:
+    """One runnable template: a report spec plus how to present it."""
+    name: str
+    title: str
+    description: str
+    spec: ReportSpec
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+def _exploration_from_config(name: str, template: Dict) -> Exploration:
+    """Spec for a create-ga4-explorations.py EXPLORATION template."""
+    config = template["config"]
+    date_range = config.get("dateRange", {})
+    filters = [
+        FilterSpec(f["fieldName"],
+                   f["value"] if isinstance(f["value"], list) else (f["value"],),
+                   match=OPERATIONS[f.get("operation", "EXACT").upper()])
+        for f in config.get("filters", [])
+    ]
+
+    return Exploration(
+        name=name,
+        title=template.get("name", name),
+        description=template.get("description", ""),
+        spec=ReportSpec(
+            dimensions=[d["name"] for d in config["dimensions"]],
+            metrics=[m["name"] for m in config["metrics"]],
+            date_range=(date_range.get("startDate", DEFAULT_DATE_RANGE[0]),
+                        date_range.get("endDate", DEFAULT_DATE_RANGE[1])),
+            filters=filters
+        )
+    )
+
+def _explorations_from_dashboard(name: str, template: Dict) -> List[Exploration]:
+    """One spec per chart of a Looker Studio dashboard template."""
+    explorations = []
+    for chart in template.get("charts", []):
+        dimensions = chart.get("dimensions") or [chart["dimension"]]
+        if chart.get("secondary_dimension"):
+            dimensions = dimensions + [chart["secondary_dimension"]]
+        metrics = chart.get("metrics") or [chart["metric"]]
+
+        filters = []
+        if chart.get("filter"):
+            match = CHART_FILTER.match(chart["filter"])
+            if not match:
+                raise ValueError(f"Unsupported chart filter in {name}: {chart['filter']}")
+            field_name, operator, value = match.groups()
+            filters.append(FilterSpec(field_name, (value,),
+                                      match="exact" if operator == "==" else OPERATIONS[operator]))
+
+        explorations.append(Exploration(
+            name=f"{name}/{_slug(chart['title'])}",
+            title=chart["title"],
+            description=template.get("title", ""),
+            # Charts with a limit show GA4's top rows by their first metric
+            spec=ReportSpec(dimensions=dimensions, metrics=metrics,
+                            date_range=DEFAULT_DATE_RANGE, filters=filters,
+                            limit=chart.get("limit", 0),
+                            order_by=(descending(metrics[0]),) if chart.get("limit") else ())
+        ))
+    return explorations
+
+def load_templates(directory: Path = TEMPLATES_DIR) -> Dict[str, Exploration]:
+    """Every runnable exploration in a templates directory, keyed by name."""
+    explorations = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        with open(path) as f:
+            template = json.load(f)
+
+        if template.get("type") == "EXPLORATION":
+            found = [_exploration_from_config(path.stem, template)]
+        elif "charts" in template:
+            found = _explorations_from_dashboard(path.stem, template)
+        else:
+            continue
+
+        explorations.update((e.name, e) for e in found)
+    return explorations
+
+def _rows(report_rows, dimensions: Sequence[str], metrics: Sequence[str]) -> List[Dict]:
+    """Report rows as {header: value} dicts with numeric metrics."""
+    rows = []
+    for row in report_rows:
+        record = {name: d.value for name, d in zip(dimensions, row.dimension_values)}
+        for name, m in zip(metrics, row.metric_values):
+            record[name] = float(m.value) if any(c in m.value for c in ".eE") else int(m.value)
+        rows.append(record)
+    return rows
+
+class ExplorationRunner:
+    """Runs explorations in batches of five, concurrently, with an on-disk result cache."""
+
+    def __init__(self, client, property_name: str, cache_dir: Path = EXPLORATION_CACHE_DIR,
+                 cache_ttl: int = DEFAULT_CACHE_TTL, concurrency: int = DEFAULT_CONCURRENCY):
+        self.client = client
+        self.property_name = property_name
+        self.cache_dir = Path(cache_dir)
+        self.cache_ttl = cache_ttl
+        self.concurrency = concurrency
+
+    def _cache_path(self, spec: ReportSpec) -> Path:
+        return self.cache_dir / f"{canonical_hash(self.property_name, spec)}.json"
+
+    def _cached(self, spec: ReportSpec) -> Optional[Dict]:
+        path = self._cache_path(spec)
+        try:
+            if time.time() - path.stat().st_mtime > self.cache_ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, spec: ReportSpec, result: Dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(spec)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+    def _run_batch(self, specs: List[ReportSpec]) -> List[Dict]:
+        """One batchRunReports call, paging on for any unlimited report that did not fit."""
+        requests = [
+            compile_request(self.property_name, spec.with_changes(limit=min(spec.limit or PAGE_SIZE, PAGE_SIZE)))
+            for spec in specs
+        ]
+        batch = self.client.batch_run_reports(
+            request=BatchRunReportsRequest(property=self.property_name, requests=requests)
+        )
+
+        results = []
+        for spec, response in zip(specs, batch.reports):
+            rows = _rows(response.rows, spec.dimensions, spec.metrics)
+            if not spec.limit and response.row_count > len(response.rows):
+                remainder = spec.with_changes(offset=len(response.rows))
+                rows.extend(_rows(iter_rows(self.client, self.property_name, remainder),
+                                  spec.dimensions, spec.metrics))
+
+            result = {
+                "fetched_at": datetime.datetime.now().isoformat(),
+                "row_count": len(rows),
+                "data_quality": response_quality(response),
+                "rows": rows
+            }
+            self._store(spec, result)
+            results.append(result)
+        return results
+
+    def run(self, explorations: Sequence[Exploration], refresh: bool = False) -> Dict[str, Dict]:
+        """Run every exploration, serving fresh cached results unless `refresh` is set."""
+        results: Dict[str, Dict] = {}
+        pending: Dict[ReportSpec, List[Exploration]] = {}
+
+        for exploration in explorations:
+            cached = None if refresh else self._cached(exploration.spec)
+            if cached is not None:
+                results[exploration.name] = dict(cached, cached=True)
+            else:
+                # Identical specs from different templates are fetched once
+                pending.setdefault(exploration.spec, []).append(exploration)
+
+        specs = list(pending)
+        batches = [specs[i:i + BATCH_SIZE] for i in range(0, len(specs), BATCH_SIZE)]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [(batch, executor.submit(self._run_batch, batch)) for batch in batches]
+            for batch, future in futures:
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    # A rejected request fails its whole batch; report it on each member
+                    batch_results = [{"error": str(e), "rows": []} for _ in batch]
+                for spec, result in zip(batch, batch_results):
+                    for exploration in pending[spec]:
+                        results[exploration.name] = dict(result, cached=False)
+
+        for exploration in explorations:
+            result = results[exploration.name]
+            result.update({
+                "title": exploration.title,
+                "description": exploration.description,
+                "spec": exploration.spec.to_dict()
+            })
+
+        return results
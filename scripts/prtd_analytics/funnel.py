@@ -0,0 +1,185 @@
+"""
+Per-Deal Funnel Engine for PRTD
+view_item → select_item → click_external_deal rates per deal, category and partner
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from prtd_analytics.deals import DealCatalog
+from prtd_analytics.query import PAGE_SIZE, event_filter, report
+from prtd_analytics.sampling import fetch_exact
+
+FUNNEL_STEPS = ('view_item', 'select_item', 'click_external_deal')
+VIEW, SELECT, CLICK = range(len(FUNNEL_STEPS))
+
+MIN_DEAL_VIEWS = 30          # deals with fewer views are too noisy to flag
+UNDERPERFORM_Z = 3.0         # binomial z-score below the category rate that counts as "far below"
+UNDERPERFORM_RATIO = 0.5     # ...and the deal must convert at under half its category rate
+
+# Slug values GA4 reports for events sent without one
+UNSET_SLUGS = {'', '(not set)'}
+
+def deal_funnel_spec(days_back: int = 7):
+    """Deal × funnel step event counts for the last `days_back` days."""
+    return report(
+        dimensions=["customEvent:slug", "eventName"],
+        metrics=["eventCount"],
+        days_back=days_back,
+        filters=[event_filter(*FUNNEL_STEPS)]
+    )
+
+def _rates(counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Click and conversion rates (%) for each row of a (n, 3) step count matrix."""
+    views = counts[:, VIEW].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        click_rate = np.where(views > 0, counts[:, SELECT] / views * 100, 0.0)
+        conversion_rate = np.where(views > 0, counts[:, CLICK] / views * 100, 0.0)
+    return {"click_rate": click_rate, "conversion_rate": conversion_rate}
+
+class DealFunnel:
+    """Funnel step counts for every deal, with vectorized rollups."""
+
+    def __init__(self, slugs: List[str], counts: np.ndarray, catalog: Optional[DealCatalog] = None):
+        self.slugs = slugs
+        self.counts = counts
+        self.quality: Optional[Dict] = None
+        self.catalog = catalog or DealCatalog()
+        self.catalog.refresh()
+
+        deals = [self.catalog.get(slug) or {} for slug in slugs]
+        self.categories = np.array([deal.get('category') or 'unknown' for deal in deals], dtype=object)
+        self.partners = np.array([deal.get('partner') or 'unknown' for deal in deals], dtype=object)
+
+    @classmethod
+    def from_rows(cls, rows, catalog: Optional[DealCatalog] = None) -> "DealFunnel":
+        """Build the matrix from (slug, eventName) / eventCount report rows."""
+        return cls.from_values(
+            (((row.dimension_values[0].value, row.dimension_values[1].value), (row.metric_values[0].value,))
+             for row in rows),
+            catalog
+        )
+
+    @classmethod
+    def from_values(cls, rows, catalog: Optional[DealCatalog] = None) -> "DealFunnel":
+        """Build the matrix from ((slug, eventName), (eventCount,)) tuples."""
+        slug_index: Dict[str, int] = {}
+        step_index = {step: i for i, step in enumerate(FUNNEL_STEPS)}
+        deal_ids, step_ids, values = [], [], []
+
+        for (slug, event_name), metrics in rows:
+            step = step_index.get(event_name)
+            if step is None or slug in UNSET_SLUGS:
+                continue
+            deal_ids.append(slug_index.setdefault(slug, len(slug_index)))
+            step_ids.append(step)
+            values.append(int(metrics[0]))
+
+        counts = np.zeros((len(slug_index), len(FUNNEL_STEPS)), dtype=np.int64)
+        np.add.at(counts, (np.array(deal_ids, dtype=np.intp), np.array(step_ids, dtype=np.intp)),
+                  np.array(values, dtype=np.int64))
+
+        return cls(list(slug_index), counts, catalog)
+
+    @classmethod
+    def fetch(cls, client, property_name: str, days_back: int = 7,
+              catalog: Optional[DealCatalog] = None, page_size: int = PAGE_SIZE) -> "DealFunnel":
+        """Fetch the full deal × event matrix, paginated and split if GA4 approximates it."""
+        exact = fetch_exact(client, property_name, deal_funnel_spec(days_back), page_size=page_size)
+        funnel = cls.from_values(exact.rows, catalog)
+        funnel.quality = exact.quality()
+        return funnel
+
+    def group(self, by: str) -> Dict[str, Dict]:
+        """Summed step counts and rates per 'category' or 'partner'."""
+        labels = self.categories if by == 'category' else self.partners
+        if not len(labels):
+            return {}
+
+        names, inverse = np.unique(labels.astype(str), return_inverse=True)
+        counts = np.zeros((len(names), len(FUNNEL_STEPS)), dtype=np.int64)
+        np.add.at(counts, inverse, self.counts)
+        deal_counts = np.bincount(inverse, minlength=len(names))
+        rates = _rates(counts)
+
+        return {
+            str(name): {
+                "deals": int(deal_counts[i]),
+                **{step: int(counts[i, s]) for s, step in enumerate(FUNNEL_STEPS)},
+                "click_rate": round(float(rates["click_rate"][i]), 2),
+                "conversion_rate": round(float(rates["conversion_rate"][i]), 2)
+            }
+            for i, name in enumerate(names)
+        }
+
+    def deal_rates(self) -> Dict[str, Dict]:
+        """Step counts and rates for every deal."""
+        rates = _rates(self.counts)
+        return {
+            slug: {
+                "category": self.categories[i],
+                "partner": self.partners[i],
+                **{step: int(self.counts[i, s]) for s, step in enumerate(FUNNEL_STEPS)},
+                "click_rate": round(float(rates["click_rate"][i]), 2),
+                "conversion_rate": round(float(rates["conversion_rate"][i]), 2)
+            }
+            for i, slug in enumerate(self.slugs)
+        }
+
+    def underperformers(self, limit: int = 20) -> List[Dict]:
+        """Deals converting far below their category, worst first.
+
+        A deal is flagged when its click_external_deal count sits more than
+        UNDERPERFORM_Z binomial standard deviations under what its views would
+        produce at the category's conversion rate.
+        """
+        if not self.slugs:
+            return []
+
+        _, inverse = np.unique(self.categories.astype(str), return_inverse=True)
+        category_counts = np.zeros((inverse.max() + 1, len(FUNNEL_STEPS)), dtype=np.int64)
+        np.add.at(category_counts, inverse, self.counts)
+
+        views = self.counts[:, VIEW].astype(np.float64)
+        clicks = self.counts[:, CLICK].astype(np.float64)
+        category_views = category_counts[inverse, VIEW].astype(np.float64)
+        category_clicks = category_counts[inverse, CLICK].astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected_rate = np.clip(np.where(category_views > 0, category_clicks / category_views, 0.0), 0, 0.999)
+            rate = np.where(views > 0, clicks / views, 0.0)
+            std = np.sqrt(views * expected_rate * (1 - expected_rate))
+            z = np.where(std > 0, (clicks - views * expected_rate) / std, 0.0)
+
+        flagged = np.flatnonzero(
+            (views >= MIN_DEAL_VIEWS)
+            & (z <= -UNDERPERFORM_Z)
+            & (rate < UNDERPERFORM_RATIO * expected_rate)
+        )
+        flagged = flagged[np.argsort(z[flagged], kind='stable')][:limit]
+
+        return [
+            {
+                "slug": self.slugs[i],
+                "deal": self.catalog.label(self.slugs[i]),
+                "category": self.categories[i],
+                "partner": self.partners[i],
+                "views": int(views[i]),
+                "clicks": int(clicks[i]),
+                "conversion_rate": round(float(rate[i]) * 100, 2),
+                "category_rate": round(float(expected_rate[i]) * 100, 2),
+                "z": round(float(z[i]), 2)
+            }
+            for i in flagged
+        ]
+
+    def summary(self, limit: int = 20) -> Dict:
+        """Category and partner rollups plus flagged deals, sized for a report."""
+        return {
+            "deals_tracked": len(self.slugs),
+            "data_quality": self.quality,
+            "categories": self.group('category'),
+            "partners": self.group('partner'),
+            "underperformers": self.underperformers(limit)
+        }
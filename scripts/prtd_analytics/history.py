@@ -0,0 +1,246 @@
+"""
+Analytics Run History for PRTD
+SQLite index of key scalar fields from health, validation and realtime reports
+"""
+
+import os
+import re
+import glob
+import sqlite3
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.baselines import extract_health_metrics
+from prtd_analytics.writer import load_report
+
+HISTORY_DB_PATH = os.getenv('PRTD_HISTORY_DB', str(DATA_DIR / 'analytics-history.sqlite'))
+
+# Report file prefixes written by the scripts -> run kind
+REPORT_KINDS = {
+    'health-check-': 'health',
+    'analytics-validation-': 'validation',
+    'realtime-monitor-': 'realtime',
+}
+
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+}
+
+AGGREGATES = {
+    'avg': 'AVG(value)',
+    'min': 'MIN(value)',
+    'max': 'MAX(value)',
+    'sum': 'SUM(value)',
+    'count': 'COUNT(value)',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    status TEXT,
+    score REAL,
+    report_path TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS runs_kind_time ON runs (kind, run_at);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS metrics_name_time ON metrics (name, run_at);
+"""
+
+def _percent(value) -> Optional[float]:
+    """Parse validator rates such as '3.2%'."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.match(r"\s*(-?[\d.]+)\s*%?", value)
+        if match:
+            return float(match.group(1))
+    return None
+
+def _strip_emoji(status: Optional[str]) -> Optional[str]:
+    """'🟢 HEALTHY' -> 'healthy'."""
+    if not status:
+        return None
+    return status.split()[-1].lower()
+
+def summarize_health(report: Dict) -> Tuple[Optional[str], Optional[float], Dict[str, float]]:
+    """Status, score and scalar metrics of a health-check report."""
+    metrics = extract_health_metrics(report)
+
+    for check_name, result in report.get('checks', {}).items():
+        if isinstance(result.get('health_score'), (int, float)):
+            metrics[f'check.{check_name}.score'] = float(result['health_score'])
+
+    return report.get('overall_status'), report.get('overall_score'), metrics
+
+def summarize_validation(report: Dict) -> Tuple[Optional[str], Optional[float], Dict[str, float]]:
+    """Status, score and scalar metrics of a validation report."""
+    validations = report.get('validations', {})
+    metrics = {}
+
+    for event_name, count in validations.get('core_events', {}).get('event_counts', {}).items():
+        metrics[f'events.{event_name}'] = float(count)
+
+    funnel = validations.get('conversion_funnel', {})
+    for key in ['click_rate', 'conversion_rate']:
+        value = _percent(funnel.get(key))
+        if value is not None:
+            metrics[f'funnel.{key}'] = value
+
+    scalar_fields = {
+        'deal.total_events': validations.get('deal_tracking', {}).get('total_deal_events'),
+        'realtime.active_users': validations.get('realtime_activity', {}).get('active_users'),
+        'attribution.total_events': validations.get('partner_attribution', {}).get('total_attributed_events'),
+    }
+    for name, value in scalar_fields.items():
+        if isinstance(value, (int, float)):
+            metrics[name] = float(value)
+
+    return _strip_emoji(report.get('overall_status')), report.get('health_score'), metrics
+
+def summarize_realtime(report: Dict) -> Tuple[Optional[str], Optional[float], Dict[str, float]]:
+    """Status and scalar metrics of a realtime monitoring session."""
+    summary = report.get('summary', report)
+    metrics = {}
+
+    scalar_fields = {
+        'realtime.peak_active_users': summary.get('peak_active_users'),
+        'realtime.total_events': summary.get('total_events_observed'),
+        'realtime.total_conversions': summary.get('total_conversions'),
+        'realtime.data_points': summary.get('monitoring_duration'),
+    }
+    for name, value in scalar_fields.items():
+        if isinstance(value, (int, float)):
+            metrics[name] = float(value)
+
+    for event_name, count in summary.get('event_breakdown', {}).items():
+        metrics[f'events.{event_name}'] = float(count)
+
+    return _strip_emoji(summary.get('health_status')), None, metrics
+
+SUMMARIZERS = {
+    'health': summarize_health,
+    'validation': summarize_validation,
+    'realtime': summarize_realtime,
+}
+
+class HistoryIndex:
+    """Queryable index of past analytics runs."""
+
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, kind: str, report: Dict, report_path: Optional[str] = None,
+                   run_at: Optional[str] = None) -> Optional[int]:
+        """Index one report. Returns the run id, or None if the file was already indexed."""
+        status, score, metrics = SUMMARIZERS[kind](report)
+        run_at = (run_at or report.get('timestamp') or datetime.datetime.now().isoformat())[:19]
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO runs (kind, run_at, status, score, report_path) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, run_at, status, score, report_path)
+            )
+            if cursor.rowcount == 0:
+                return None
+
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO metrics (run_id, kind, name, run_at, value) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, kind, name, run_at, value) for name, value in metrics.items()]
+            )
+
+        return run_id
+
+    def import_reports(self, pattern: str) -> int:
+        """Index archived JSON reports matching a glob. Returns newly indexed count."""
+        indexed = 0
+
+        for report_path in sorted(glob.glob(pattern)):
+            filename = os.path.basename(report_path)
+            kind = next((k for prefix, k in REPORT_KINDS.items() if filename.startswith(prefix)), None)
+            if kind is None:
+                continue
+
+            try:
+                report = load_report(report_path)
+            except (OSError, ValueError):
+                continue
+
+            # Realtime reports carry no timestamp; recover it from the filename
+            run_at = None
+            stamp = re.search(r"(\d{8}-\d{6})", filename)
+            if stamp:
+                run_at = datetime.datetime.strptime(stamp.group(1), "%Y%m%d-%H%M%S").isoformat()
+
+            if self.record_run(kind, report, report_path, run_at=run_at if kind == 'realtime' else None):
+                indexed += 1
+
+        return indexed
+
+    def metric_series(self, name: str, since: str, until: str,
+                      bucket: str = 'day', aggregate: str = 'avg',
+                      kind: Optional[str] = None) -> List[Tuple[str, float, int]]:
+        """(bucket, aggregated value, samples) for a metric over a time range."""
+        sql = (
+            f"SELECT strftime(?, run_at) AS bucket, {AGGREGATES[aggregate]}, COUNT(*) "
+            "FROM metrics WHERE name = ? AND run_at >= ? AND run_at < ?"
+        )
+        params = [BUCKET_FORMATS[bucket], name, since, until]
+
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+
+        sql += " GROUP BY bucket ORDER BY bucket"
+        return self.conn.execute(sql, params).fetchall()
+
+    def runs(self, since: str, until: str, kind: Optional[str] = None) -> List[Tuple]:
+        """(kind, run_at, status, score, report_path) rows in a time range."""
+        sql = "SELECT kind, run_at, status, score, report_path FROM runs WHERE run_at >= ? AND run_at < ?"
+        params = [since, until]
+
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+
+        sql += " ORDER BY run_at"
+        return self.conn.execute(sql, params).fetchall()
+
+    def metric_names(self) -> List[Tuple[str, int, str, str]]:
+        """(name, samples, first seen, last seen) for every indexed metric."""
+        return self.conn.execute(
+            "SELECT name, COUNT(*), MIN(run_at), MAX(run_at) FROM metrics GROUP BY name ORDER BY name"
+        ).fetchall()
+
+def record_report(kind: str, report: Dict, report_path: Optional[str] = None):
+    """Index a freshly written report, warning instead of failing the run."""
+    try:
+        index = HistoryIndex()
+        try:
+            index.record_run(kind, report, report_path)
+        finally:
+            index.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not index report in history: {str(e)}")
@@ -0,0 +1,423 @@
+"""
+Property Metadata Cache for PRTD
+Validates report requests against the property's schema before they are sent
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+from google.api_core import exceptions as api_exceptions
+from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest,
+    BatchRunReportsResponse,
+    DimensionHeader,
+    DimensionValue,
+    FilterExpression,
+    FilterExpressionList,
+    MetricHeader,
+    MetricType,
+    MetricValue,
+    Row,
+    RunRealtimeReportRequest,
+    RunRealtimeReportResponse,
+    RunReportRequest,
+    RunReportResponse
+)
+
+from prtd_analytics import DATA_DIR
+
+METADATA_CACHE_DIR = DATA_DIR / 'metadata-cache'
+METADATA_TTL = int(os.getenv('PRTD_METADATA_TTL', str(6 * 3600)))
+
+# After a schema error, refetch metadata at most this often before giving up
+MIN_REFRESH_INTERVAL = 300
+
+NOT_SET = "(not set)"
+
+# Registered stand-ins for dimensions the scripts ask for under older names;
+# only names the site sends with the same values belong here
+SUBSTITUTES = {
+    "customEvent:deal_category": "customEvent:category",
+}
+
+CUSTOM_PREFIXES = ("customEvent:", "customUser:")
+
+class DimensionsUnavailable(ValueError):
+    """Every custom dimension a request groups by is unavailable, so each row would be (not set)."""
+
+@dataclass(frozen=True)
+class PropertyMetadata:
+    """Dimension and metric API names available on one property."""
+    dimensions: FrozenSet[str]
+    metrics: FrozenSet[str]
+    custom_dimensions: FrozenSet[str]
+    fetched_at: float
+
+    @classmethod
+    def from_response(cls, response) -> "PropertyMetadata":
+        return cls(
+            dimensions=frozenset(d.api_name for d in response.dimensions),
+            metrics=frozenset(m.api_name for m in response.metrics),
+            custom_dimensions=frozenset(d.api_name for d in response.dimensions if d.custom_definition),
+            fetched_at=time.time()
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PropertyMetadata":
+        return cls(frozenset(data["dimensions"]), frozenset(data["metrics"]),
+                   frozenset(data["custom_dimensions"]), data["fetched_at"])
+
+    def to_dict(self) -> Dict:
+        return {
+            "dimensions": sorted(self.dimensions),
+            "metrics": sorted(self.metrics),
+            "custom_dimensions": sorted(self.custom_dimensions),
+            "fetched_at": self.fetched_at
+        }
+
+    def has_dimension(self, name: str, realtime: bool = False) -> bool:
+        if realtime:
+            # Realtime reports only accept user-scoped custom dimensions; the
+            # rest of the realtime schema is not part of get_metadata
+            if name.startswith("customEvent:"):
+                return False
+            return not name.startswith("customUser:") or name in self.dimensions
+        return name in self.dimensions
+
+    def has_metric(self, name: str, realtime: bool = False) -> bool:
+        return realtime or name in self.metrics
+
+class MetadataCache:
+    """get_metadata responses per property, kept in memory and on disk for `ttl` seconds."""
+
+    def __init__(self, client, cache_dir: Path = METADATA_CACHE_DIR, ttl: int = METADATA_TTL):
+        self.client = client
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._entries: Dict[str, PropertyMetadata] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, property_name: str) -> Path:
+        return self.cache_dir / f"{property_name.replace('/', '-')}.json"
+
+    def _load(self, property_name: str) -> Optional[PropertyMetadata]:
+        try:
+            with open(self._path(property_name)) as f:
+                return PropertyMetadata.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, property_name: str, metadata: PropertyMetadata):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(property_name)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(metadata.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def get(self, property_name: str, refresh: bool = False) -> Optional[PropertyMetadata]:
+        """Metadata for a property, or None when it cannot be fetched."""
+        with self._lock:
+            entry = None if refresh else self._entries.get(property_name) or self._load(property_name)
+            if entry is not None and time.time() - entry.fetched_at < self.ttl:
+                self._entries[property_name] = entry
+                return entry
+
+            try:
+                response = self.client.get_metadata(name=f"{property_name}/metadata")
+            except Exception as e:
+                print(f"⚠️  Could not fetch metadata for {property_name}: {str(e)}")
+                # A stale schema is still better than none
+                return entry
+
+            entry = PropertyMetadata.from_response(response)
+            self._entries[property_name] = entry
+            try:
+                self._store(property_name, entry)
+            except OSError:
+                pass
+            return entry
+
+def _string_match(string_filter, value: str) -> bool:
+    expected = string_filter.value
+    if not string_filter.case_sensitive:
+        expected, value = expected.lower(), value.lower()
+    match_type = string_filter.match_type.name
+    if match_type in ("EXACT", "MATCH_TYPE_UNSPECIFIED"):
+        return value == expected
+    if match_type == "BEGINS_WITH":
+        return value.startswith(expected)
+    if match_type == "ENDS_WITH":
+        return value.endswith(expected)
+    if match_type == "CONTAINS":
+        return expected in value
+    if match_type == "FULL_REGEXP":
+        return re.fullmatch(expected, value) is not None
+    return re.search(expected, value) is not None
+
+def _matches_not_set(filter_) -> bool:
+    """Whether a dimension filter would keep a row whose value is (not set)."""
+    kind = type(filter_).pb(filter_).WhichOneof("one_filter")
+    if kind == "string_filter":
+        return _string_match(filter_.string_filter, NOT_SET)
+    if kind == "in_list_filter":
+        values = list(filter_.in_list_filter.values)
+        if not filter_.in_list_filter.case_sensitive:
+            return NOT_SET in (v.lower() for v in values)
+        return NOT_SET in values
+    return False
+
+def _prune_filter(expression, invalid: FrozenSet[str], renamed: Dict[str, str]):
+    """Rewrite a filter tree without invalid fields.
+
+    Returns the new expression, True when it keeps every row or False when it keeps none.
+    """
+    kind = FilterExpression.pb(expression).WhichOneof("expr")
+
+    if kind == "filter":
+        field_name = expression.filter.field_name
+        if field_name in invalid:
+            return _matches_not_set(expression.filter)
+        if field_name in renamed:
+            expression = FilterExpression(expression)
+            expression.filter.field_name = renamed[field_name]
+        return expression
+
+    if kind == "not_expression":
+        inner = _prune_filter(expression.not_expression, invalid, renamed)
+        return (not inner) if isinstance(inner, bool) else FilterExpression(not_expression=inner)
+
+    if kind in ("and_group", "or_group"):
+        short_circuit = kind == "or_group"
+        children = []
+        for child in getattr(expression, kind).expressions:
+            pruned = _prune_filter(child, invalid, renamed)
+            if pruned is short_circuit:
+                return short_circuit
+            if not isinstance(pruned, bool):
+                children.append(pruned)
+        if not children:
+            return not short_circuit
+        if len(children) == 1:
+            return children[0]
+        return FilterExpression(**{kind: FilterExpressionList(expressions=children)})
+
+    return expression
+
+@dataclass
+class RequestPlan:
+    """A request rewritten for the property's schema, and how to map its rows back."""
+    request: Optional[object]                 # None when no rows can match
+    dimensions: List[str]                     # names the caller asked for
+    metrics: List[str]
+    dimension_columns: List[Optional[int]]    # sent column per requested column, None for placeholders
+    metric_columns: List[Optional[int]]
+
+    @property
+    def identity(self) -> bool:
+        return (self.dimension_columns == list(range(len(self.dimensions))) and
+                self.metric_columns == list(range(len(self.metrics))))
+
+class ValidatingClient:
+    """Data API client wrapper that checks requests against cached property metadata.
+
+    Dimensions and metrics the property does not have are substituted from
+    SUBSTITUTES or dropped locally, and reported back as "(not set)" / 0 so
+    callers see the row shape they asked for. Filters on missing dimensions
+    are evaluated against "(not set)"; a request that can match nothing is
+    answered without a network call. A request whose custom dimensions are
+    all unavailable raises DimensionsUnavailable instead of returning rows
+    that only break down by "(not set)".
+    """
+
+    def __init__(self, client, cache: Optional[MetadataCache] = None):
+        self.client = client
+        self.cache = cache or MetadataCache(client)
+        self._warned = set()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _warn(self, property_name: str, message: str):
+        if (property_name, message) not in self._warned:
+            self._warned.add((property_name, message))
+            print(f"⚠️  {message} on {property_name}")
+
+    def plan(self, request, metadata: Optional[PropertyMetadata] = None) -> RequestPlan:
+        """Validate one RunReportRequest or RunRealtimeReportRequest."""
+        dimensions = [d.name for d in request.dimensions]
+        metrics = [m.name for m in request.metrics]
+        identity = RequestPlan(request, dimensions, metrics,
+                               list(range(len(dimensions))), list(range(len(metrics))))
+
+        metadata = metadata or self.cache.get(request.property)
+        if metadata is None:
+            return identity
+
+        realtime = isinstance(request, RunRealtimeReportRequest)
+        renamed, invalid = {}, set()
+        for name in dimensions + [f for f in self._filter_fields(request.dimension_filter)]:
+            if name in renamed or name in invalid or metadata.has_dimension(name, realtime):
+                continue
+            substitute = SUBSTITUTES.get(name)
+            if substitute and metadata.has_dimension(substitute, realtime):
+                renamed[name] = substitute
+                self._warn(request.property, f"{name} is not registered; using {substitute}")
+            else:
+                invalid.add(name)
+        custom = [d for d in dimensions if d.startswith(CUSTOM_PREFIXES)]
+        if custom and all(d in invalid for d in custom):
+            where = "realtime reports" if realtime else request.property
+            raise DimensionsUnavailable(f"{', '.join(custom)} not available in {where}")
+        for name in sorted(invalid):
+            self._warn(request.property, f"{name} is not available; reporting it as {NOT_SET}")
+        missing_metrics = {m for m in metrics if not metadata.has_metric(m, realtime)}
+        for name in sorted(missing_metrics):
+            self._warn(request.property, f"metric {name} is not available; reporting it as 0")
+
+        if not renamed and not invalid and not missing_metrics:
+            return identity
+
+        sent_dimensions, dimension_columns = [], []
+        for name in dimensions:
+            if name in invalid:
+                dimension_columns.append(None)
+                continue
+            name = renamed.get(name, name)
+            if name not in sent_dimensions:
+                sent_dimensions.append(name)
+            dimension_columns.append(sent_dimensions.index(name))
+
+        sent_metrics = [m for m in metrics if m not in missing_metrics]
+        metric_columns = [None if m in missing_metrics else sent_metrics.index(m) for m in metrics]
+
+        plan = RequestPlan(None, dimensions, metrics, dimension_columns, metric_columns)
+
+        dimension_filter = request.dimension_filter if "dimension_filter" in request else None
+        if dimension_filter is not None:
+            dimension_filter = _prune_filter(dimension_filter, frozenset(invalid), renamed)
+            if dimension_filter is False:
+                return plan
+
+        if not sent_dimensions and not sent_metrics:
+            return plan
+
+        rewritten = type(request)(request)
+        del rewritten.dimensions[:]
+        rewritten.dimensions.extend({"name": name} for name in sent_dimensions)
+        del rewritten.metrics[:]
+        rewritten.metrics.extend({"name": name} for name in sent_metrics)
+        if dimension_filter is True:
+            del rewritten.dimension_filter
+        elif dimension_filter is not None:
+            rewritten.dimension_filter = dimension_filter
+
+        kept = set(sent_dimensions) | set(sent_metrics)
+        order_bys = [o for o in rewritten.order_bys
+                     if (o.dimension.dimension_name or o.metric.metric_name) in kept
+                     or renamed.get(o.dimension.dimension_name) in kept]
+        for order_by in order_bys:
+            if order_by.dimension.dimension_name in renamed:
+                order_by.dimension.dimension_name = renamed[order_by.dimension.dimension_name]
+        del rewritten.order_bys[:]
+        rewritten.order_bys.extend(order_bys)
+
+        plan.request = rewritten
+        return plan
+
+    @staticmethod
+    def _filter_fields(expression) -> List[str]:
+        if not expression:
+            return []
+        kind = FilterExpression.pb(expression).WhichOneof("expr")
+        if kind == "filter":
+            return [expression.filter.field_name]
+        if kind == "not_expression":
+            return ValidatingClient._filter_fields(expression.not_expression)
+        if kind in ("and_group", "or_group"):
+            return [f for e in getattr(expression, kind).expressions for f in ValidatingClient._filter_fields(e)]
+        return []
+
+    @staticmethod
+    def _remap_row(row, plan: RequestPlan):
+        return Row(
+            dimension_values=[row.dimension_values[i] if i is not None else DimensionValue(value=NOT_SET)
+                              for i in plan.dimension_columns],
+            metric_values=[row.metric_values[i] if i is not None else MetricValue(value="0")
+                           for i in plan.metric_columns]
+        )
+
+    def restore(self, plan: RequestPlan, response, response_type):
+        """Present a response in the shape of the original request."""
+        if plan.request is None:
+            return response_type(
+                dimension_headers=[DimensionHeader(name=name) for name in plan.dimensions],
+                metric_headers=[MetricHeader(name=name, type_=MetricType.TYPE_INTEGER) for name in plan.metrics],
+                row_count=0
+            )
+        if plan.identity:
+            return response
+
+        metric_types = [h.type_ for h in response.metric_headers]
+        restored = response_type(response)
+        del restored.dimension_headers[:]
+        restored.dimension_headers.extend(DimensionHeader(name=name) for name in plan.dimensions)
+        del restored.metric_headers[:]
+        restored.metric_headers.extend(
+            MetricHeader(name=name, type_=metric_types[i] if i is not None else MetricType.TYPE_INTEGER)
+            for name, i in zip(plan.metrics, plan.metric_columns)
+        )
+        for field_name in ("rows", "totals", "maximums", "minimums"):
+            if field_name in response_type.meta.fields:
+                rows = [self._remap_row(row, plan) for row in getattr(response, field_name)]
+                del getattr(restored, field_name)[:]
+                getattr(restored, field_name).extend(rows)
+        return restored
+
+    def _send(self, call, request, response_type):
+        plan = self.plan(request)
+        try:
+            response = call(request=plan.request) if plan.request is not None else None
+        except api_exceptions.InvalidArgument:
+            # The cached schema may predate a removed dimension; refetch once and retry
+            metadata = self.cache.get(request.property)
+            if metadata is None or time.time() - metadata.fetched_at < MIN_REFRESH_INTERVAL:
+                raise
+            plan = self.plan(request, self.cache.get(request.property, refresh=True))
+            response = call(request=plan.request) if plan.request is not None else None
+        return self.restore(plan, response, response_type)
+
+    def run_report(self, request: RunReportRequest, **kwargs):
+        return self._send(lambda request: self.client.run_report(request=request, **kwargs),
+                          request, RunReportResponse)
+
+    def run_realtime_report(self, request: RunRealtimeReportRequest, **kwargs):
+        return self._send(lambda request: self.client.run_realtime_report(request=request, **kwargs),
+                          request, RunRealtimeReportResponse)
+
+    def batch_run_reports(self, request: BatchRunReportsRequest, **kwargs):
+        plans = [self.plan(r) for r in request.requests]
+        needed = [p.request for p in plans if p.request is not None]
+
+        reports = []
+        if needed:
+            batch = self.client.batch_run_reports(
+                request=BatchRunReportsRequest(property=request.property, requests=needed), **kwargs
+            )
+            reports = list(batch.reports)
+
+        sent = iter(reports)
+        return BatchRunReportsResponse(reports=[
+            self.restore(plan, next(sent) if plan.request is not None else None, RunReportResponse)
+            for plan in plans
+        ])
+
+def validated_client(client, cache_dir: Path = METADATA_CACHE_DIR, ttl: int = METADATA_TTL) -> ValidatingClient:
+    """Wrap a Data API client with metadata validation."""
+    return ValidatingClient(client, MetadataCache(client, cache_dir, ttl))
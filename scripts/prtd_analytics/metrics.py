@@ -0,0 +1,251 @@
+"""
+Shared Metrics Core for PRTD
+One GA4 dataset per run that the validator and the health checker both read from
+"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+import contextlib
+from pathlib import Path
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from google.analytics.data_v1beta.types import BatchRunReportsRequest
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.query import ReportSpec, compile_request, report
+from prtd_analytics.funnel import DealFunnel, deal_funnel_spec
+from prtd_analytics.attribution import AttributionLedger, attribution_spec
+from prtd_analytics.sampling import fetch_exact
+
+METRICS_CACHE_DIR = DATA_DIR / 'metrics-core'
+
+# Long enough for the validator and health check cron jobs to share one fetch
+METRICS_TTL = int(os.getenv('PRTD_METRICS_TTL', '900'))
+
+DAYS_BACK = 7
+
+FUNNEL_EVENTS = ('view_item', 'select_item', 'click_external_deal')
+
+# A snapshot with failed parts is reused in memory this long before refetching
+RETRY_AFTER = 60
+
+# Parts fetched independently, so one failing does not take down the others
+PARTS = ("events", "deal_funnel", "attribution")
+
+def event_specs(days_back: int = DAYS_BACK) -> List[ReportSpec]:
+    """Per-event totals for the window and for the last day, sent as one batch."""
+    return [
+        report(dimensions=["eventName"], metrics=["eventCount", "totalUsers"], days_back=days_back),
+        ReportSpec(dimensions=["eventName"], metrics=["eventCount"], date_range=("yesterday", "today"),
+                   aggregations=("total",))
+    ]
+
+@dataclass
+class MetricsSnapshot:
+    """Event totals, per-deal funnel rows and attribution rows fetched at one moment."""
+    property_name: str
+    days_back: int
+    fetched_at: float
+    events: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    recent_events: Dict[str, int] = field(default_factory=dict)
+    recent_total: Optional[int] = None
+    funnel_rows: List = field(default_factory=list)
+    funnel_quality: Dict = field(default_factory=dict)
+    attribution_rows: List = field(default_factory=list)
+    attribution_quality: Dict = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def _require(self, part: str):
+        if part in self.errors:
+            raise RuntimeError(self.errors[part])
+
+    def event_counts(self, events: Sequence[str] = ()) -> Dict[str, int]:
+        """eventCount per event over the window, optionally for some events only."""
+        self._require("events")
+        return {name: values["eventCount"] for name, values in self.events.items()
+                if not events or name in events}
+
+    def recent_event_counts(self) -> Dict[str, int]:
+        """eventCount per event for yesterday and today."""
+        self._require("events")
+        return dict(self.recent_events)
+
+    def recent_total_events(self) -> int:
+        """All events for yesterday and today, as totalled by GA4."""
+        self._require("events")
+        if self.recent_total is None:
+            return sum(self.recent_events.values())
+        return self.recent_total
+
+    def funnel(self) -> Dict:
+        """View → click → external click events and users, with both rates in percent."""
+        self._require("events")
+        funnel_data = {name: dict(self.events[name]) for name in FUNNEL_EVENTS if name in self.events}
+
+        view_item = funnel_data.get('view_item', {}).get('eventCount', 0)
+        select_item = funnel_data.get('select_item', {}).get('eventCount', 0)
+        external_click = funnel_data.get('click_external_deal', {}).get('eventCount', 0)
+
+        return {
+            "funnel_data": {name: {"events": values["eventCount"], "users": values["totalUsers"]}
+                            for name, values in funnel_data.items()},
+            "view_item_events": view_item,
+            "click_rate": (select_item / view_item * 100) if view_item > 0 else 0,
+            "conversion_rate": (external_click / view_item * 100) if view_item > 0 else 0
+        }
+
+    def deal_funnel(self) -> DealFunnel:
+        self._require("deal_funnel")
+        funnel = DealFunnel.from_values(self.funnel_rows)
+        funnel.quality = self.funnel_quality
+        return funnel
+
+    def attribution(self) -> AttributionLedger:
+        self._require("attribution")
+        ledger = AttributionLedger.from_values(self.attribution_rows)
+        ledger.quality = self.attribution_quality
+        return ledger
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def fresh(self, ttl: int) -> bool:
+        return self.age() < (RETRY_AFTER if self.errors else ttl)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricsSnapshot":
+        return cls(**data)
+
+def _fetch_events(client, property_name: str, snapshot: MetricsSnapshot):
+    specs = event_specs(snapshot.days_back)
+    batch = client.batch_run_reports(
+        request=BatchRunReportsRequest(
+            property=property_name,
+            requests=[compile_request(property_name, spec) for spec in specs]
+        )
+    )
+    window, recent = batch.reports
+
+    for row in window.rows:
+        snapshot.events[row.dimension_values[0].value] = {
+            "eventCount": int(row.metric_values[0].value),
+            "totalUsers": int(row.metric_values[1].value)
+        }
+    for row in recent.rows:
+        snapshot.recent_events[row.dimension_values[0].value] = int(row.metric_values[0].value)
+    if recent.totals:
+        snapshot.recent_total = int(recent.totals[0].metric_values[0].value)
+
+def _fetch_deal_funnel(client, property_name: str, snapshot: MetricsSnapshot):
+    exact = fetch_exact(client, property_name, deal_funnel_spec(snapshot.days_back))
+    snapshot.funnel_rows = exact.rows
+    snapshot.funnel_quality = exact.quality()
+
+def _fetch_attribution(client, property_name: str, snapshot: MetricsSnapshot):
+    exact = fetch_exact(client, property_name, attribution_spec(snapshot.days_back))
+    snapshot.attribution_rows = exact.rows
+    snapshot.attribution_quality = exact.quality()
+
+FETCHERS = {
+    "events": _fetch_events,
+    "deal_funnel": _fetch_deal_funnel,
+    "attribution": _fetch_attribution,
+}
+
+def fetch_snapshot(client, property_name: str, days_back: int = DAYS_BACK) -> MetricsSnapshot:
+    """Fetch every part from GA4, recording failed parts instead of raising."""
+    snapshot = MetricsSnapshot(property_name=property_name, days_back=days_back, fetched_at=time.time())
+    for part in PARTS:
+        try:
+            FETCHERS[part](client, property_name, snapshot)
+        except Exception as e:
+            snapshot.errors[part] = f"Failed to fetch {part.replace('_', ' ')}: {str(e)}"
+    return snapshot
+
+class MetricsCore:
+    """Snapshots per property and window, kept in memory and on disk for `ttl` seconds.
+
+    The first consumer in a run fetches; later ones, in this process or another,
+    read the stored snapshot and make no API calls. Snapshots with failed parts
+    are not written to disk and are retried after RETRY_AFTER seconds.
+    """
+
+    def __init__(self, cache_dir: Path = METRICS_CACHE_DIR, ttl: int = METRICS_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._entries: Dict[str, MetricsSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, property_name: str, days_back: int) -> Path:
+        return self.cache_dir / f"{property_name.replace('/', '-')}-{days_back}d.json"
+
+    def _load(self, path: Path) -> Optional[MetricsSnapshot]:
+        try:
+            with open(path) as f:
+                return MetricsSnapshot.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, path: Path, snapshot: MetricsSnapshot):
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Serialize fetches across processes so concurrent runs share one."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.cache_dir / ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            yield False
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def get(self, client, property_name: str, days_back: int = DAYS_BACK,
+            refresh: bool = False) -> MetricsSnapshot:
+        """The current snapshot, fetching it only when none is fresh."""
+        key = f"{property_name}/{days_back}"
+        path = self._path(property_name, days_back)
+
+        with self._lock:
+            entry = None if refresh else self._entries.get(key)
+            if entry is not None and entry.fresh(self.ttl):
+                return entry
+
+            with self._locked() as on_disk:
+                entry = None if refresh or not on_disk else self._load(path)
+                if entry is None or not entry.fresh(self.ttl):
+                    entry = fetch_snapshot(client, property_name, days_back)
+                    if on_disk and not entry.errors:
+                        try:
+                            self._store(path, entry)
+                        except OSError:
+                            pass
+
+            self._entries[key] = entry
+            return entry
+
+_core: Optional[MetricsCore] = None
+_core_lock = threading.Lock()
+
+def get_metrics_core() -> MetricsCore:
+    """Process-wide metrics core, so the daemon's checker and validator share snapshots."""
+    global _core
+    with _core_lock:
+        if _core is None:
+            _core = MetricsCore()
+        return _core
@@ -0,0 +1,246 @@
+"""
+GA4 Query Builder for PRTD
+Typed report specs compiled once into Data API request protos
+"""
+
+import json
+import hashlib
+import functools
+from dataclasses import dataclass, replace
+from typing import Iterator, Optional, Sequence, Tuple
+
+from google.analytics.data_v1beta.types import (
+    RunReportRequest,
+    RunRealtimeReportRequest,
+    Dimension,
+    Metric,
+    DateRange,
+    MinuteRange,
+    FilterExpression,
+    FilterExpressionList,
+    Filter,
+    MetricAggregation,
+    OrderBy
+)
+
+# Rows per page when paginating a standard report (the API caps a page at 250,000)
+PAGE_SIZE = 100000
+
+# StringFilter match types plus in_list, which compiles to an InListFilter
+MATCH_TYPES = ("exact", "begins_with", "ends_with", "contains",
+               "full_regexp", "partial_regexp", "in_list")
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """A single dimension filter; a report's filters are AND-ed together."""
+    field: str
+    values: Tuple[str, ...]
+    match: str = "exact"
+
+    def __post_init__(self):
+        object.__setattr__(self, "values", tuple(self.values))
+        if self.match not in MATCH_TYPES:
+            raise ValueError(f"Unknown match type: {self.match}")
+        if self.match != "in_list" and len(self.values) != 1:
+            raise ValueError(f"{self.match} filters take exactly one value")
+
+    def to_dict(self) -> dict:
+        # List membership is order-independent, so sort it for a canonical form
+        values = sorted(self.values) if self.match == "in_list" else list(self.values)
+        return {"field": self.field, "match": self.match, "values": values}
+
+# Server-side aggregates returned as totals / maximums / minimums rows
+AGGREGATIONS = ("total", "maximum", "minimum", "count")
+
+@dataclass(frozen=True)
+class OrderSpec:
+    """Sort rows by one dimension or metric of the report."""
+    field: str
+    desc: bool = True
+
+    def to_dict(self) -> dict:
+        return {"field": self.field, "desc": self.desc}
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """Dimensions, metrics, range and filters for one report.
+
+    Setting `minute_range` makes it a realtime report; `date_range` is then ignored.
+    With `order_by`, `limit` keeps the top rows instead of arbitrary ones.
+    """
+    dimensions: Tuple[str, ...]
+    metrics: Tuple[str, ...]
+    date_range: Tuple[str, str] = ("7daysAgo", "today")
+    filters: Tuple[FilterSpec, ...] = ()
+    limit: int = 0
+    minute_range: Optional[Tuple[int, int]] = None
+    offset: int = 0
+    order_by: Tuple[OrderSpec, ...] = ()
+    aggregations: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, "dimensions", tuple(self.dimensions))
+        object.__setattr__(self, "metrics", tuple(self.metrics))
+        object.__setattr__(self, "date_range", tuple(self.date_range))
+        object.__setattr__(self, "filters", tuple(self.filters))
+        object.__setattr__(self, "order_by", tuple(self.order_by))
+        object.__setattr__(self, "aggregations", tuple(self.aggregations))
+        if self.minute_range is not None:
+            object.__setattr__(self, "minute_range", tuple(self.minute_range))
+        for aggregation in self.aggregations:
+            if aggregation not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation: {aggregation}")
+
+    @property
+    def realtime(self) -> bool:
+        return self.minute_range is not None
+
+    def with_changes(self, **changes) -> "ReportSpec":
+        """Copy of this spec with some fields replaced."""
+        return replace(self, **changes)
+
+    def to_dict(self) -> dict:
+        """Canonical plain-data form, stable across runs."""
+        spec = {
+            "dimensions": list(self.dimensions),
+            "metrics": list(self.metrics),
+            "filters": sorted((f.to_dict() for f in self.filters),
+                              key=lambda f: json.dumps(f, sort_keys=True)),
+            "limit": self.limit
+        }
+        if self.offset:
+            spec["offset"] = self.offset
+        if self.order_by:
+            spec["order_by"] = [o.to_dict() for o in self.order_by]
+        if self.aggregations:
+            spec["aggregations"] = sorted(self.aggregations)
+        if self.realtime:
+            spec["minute_range"] = list(self.minute_range)
+        else:
+            spec["date_range"] = list(self.date_range)
+        return spec
+
+def event_filter(*events: str) -> FilterSpec:
+    """Match any of the given event names."""
+    if len(events) == 1:
+        return FilterSpec("eventName", events)
+    return FilterSpec("eventName", events, match="in_list")
+
+def field_filter(field_name: str, value: str, match: str = "exact") -> FilterSpec:
+    """Match one dimension against a single value."""
+    return FilterSpec(field_name, (value,), match=match)
+
+def descending(field_name: str) -> OrderSpec:
+    """Largest first; with a limit, the report's top N."""
+    return OrderSpec(field_name, desc=True)
+
+def ascending(field_name: str) -> OrderSpec:
+    return OrderSpec(field_name, desc=False)
+
+def report(dimensions: Sequence[str], metrics: Sequence[str], days_back: int = 7,
+           filters: Sequence[FilterSpec] = (), limit: int = 0,
+           order_by: Sequence[OrderSpec] = (), aggregations: Sequence[str] = ()) -> ReportSpec:
+    """Spec for a standard report over the last `days_back` days."""
+    return ReportSpec(
+        dimensions=dimensions,
+        metrics=metrics,
+        date_range=(f"{days_back}daysAgo", "today"),
+        filters=filters,
+        limit=limit,
+        order_by=order_by,
+        aggregations=aggregations
+    )
+
+def realtime_report(dimensions: Sequence[str], metrics: Sequence[str],
+                    minutes_back: int = 29, limit: int = 0,
+                    order_by: Sequence[OrderSpec] = (), aggregations: Sequence[str] = ()) -> ReportSpec:
+    """Spec for a realtime report over the last `minutes_back` minutes."""
+    return ReportSpec(
+        dimensions=dimensions,
+        metrics=metrics,
+        minute_range=(minutes_back, 0),
+        limit=limit,
+        order_by=order_by,
+        aggregations=aggregations
+    )
+
+def _compile_filter(spec: FilterSpec) -> FilterExpression:
+    if spec.match == "in_list":
+        return FilterExpression(filter=Filter(
+            field_name=spec.field,
+            in_list_filter=Filter.InListFilter(values=list(spec.values))
+        ))
+
+    return FilterExpression(filter=Filter(
+        field_name=spec.field,
+        string_filter=Filter.StringFilter(
+            match_type=Filter.StringFilter.MatchType[spec.match.upper()],
+            value=spec.values[0]
+        )
+    ))
+
+def _compile_order(spec: OrderSpec, metrics: Tuple[str, ...]) -> OrderBy:
+    if spec.field in metrics:
+        return OrderBy(metric=OrderBy.MetricOrderBy(metric_name=spec.field), desc=spec.desc)
+    return OrderBy(dimension=OrderBy.DimensionOrderBy(dimension_name=spec.field), desc=spec.desc)
+
+def compile_filters(filters: Tuple[FilterSpec, ...]) -> Optional[FilterExpression]:
+    """AND the filters into one FilterExpression (None when there are none)."""
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return _compile_filter(filters[0])
+    return FilterExpression(and_group=FilterExpressionList(
+        expressions=[_compile_filter(f) for f in filters]
+    ))
+
+@functools.lru_cache(maxsize=512)
+def compile_request(property_name: str, spec: ReportSpec):
+    """Build the request proto for a spec, once per (property, spec).
+
+    The returned proto is shared between callers and must not be mutated.
+    """
+    fields = {
+        "property": property_name,
+        "dimensions": [Dimension(name=name) for name in spec.dimensions],
+        "metrics": [Metric(name=name) for name in spec.metrics],
+        "limit": spec.limit
+    }
+
+    dimension_filter = compile_filters(spec.filters)
+    if dimension_filter is not None:
+        fields["dimension_filter"] = dimension_filter
+    if spec.order_by:
+        fields["order_bys"] = [_compile_order(o, spec.metrics) for o in spec.order_by]
+    if spec.aggregations:
+        fields["metric_aggregations"] = [MetricAggregation[a.upper()] for a in spec.aggregations]
+
+    if spec.realtime:
+        start, end = spec.minute_range
+        return RunRealtimeReportRequest(
+            minute_ranges=[MinuteRange(start_minutes_ago=start, end_minutes_ago=end)],
+            **fields
+        )
+
+    start, end = spec.date_range
+    return RunReportRequest(date_ranges=[DateRange(start_date=start, end_date=end)],
+                            offset=spec.offset, **fields)
+
+def iter_rows(client, property_name: str, spec: ReportSpec, page_size: int = PAGE_SIZE) -> Iterator:
+    """Yield every row of a standard report, fetching page_size rows per request."""
+    offset = spec.offset
+    while True:
+        page = spec.with_changes(offset=offset, limit=page_size)
+        response = client.run_report(request=compile_request(property_name, page))
+        yield from response.rows
+
+        offset += len(response.rows)
+        if len(response.rows) < page_size or offset >= response.row_count:
+            return
+
+@functools.lru_cache(maxsize=512)
+def canonical_hash(property_name: str, spec: ReportSpec) -> str:
+    """Stable hash of a request, for result caching and deduplication."""
+    payload = json.dumps({"property": property_name, **spec.to_dict()},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
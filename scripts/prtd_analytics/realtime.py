@@ -0,0 +1,84 @@
+"""
+Realtime Query Planner for PRTD
+Splits wide realtime reports into narrow breakdowns fetched concurrently
+"""
+
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from prtd_analytics.query import FilterSpec, OrderSpec, ReportSpec
+from prtd_analytics.sampling import ExactReport, fetch_exact
+
+DEFAULT_CONCURRENCY = 5
+
+@dataclass(frozen=True)
+class Breakdown:
+    """One narrow slice of a wide report: the few dimensions one output needs."""
+    dimensions: Tuple[str, ...]
+    metrics: Tuple[str, ...]
+    filters: Tuple[FilterSpec, ...] = ()
+    order_by: Tuple[OrderSpec, ...] = ()
+    limit: int = 0
+
+    def __post_init__(self):
+        object.__setattr__(self, "dimensions", tuple(self.dimensions))
+        object.__setattr__(self, "metrics", tuple(self.metrics))
+        object.__setattr__(self, "filters", tuple(self.filters))
+        object.__setattr__(self, "order_by", tuple(self.order_by))
+
+def plan_breakdowns(spec: ReportSpec, breakdowns: Dict[str, Breakdown]) -> Dict[str, ReportSpec]:
+    """Narrow specs that share the wide spec's range and filters.
+
+    A wide report returns one row per combination of its dimensions, so its size
+    is the product of their cardinalities; the breakdowns together return roughly
+    the sum. Each breakdown may only use fields of the wide spec.
+    """
+    specs = {}
+    for name, breakdown in breakdowns.items():
+        unknown = (set(breakdown.dimensions) - set(spec.dimensions)) | (set(breakdown.metrics) - set(spec.metrics))
+        if unknown:
+            raise ValueError(f"Breakdown {name} uses fields outside the report: {', '.join(sorted(unknown))}")
+        # GA4 only filters on dimensions that are part of the request
+        unfiltered = {f.field for f in breakdown.filters} - set(breakdown.dimensions)
+        if unfiltered:
+            raise ValueError(f"Breakdown {name} filters on dimensions it does not request: "
+                             f"{', '.join(sorted(unfiltered))}")
+
+        specs[name] = spec.with_changes(
+            dimensions=breakdown.dimensions,
+            metrics=breakdown.metrics,
+            filters=spec.filters + breakdown.filters,
+            order_by=breakdown.order_by,
+            limit=breakdown.limit,
+            aggregations=()
+        )
+    return specs
+
+def merge_quality(reports: List[ExactReport]) -> Dict:
+    """One data_quality entry for several reports."""
+    return {
+        "exact": all(r.exact for r in reports),
+        "partitions": sum(r.partitions for r in reports),
+        "thresholded": any(r.thresholded for r in reports),
+        "notes": [note for r in reports for note in r.notes]
+    }
+
+class RealtimePlanner:
+    """Runs the breakdowns of a wide report concurrently instead of the report itself.
+
+    Built for realtime specs, but standard specs (such as today's deal activity) work the same way.
+    """
+
+    def __init__(self, client, property_name: str, concurrency: int = DEFAULT_CONCURRENCY):
+        self.client = client
+        self.property_name = property_name
+        self.concurrency = concurrency
+
+    def run(self, spec: ReportSpec, breakdowns: Dict[str, Breakdown]) -> Dict[str, ExactReport]:
+        """Rows for every breakdown; high-cardinality ones are split if GA4 folds them into (other)."""
+        specs = plan_breakdowns(spec, breakdowns)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {name: executor.submit(fetch_exact, self.client, self.property_name, narrow)
+                       for name, narrow in specs.items()}
+            return {name: future.result() for name, future in futures.items()}
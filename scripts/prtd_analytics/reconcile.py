@@ -0,0 +1,197 @@
+"""
+Click Reconciliation for PRTD
+Aligns GA4 click_external_deal events with first-party /api/track-click counts
+"""
+
+import os
+import datetime
+from zoneinfo import ZoneInfo
+from typing import Dict, Optional, Tuple
+
+from prtd_analytics.clicklog import ClickStore
+from prtd_analytics.query import ReportSpec, event_filter
+from prtd_analytics.sampling import fetch_exact
+
+# GA4 reports dateHour in the property's time zone; first-party counts are UTC
+PROPERTY_TIMEZONE = os.getenv('PRTD_PROPERTY_TZ', 'America/Puerto_Rico')
+
+# GA4 keeps processing events for a while; only reconcile hours at least this old
+SETTLE_HOURS = 24
+
+# How far back the first run reaches when nothing has been reconciled yet
+INITIAL_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ga4_clicks (
+    hour INTEGER NOT NULL,
+    deal_id TEXT NOT NULL,
+    clicks INTEGER NOT NULL,
+    PRIMARY KEY (hour, deal_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS click_reconciliation (
+    hour INTEGER NOT NULL,
+    deal_id TEXT NOT NULL,
+    server_clicks INTEGER NOT NULL,
+    ga4_clicks INTEGER NOT NULL,
+    PRIMARY KEY (hour, deal_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reconcile_state (
+    name TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Both sides per (hour, deal): server rows joined to GA4 on the primary key,
+# plus GA4 rows with no server clicks in that hour
+RECONCILE_SQL = """
+INSERT INTO click_reconciliation (hour, deal_id, server_clicks, ga4_clicks)
+SELECT s.hour, s.deal_id, s.clicks, COALESCE(g.clicks, 0)
+FROM (
+    SELECT minute / 60 AS hour, deal_id, SUM(clicks) AS clicks
+    FROM click_counts
+    WHERE minute >= :start * 60 AND minute < :end * 60
+    GROUP BY hour, deal_id
+) AS s
+LEFT JOIN ga4_clicks AS g ON g.hour = s.hour AND g.deal_id = s.deal_id
+UNION ALL
+SELECT g.hour, g.deal_id, 0, g.clicks
+FROM ga4_clicks AS g
+WHERE g.hour >= :start AND g.hour < :end
+  AND NOT EXISTS (
+    SELECT 1 FROM click_counts AS c
+    WHERE c.minute >= g.hour * 60 AND c.minute < g.hour * 60 + 60 AND c.deal_id = g.deal_id
+  )
+"""
+
+def _hour_iso(hour: int) -> str:
+    return datetime.datetime.fromtimestamp(hour * 3600, datetime.timezone.utc).isoformat()[:13]
+
+def _loss(server: int, ga4: int, missed: int, extra: int) -> Dict:
+    return {
+        "server_clicks": server,
+        "ga4_clicks": ga4,
+        "missed_by_ga4": missed,
+        "ga4_only": extra,
+        "loss_rate": round(missed / server * 100, 1) if server else None
+    }
+
+class ClickReconciler:
+    """Incrementally joins GA4 and first-party clicks by deal and UTC hour."""
+
+    def __init__(self, client, property_name: str, store: ClickStore,
+                 timezone: str = PROPERTY_TIMEZONE, settle_hours: int = SETTLE_HOURS):
+        self.client = client
+        self.property_name = property_name
+        self.store = store
+        self.conn = store.conn
+        self.timezone = ZoneInfo(timezone)
+        self.settle_hours = settle_hours
+        self.conn.executescript(SCHEMA)
+
+    def watermark(self) -> Optional[int]:
+        """First UTC epoch hour not yet reconciled."""
+        row = self.conn.execute("SELECT watermark FROM reconcile_state WHERE name = 'clicks'").fetchone()
+        return row[0] if row else None
+
+    def pending_range(self, now: Optional[datetime.datetime] = None,
+                      since: Optional[datetime.datetime] = None) -> Tuple[int, int]:
+        """(start, end) epoch hours still to reconcile; empty when start >= end."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        end = int(now.timestamp()) // 3600 - self.settle_hours
+
+        if since is not None:
+            return int(since.timestamp()) // 3600, end
+
+        start = self.watermark()
+        if start is None:
+            # Nothing to compare before first-party logging began
+            first = self.conn.execute("SELECT MIN(minute) FROM click_counts").fetchone()[0]
+            start = max(end - INITIAL_DAYS * 24, first // 60 if first is not None else end)
+        return start, end
+
+    def _ga4_spec(self, start: int, end: int) -> ReportSpec:
+        first_day = datetime.datetime.fromtimestamp(start * 3600, self.timezone).date()
+        last_day = datetime.datetime.fromtimestamp(end * 3600 - 1, self.timezone).date()
+        return ReportSpec(
+            dimensions=["dateHour", "customEvent:deal_id"],
+            metrics=["eventCount"],
+            date_range=(first_day.isoformat(), last_day.isoformat()),
+            filters=[event_filter("click_external_deal")]
+        )
+
+    def _utc_hour(self, date_hour: str) -> int:
+        local = datetime.datetime.strptime(date_hour, "%Y%m%d%H").replace(tzinfo=self.timezone)
+        return int(local.timestamp()) // 3600
+
+    def run(self, now: Optional[datetime.datetime] = None,
+            since: Optional[datetime.datetime] = None) -> Dict:
+        """Fetch GA4 clicks for the pending hours and reconcile them against the click log."""
+        start, end = self.pending_range(now, since)
+        if start >= end:
+            return {"hours": 0, "start": None, "end": None, "data_quality": None, "unattributed_ga4_clicks": 0}
+
+        exact = fetch_exact(self.client, self.property_name, self._ga4_spec(start, end))
+
+        rows, unattributed = {}, 0
+        for (date_hour, deal_id), (clicks,) in exact.rows:
+            hour = self._utc_hour(date_hour)
+            if not start <= hour < end:
+                continue
+            if deal_id in ("", "(not set)"):
+                unattributed += int(clicks)
+                continue
+            rows[(hour, deal_id)] = rows.get((hour, deal_id), 0) + int(clicks)
+
+        with self.conn:
+            for table in ("ga4_clicks", "click_reconciliation"):
+                self.conn.execute(f"DELETE FROM {table} WHERE hour >= ? AND hour < ?", (start, end))
+            self.conn.executemany("INSERT INTO ga4_clicks (hour, deal_id, clicks) VALUES (?, ?, ?)",
+                                  [(hour, deal_id, clicks) for (hour, deal_id), clicks in rows.items()])
+            self.conn.execute(RECONCILE_SQL, {"start": start, "end": end})
+            self.conn.execute(
+                "INSERT INTO reconcile_state (name, watermark, updated_at) VALUES ('clicks', ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET watermark = MAX(watermark, excluded.watermark), "
+                "updated_at = excluded.updated_at",
+                (end, datetime.datetime.now().isoformat())
+            )
+
+        return {
+            "hours": end - start,
+            "start": _hour_iso(start),
+            "end": _hour_iso(end),
+            "data_quality": exact.quality(),
+            "unattributed_ga4_clicks": unattributed
+        }
+
+    def summary(self, days: int = 7, limit: int = 20,
+                now: Optional[datetime.datetime] = None) -> Dict:
+        """Loss rates overall and per deal over the last `days` of reconciled hours."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        until = int(now.timestamp()) // 3600
+        since = until - days * 24
+
+        totals = self.conn.execute(
+            "SELECT COALESCE(SUM(server_clicks), 0), COALESCE(SUM(ga4_clicks), 0), "
+            "COALESCE(SUM(MAX(server_clicks - ga4_clicks, 0)), 0), "
+            "COALESCE(SUM(MAX(ga4_clicks - server_clicks, 0)), 0) "
+            "FROM click_reconciliation WHERE hour >= ? AND hour < ?",
+            (since, until)
+        ).fetchone()
+
+        deals = self.conn.execute(
+            "SELECT deal_id, SUM(server_clicks), SUM(ga4_clicks), "
+            "SUM(MAX(server_clicks - ga4_clicks, 0)) AS missed, SUM(MAX(ga4_clicks - server_clicks, 0)) "
+            "FROM click_reconciliation WHERE hour >= ? AND hour < ? "
+            "GROUP BY deal_id ORDER BY missed DESC, deal_id LIMIT ?",
+            (since, until, limit)
+        ).fetchall()
+
+        return {
+            "days": days,
+            "reconciled_through": _hour_iso(self.watermark()) if self.watermark() is not None else None,
+            "overall": _loss(*totals),
+            "deals": {deal_id: _loss(*values) for deal_id, *values in deals}
+        }
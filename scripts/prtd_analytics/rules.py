@@ -0,0 +1,130 @@
+"""
+Threshold Rule Engine for PRTD
+Config-driven HealthThreshold rules compiled once and evaluated as arrays
+"""
+
+import os
+import json
+from pathlib import Path
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from prtd_analytics import SCRIPTS_DIR
+
+RULES_PATH = Path(os.getenv('PRTD_RULES_PATH', str(SCRIPTS_DIR / 'analytics-rules.json')))
+
+LEVELS = ("ok", "warning", "critical")
+
+@dataclass
+class HealthThreshold:
+    """Health check threshold configuration."""
+    metric_name: str
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    critical_min: Optional[float] = None
+    critical_max: Optional[float] = None
+    warning_message: str = ""
+    critical_message: str = ""
+
+def load_rules(section: str, path: Path = RULES_PATH) -> Dict[str, HealthThreshold]:
+    """Named thresholds from one section ('health', 'realtime', ...) of the rules file."""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️  Rules file not found: {path}; no threshold rules loaded")
+        return {}
+
+    known = {f.name for f in fields(HealthThreshold)}
+    rules = {}
+    for name, entry in config.get(section, {}).items():
+        unknown = set(entry) - known
+        if unknown:
+            raise ValueError(f"Rule {section}.{name} has unknown fields: {', '.join(sorted(unknown))}")
+        rules[name] = HealthThreshold(**entry)
+    return rules
+
+def event_metrics(counts: Dict[str, float]) -> Dict[str, float]:
+    """Event counts as `events.<name>` metrics, the names rules use for events."""
+    return {f"events.{name}": count for name, count in counts.items()}
+
+def _bounds(values: Sequence[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+class RuleSet:
+    """Thresholds compiled into bound arrays; one pass checks every rule at once.
+
+    A value breaks a rule when it is below min / above max. Unset bounds and
+    missing metrics are NaN, which never compares true, so they never fire.
+    """
+
+    def __init__(self, rules: Dict[str, HealthThreshold]):
+        self.rules = rules
+        self.names = list(rules)
+        self.metrics = sorted({rule.metric_name for rule in rules.values()})
+        self.metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+        thresholds = [rules[name] for name in self.names]
+        self.columns = np.array([self.metric_index[t.metric_name] for t in thresholds], dtype=np.intp)
+        self.min = _bounds([t.min_value for t in thresholds])
+        self.max = _bounds([t.max_value for t in thresholds])
+        self.critical_min = _bounds([t.critical_min for t in thresholds])
+        self.critical_max = _bounds([t.critical_max for t in thresholds])
+
+    @classmethod
+    def load(cls, section: str, path: Path = RULES_PATH) -> "RuleSet":
+        return cls(load_rules(section, path))
+
+    def frame(self, rows: Sequence[Dict[str, float]], missing: float = np.nan) -> np.ndarray:
+        """Metrics frame: one row per run or tick, one column per metric the rules use."""
+        frame = np.full((len(rows), len(self.metrics)), missing, dtype=np.float64)
+        for r, row in enumerate(rows):
+            for metric, value in row.items():
+                column = self.metric_index.get(metric)
+                if column is not None and value is not None:
+                    frame[r, column] = value
+        return frame
+
+    def evaluate_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Level per row and rule: 0 ok, 1 warning, 2 critical."""
+        values = frame[:, self.columns]
+        with np.errstate(invalid='ignore'):
+            critical = (values < self.critical_min) | (values > self.critical_max)
+            warning = (values < self.min) | (values > self.max)
+        return np.where(critical, 2, np.where(warning, 1, 0)).astype(np.int8)
+
+    def evaluate(self, metrics: Dict[str, float], missing: float = np.nan) -> List[Dict]:
+        """Violations for one set of metrics, critical first."""
+        if not self.names:
+            return []
+
+        frame = self.frame([metrics], missing)
+        levels = self.evaluate_frame(frame)[0]
+        values = frame[0, self.columns]
+
+        violations = []
+        broken = np.flatnonzero(levels)
+        for i in broken[np.argsort(-levels[broken], kind='stable')]:
+            rule = self.rules[self.names[i]]
+            value = float(values[i])
+            if levels[i] == 2:
+                low = value < self.critical_min[i]
+                threshold = rule.critical_min if low else rule.critical_max
+                template = rule.critical_message or rule.warning_message
+            else:
+                low = value < self.min[i]
+                threshold = rule.min_value if low else rule.max_value
+                template = rule.warning_message
+
+            direction = "below" if low else "above"
+            violations.append({
+                "rule": self.names[i],
+                "metric": rule.metric_name,
+                "value": value,
+                "threshold": threshold,
+                "level": LEVELS[levels[i]],
+                "message": f"{template or rule.metric_name} ({value:g}, {direction} {threshold:g})"
+            })
+        return violations
@@ -0,0 +1,290 @@
+"""
+Sampling and Thresholding Guard for PRTD
+Detects approximate GA4 responses and re-issues them as smaller exact partitions
+"""
+
+import datetime
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from google.analytics.data_v1beta.types import (
+    RunReportResponse,
+    RunRealtimeReportResponse,
+    Row,
+    DimensionValue,
+    MetricValue
+)
+
+from prtd_analytics.query import PAGE_SIZE, ReportSpec, compile_request, field_filter
+
+Merged = Dict[Tuple[str, ...], List]
+
+OTHER_ROW = "(other)"
+
+MAX_PARTITIONS = 64          # stop splitting once a report has been cut this many ways
+DATE_SPLIT_FACTOR = 4        # each date split cuts the range into up to this many pieces
+DEFAULT_CONCURRENCY = 4
+
+# Aggregation -> response field it is returned in
+AGGREGATE_FIELDS = {"total": "totals", "maximum": "maximums", "minimum": "minimums"}
+
+# Metrics that can be summed across date partitions; user counts cannot
+ADDITIVE_METRICS = {
+    "eventCount", "eventValue", "screenPageViews", "sessions", "engagedSessions",
+    "conversions", "keyEvents", "userEngagementDuration", "totalRevenue", "purchaseRevenue",
+}
+
+def response_quality(response) -> Dict:
+    """Sampling, thresholding and '(other)' flags from a response's metadata and rows.
+
+    Realtime responses carry no metadata, so only the '(other)' row check applies.
+    """
+    other_row = any(d.value == OTHER_ROW for row in response.rows for d in row.dimension_values)
+    quality = {"sampled": False, "sample_ratio": None, "thresholded": False, "other_row": other_row}
+
+    if isinstance(response, RunRealtimeReportResponse):
+        return quality
+
+    metadata = response.metadata
+    samples_read = sum(s.samples_read_count for s in metadata.sampling_metadatas)
+    sampling_space = sum(s.sampling_space_size for s in metadata.sampling_metadatas)
+
+    quality.update({
+        "sampled": bool(metadata.sampling_metadatas),
+        "sample_ratio": round(samples_read / sampling_space, 4) if sampling_space else None,
+        "thresholded": bool(metadata.subject_to_thresholding),
+        "other_row": other_row or bool(metadata.data_loss_from_other_row)
+    })
+    return quality
+
+def _resolve_date(value: str, today: datetime.date) -> Optional[datetime.date]:
+    """GA4 relative or ISO date -> date, or None if unrecognized."""
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - datetime.timedelta(days=1)
+    if value.endswith("daysAgo"):
+        return today - datetime.timedelta(days=int(value[:-len("daysAgo")]))
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+def split_by_date(spec: ReportSpec, today: Optional[datetime.date] = None) -> List[ReportSpec]:
+    """Cut a standard report's date range into up to DATE_SPLIT_FACTOR contiguous ranges.
+
+    Returns [] when the range is a single day, or when summing partitions
+    would be wrong (user metrics without a date dimension).
+    """
+    if spec.realtime:
+        return []
+    if "date" not in spec.dimensions and not set(spec.metrics) <= ADDITIVE_METRICS:
+        return []
+
+    today = today or datetime.date.today()
+    start, end = (_resolve_date(d, today) for d in spec.date_range)
+    if start is None or end is None or start >= end:
+        return []
+
+    days = (end - start).days + 1
+    pieces = min(DATE_SPLIT_FACTOR, days)
+    bounds = [start + datetime.timedelta(days=days * i // pieces) for i in range(pieces + 1)]
+    return [
+        spec.with_changes(date_range=(bounds[i].isoformat(),
+                                      (bounds[i + 1] - datetime.timedelta(days=1)).isoformat()))
+        for i in range(pieces)
+    ]
+
+def split_by_event(spec: ReportSpec, events: List[str]) -> List[ReportSpec]:
+    """One partition per event name, when eventName is a dimension and not already pinned."""
+    if "eventName" not in spec.dimensions or len(events) < 2:
+        return []
+    if any(f.field == "eventName" and f.match != "in_list" for f in spec.filters):
+        return []
+
+    others = tuple(f for f in spec.filters if f.field != "eventName")
+    return [spec.with_changes(filters=others + (field_filter("eventName", event),)) for event in events]
+
+@dataclass
+class ExactReport:
+    """Merged rows of a report plus how exact they are."""
+    dimension_headers: List[str]
+    metric_headers: List[str]
+    rows: List[Tuple[Tuple[str, ...], List]] = field(default_factory=list)
+    # aggregation name -> one value per metric
+    aggregates: Dict[str, List] = field(default_factory=dict)
+    partitions: int = 1
+    exact: bool = True
+    thresholded: bool = False
+    notes: List[str] = field(default_factory=list)
+
+    def quality(self) -> Dict:
+        return {
+            "exact": self.exact,
+            "partitions": self.partitions,
+            "thresholded": self.thresholded,
+            "notes": self.notes
+        }
+
+    def to_response(self, realtime: bool = False):
+        """Rebuild a response proto so existing row-processing code can consume it."""
+        response_type = RunRealtimeReportResponse if realtime else RunReportResponse
+        return response_type(
+            dimension_headers=[{"name": name} for name in self.dimension_headers],
+            metric_headers=[{"name": name} for name in self.metric_headers],
+            rows=[
+                Row(dimension_values=[DimensionValue(value=v) for v in dims],
+                    metric_values=[MetricValue(value=str(v)) for v in metrics])
+                for dims, metrics in self.rows
+            ],
+            row_count=len(self.rows),
+            **{AGGREGATE_FIELDS[name]: [Row(metric_values=[MetricValue(value=str(v)) for v in values])]
+               for name, values in self.aggregates.items() if name in AGGREGATE_FIELDS}
+        )
+
+def _label(spec: ReportSpec) -> str:
+    """Short description of a partition for notes."""
+    if spec.realtime:
+        span = f"last {spec.minute_range[0]} minutes"
+    else:
+        span = f"{spec.date_range[0]}..{spec.date_range[1]}"
+    events = [v for f in spec.filters if f.field == "eventName" and f.match == "exact" for v in f.values]
+    return f"{span} ({events[0]})" if events else span
+
+def _number(value: str):
+    return float(value) if any(c in value for c in ".eE") else int(value)
+
+def _response_aggregates(response, aggregations) -> Dict[str, List]:
+    """Aggregate rows GA4 returned alongside a response's rows."""
+    aggregates = {}
+    for name in aggregations:
+        returned = getattr(response, AGGREGATE_FIELDS.get(name, ""), None)
+        if returned:
+            aggregates[name] = [_number(m.value) for m in returned[0].metric_values]
+    return aggregates
+
+def _merge(merged: Merged, rows) -> Merged:
+    """Fold response rows into merged rows keyed by dimension values, summing metrics."""
+    for row in rows:
+        key = tuple(d.value for d in row.dimension_values)
+        values = [_number(m.value) for m in row.metric_values]
+        if key in merged:
+            merged[key] = [a + b for a, b in zip(merged[key], values)]
+        else:
+            merged[key] = values
+    return merged
+
+def _aggregate(rows: List[Tuple[Tuple[str, ...], List]], aggregations) -> Dict[str, List]:
+    """Recompute a report's aggregates from its complete merged rows."""
+    columns = list(zip(*(values for _, values in rows)))
+    functions = {"total": sum, "maximum": max, "minimum": min, "count": len}
+    return {name: [functions[name](column) for column in columns] if columns else []
+            for name in aggregations}
+
+def _top(rows: List[Tuple[Tuple[str, ...], List]], spec: ReportSpec) -> List:
+    """Apply a spec's order_by and limit to merged rows."""
+    for order in reversed(spec.order_by):
+        if order.field in spec.metrics:
+            index = spec.metrics.index(order.field)
+            rows = sorted(rows, key=lambda row: row[1][index], reverse=order.desc)
+        else:
+            index = spec.dimensions.index(order.field)
+            rows = sorted(rows, key=lambda row: row[0][index], reverse=order.desc)
+    return rows[:spec.limit] if spec.limit else rows
+
+class ExactFetcher:
+    """Runs a report, splitting it by date and then by event until GA4 stops approximating."""
+
+    def __init__(self, client, property_name: str, concurrency: int = DEFAULT_CONCURRENCY,
+                 page_size: int = PAGE_SIZE):
+        self.client = client
+        self.property_name = property_name
+        self.concurrency = concurrency
+        self.page_size = page_size
+
+    def _fetch(self, spec: ReportSpec):
+        """Rows of one partition, up to its limit, with the quality and aggregates of its first page."""
+        if spec.realtime:
+            response = self.client.run_realtime_report(request=compile_request(self.property_name, spec))
+            return (list(response.rows), response_quality(response),
+                    _response_aggregates(response, spec.aggregations))
+
+        rows, quality, aggregates, offset = [], None, None, spec.offset
+        while True:
+            page_size = min(self.page_size, spec.limit - len(rows)) if spec.limit else self.page_size
+            page = spec.with_changes(offset=offset, limit=page_size)
+            response = self.client.run_report(request=compile_request(self.property_name, page))
+            if quality is None:
+                quality = response_quality(response)
+                aggregates = _response_aggregates(response, spec.aggregations)
+            rows.extend(response.rows)
+            offset += len(response.rows)
+            if (len(response.rows) < page_size or offset >= response.row_count
+                    or (spec.limit and len(rows) >= spec.limit)):
+                return rows, quality, aggregates
+
+    def _events(self, spec: ReportSpec) -> List[str]:
+        """Event names present in a partition, from the filter or a one-dimension lookup."""
+        for f in spec.filters:
+            if f.field == "eventName" and f.match == "in_list":
+                return list(f.values)
+
+        lookup = spec.with_changes(dimensions=("eventName",), metrics=("eventCount",), limit=0,
+                                   order_by=(), aggregations=())
+        rows, _, _ = self._fetch(lookup)
+        return [row.dimension_values[0].value for row in rows if row.dimension_values[0].value != OTHER_ROW]
+
+    def _split(self, spec: ReportSpec) -> List[ReportSpec]:
+        # Partitions are fetched whole; the top rows are picked after merging
+        pieces = split_by_date(spec) or split_by_event(spec, self._events(spec))
+        return [piece.with_changes(limit=0, offset=0) for piece in pieces]
+
+    def run(self, spec: ReportSpec) -> ExactReport:
+        """Fetch a report exactly where possible, merging partition rows by dimension values."""
+        merged: Merged = {}
+        result = ExactReport(list(spec.dimensions), list(spec.metrics))
+        pending = [spec]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while pending:
+                fetched = list(executor.map(self._fetch, pending))
+                retry = []
+
+                for partition, (rows, quality, aggregates) in zip(pending, fetched):
+                    result.thresholded = result.thresholded or quality["thresholded"]
+                    approximate = quality["sampled"] or quality["other_row"]
+
+                    if approximate and result.partitions < MAX_PARTITIONS:
+                        pieces = self._split(partition)
+                        if pieces:
+                            result.partitions += len(pieces) - 1
+                            retry.extend(pieces)
+                            continue
+
+                    if approximate:
+                        result.exact = False
+                        reason = "sampled" if quality["sampled"] else "collapsed into (other)"
+                        result.notes.append(f"{_label(partition)} still {reason} after splitting")
+
+                    _merge(merged, rows)
+                    if partition is spec:
+                        result.aggregates = aggregates
+
+                pending = retry
+
+        if result.thresholded:
+            result.exact = False
+            result.notes.append("GA4 applied thresholding; rows for small user counts are withheld "
+                                "and cannot be recovered by splitting")
+
+        result.rows = list(merged.items())
+        if result.partitions > 1:
+            # GA4's aggregates covered one partition; the merged rows cover them all
+            result.aggregates = _aggregate(result.rows, spec.aggregations)
+            result.rows = _top(result.rows, spec)
+        return result
+
+def fetch_exact(client, property_name: str, spec: ReportSpec, **options) -> ExactReport:
+    """Convenience wrapper around ExactFetcher(...).run(spec)."""
+    return ExactFetcher(client, property_name, **options).run(spec)
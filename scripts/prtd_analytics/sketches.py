@@ -0,0 +1,184 @@
+"""
+Streaming Sketches for PRTD
+Fixed-memory heavy-hitter and distinct-count summaries for high-cardinality data
+"""
+
+import math
+import zlib
+import heapq
+import base64
+import hashlib
+from operator import itemgetter
+from typing import Dict, List, Tuple
+
+# Counters kept per dimension; any value seen more than total/capacity times is guaranteed kept
+DEFAULT_CAPACITY = 256
+
+# 2^11 one-byte registers: 2 KiB raw, about 2.3% standard error
+DEFAULT_PRECISION = 11
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter summary (Metwally et al.) over weighted string keys.
+
+    Holds at most `capacity` counters. A key's reported count overestimates its
+    true count by at most its recorded error, and never by more than total/capacity.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # Min-heap of (count, key); entries go stale when a count grows and are skipped lazily
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _pop_min(self) -> Tuple[int, str]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    def add(self, key: str, count: int = 1):
+        """Count `count` more occurrences of `key`."""
+        self.total += count
+
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            floor, victim = self._pop_min()
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, counts: Dict[str, int]):
+        """Add every key/count pair of a mapping."""
+        for key, count in counts.items():
+            self.add(key, count)
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        """The n largest (key, count) pairs, largest first."""
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def error(self, key: str) -> int:
+        """Maximum overcount of a key's reported count."""
+        return self.errors.get(key, 0)
+
+    def min_count(self) -> int:
+        """Count any unmonitored key may have, at most."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combined summary of both streams, keeping the larger capacity."""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        floors = (self.min_count(), other.min_count())
+        counts, errors = {}, {}
+        for key in self.counts.keys() | other.counts.keys():
+            # A key missing from one summary may still have up to that summary's floor there
+            sides = [(s.counts[key], s.errors[key]) if key in s.counts else (floor, floor)
+                     for s, floor in zip((self, other), floors)]
+            counts[key] = sides[0][0] + sides[1][0]
+            errors[key] = sides[0][1] + sides[1][1]
+
+        for key, count in heapq.nlargest(merged.capacity, counts.items(), key=itemgetter(1)):
+            merged.counts[key] = count
+            merged.errors[key] = errors[key]
+        merged.total = self.total + other.total
+        merged._heap = [(c, k) for k, c in merged.counts.items()]
+        heapq.heapify(merged._heap)
+        return merged
+
+    def summary(self, n: int) -> List[Dict]:
+        """Top n keys with their count and overcount bound, for reports."""
+        return [{"value": key, "count": count, "error": self.errors[key]} for key, count in self.top(n)]
+
+    def to_dict(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "counters": [[key, count, self.errors[key]] for key, count in self.counts.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SpaceSaving":
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        for key, count, error in data["counters"]:
+            sketch.counts[key] = count
+            sketch.errors[key] = error
+        sketch._heap = [(c, k) for k, c in sketch.counts.items()]
+        heapq.heapify(sketch._heap)
+        return sketch
+
+def _hash64(value: str) -> int:
+    # Stable across processes, unlike hash(), so sketches from different runs merge
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (Flajolet et al.) with 2^precision registers."""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: bytes = None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be 4-16, got {precision}")
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+        if len(self.registers) != 1 << precision:
+            raise ValueError("Register count does not match precision")
+
+    def add(self, value: str):
+        """Count one occurrence of a value."""
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        remainder = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        """Count every value of an iterable."""
+        for value in values:
+            self.add(value)
+
+    def estimate(self) -> int:
+        """Approximate number of distinct values added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while most registers are empty
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Sketch of the union of both streams."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        return HyperLogLog(self.precision, bytes(map(max, self.registers, other.registers)))
+
+    def __ior__(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = self.merge(other).registers
+        return self
+
+    def to_dict(self) -> Dict:
+        # Registers are mostly zero for small counts and compress to a few bytes
+        return {"precision": self.precision,
+                "registers": base64.b64encode(zlib.compress(bytes(self.registers), 9)).decode()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HyperLogLog":
+        return cls(data["precision"], zlib.decompress(base64.b64decode(data["registers"])))
@@ -0,0 +1,113 @@
+"""
+GA4 Client Transport Settings for PRTD
+Builds Data API clients over gRPC or REST with keepalive tuned
+"""
+
+import os
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
+
+import grpc
+from google.auth.credentials import AnonymousCredentials
+from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.analytics.data_v1beta.services.beta_analytics_data.transports import (
+    BetaAnalyticsDataGrpcTransport,
+    BetaAnalyticsDataRestTransport
+)
+
+DATA_API_HOST = "analyticsdata.googleapis.com"
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Transport and connection settings for BetaAnalyticsDataClient."""
+    transport: str = "grpc"                   # "grpc" or "rest"
+    keepalive_time_ms: Optional[int] = 30000  # ping idle gRPC channels; None disables
+    keepalive_timeout_ms: int = 10000
+    idle_timeout_ms: Optional[int] = None     # let gRPC drop channels idle this long
+    compression: Optional[str] = None         # "gzip" or None
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """Read overrides from PRTD_GA4_* environment variables."""
+        config = cls()
+        overrides = {}
+
+        if os.getenv('PRTD_GA4_TRANSPORT'):
+            overrides['transport'] = os.getenv('PRTD_GA4_TRANSPORT').lower()
+        if os.getenv('PRTD_GA4_KEEPALIVE_MS'):
+            keepalive = int(os.getenv('PRTD_GA4_KEEPALIVE_MS'))
+            overrides['keepalive_time_ms'] = keepalive if keepalive > 0 else None
+        if os.getenv('PRTD_GA4_COMPRESSION'):
+            compression = os.getenv('PRTD_GA4_COMPRESSION').lower()
+            overrides['compression'] = None if compression == 'none' else compression
+
+        return replace(config, **overrides)
+
+# Named configurations compared by benchmark-transport.py
+PRESETS = {
+    "grpc-default": TransportConfig(keepalive_time_ms=None),
+    "grpc-keepalive": TransportConfig(),
+    "grpc-keepalive-gzip": TransportConfig(compression="gzip"),
+    "rest": TransportConfig(transport="rest"),
+}
+
+def grpc_channel_options(config: TransportConfig) -> List[Tuple[str, int]]:
+    """Channel arguments for a gRPC Data API channel."""
+    options = [
+        # Same unlimited message sizes the generated transport uses
+        ("grpc.max_send_message_length", -1),
+        ("grpc.max_receive_message_length", -1),
+    ]
+
+    if config.keepalive_time_ms:
+        options += [
+            ("grpc.keepalive_time_ms", config.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", config.keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+        ]
+
+    if config.idle_timeout_ms:
+        options.append(("grpc.client_idle_timeout_ms", config.idle_timeout_ms))
+
+    return options
+
+def _grpc_compression(config: TransportConfig):
+    return grpc.Compression.Gzip if config.compression == "gzip" else None
+
+def build_data_transport(credentials, config: TransportConfig,
+                         host: Optional[str] = None, insecure: bool = False):
+    """Build a Data API transport. `insecure` targets a local plaintext stand-in."""
+    host = host or DATA_API_HOST
+
+    if config.transport == "grpc":
+        options = grpc_channel_options(config)
+        compression = _grpc_compression(config)
+
+        if insecure:
+            channel = grpc.insecure_channel(host, options=options, compression=compression)
+        else:
+            channel = BetaAnalyticsDataGrpcTransport.create_channel(
+                host,
+                credentials=credentials,
+                options=options,
+                compression=compression
+            )
+        return BetaAnalyticsDataGrpcTransport(host=host, channel=channel)
+
+    if config.transport == "rest":
+        # The session keeps requests' default pool of persistent connections
+        return BetaAnalyticsDataRestTransport(
+            host=host,
+            credentials=AnonymousCredentials() if insecure else credentials,
+            url_scheme="http" if insecure else "https"
+        )
+
+    raise ValueError(f"Unknown GA4 transport: {config.transport}")
+
+def create_data_client(credentials, config: Optional[TransportConfig] = None,
+                       host: Optional[str] = None, insecure: bool = False) -> BetaAnalyticsDataClient:
+    """Create a BetaAnalyticsDataClient using the configured transport."""
+    config = config or TransportConfig.from_env()
+    transport = build_data_transport(credentials, config, host=host, insecure=insecure)
+    return BetaAnalyticsDataClient(transport=transport)
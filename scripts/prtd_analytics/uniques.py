@@ -0,0 +1,108 @@
+"""
+Daily Distinct Counters for PRTD
+Mergeable unique-click estimates per deal and partner, persisted per day
+"""
+
+import os
+import json
+import fcntl
+import datetime
+import contextlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from prtd_analytics import DATA_DIR
+from prtd_analytics.sketches import DEFAULT_PRECISION, HyperLogLog
+from prtd_analytics.writer import write_report_atomic
+
+UNIQUES_DIR = DATA_DIR / 'uniques'
+
+# Groupings a value can be counted under besides the overall total
+GROUPS = ("deals", "partners")
+
+class DistinctCounters:
+    """One HyperLogLog for the total plus one per deal and per partner."""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.total = HyperLogLog(precision)
+        self.groups: Dict[str, Dict[str, HyperLogLog]] = {group: {} for group in GROUPS}
+
+    def add(self, value: str, **keys: Optional[str]):
+        """Count a value overall and under each given group key, e.g. deals="123"."""
+        self.total.add(value)
+        for group, key in keys.items():
+            if key:
+                sketch = self.groups[group].get(key)
+                if sketch is None:
+                    sketch = self.groups[group][key] = HyperLogLog(self.precision)
+                sketch.add(value)
+
+    def merge(self, other: "DistinctCounters") -> "DistinctCounters":
+        """Fold another set of counters into this one."""
+        self.total |= other.total
+        for group, sketches in other.groups.items():
+            for key, sketch in sketches.items():
+                if key in self.groups[group]:
+                    self.groups[group][key] |= sketch
+                else:
+                    self.groups[group][key] = HyperLogLog(sketch.precision, sketch.registers)
+        return self
+
+    def estimates(self) -> Dict:
+        """Approximate distinct counts overall and per group key."""
+        return {
+            "total": self.total.estimate(),
+            **{group: {key: sketch.estimate() for key, sketch in sketches.items()}
+               for group, sketches in self.groups.items()}
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "precision": self.precision,
+            "total": self.total.to_dict(),
+            **{group: {key: sketch.to_dict() for key, sketch in sketches.items()}
+               for group, sketches in self.groups.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DistinctCounters":
+        counters = cls(data["precision"])
+        counters.total = HyperLogLog.from_dict(data["total"])
+        for group in GROUPS:
+            counters.groups[group] = {key: HyperLogLog.from_dict(sketch)
+                                      for key, sketch in data.get(group, {}).items()}
+        return counters
+
+def _day_path(day: datetime.date, directory: Path) -> Path:
+    return Path(directory) / f"clicks-{day.isoformat()}.json"
+
+@contextlib.contextmanager
+def _locked(directory: Path):
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    fd = os.open(Path(directory) / ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+def load_day(day: datetime.date, directory: Path = UNIQUES_DIR,
+             precision: int = DEFAULT_PRECISION) -> DistinctCounters:
+    """Counters saved for a day, or empty ones."""
+    try:
+        with open(_day_path(day, directory)) as f:
+            return DistinctCounters.from_dict(json.load(f))
+    except FileNotFoundError:
+        return DistinctCounters(precision)
+
+def save_day(counters: DistinctCounters, day: datetime.date, directory: Path = UNIQUES_DIR) -> Dict:
+    """Merge counters into the day's file and return the combined estimates.
+
+    Concurrent monitor runs each merge under a lock, so none overwrites another.
+    """
+    with _locked(directory):
+        combined = load_day(day, directory, counters.precision).merge(counters)
+        write_report_atomic(str(_day_path(day, directory)), combined.to_dict(), compression='none')
+    return combined.estimates()
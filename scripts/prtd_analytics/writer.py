@@ -0,0 +1,116 @@
+"""
+Background Report Writer for PRTD
+Serializes and persists reports off the main thread with atomic renames
+"""
+
+import os
+import gzip
+import json
+import queue
+import atexit
+import threading
+from typing import Callable, Dict, Optional
+
+# Set PRTD_REPORT_COMPRESSION=gzip to write reports as .json.gz
+DEFAULT_COMPRESSION = os.getenv('PRTD_REPORT_COMPRESSION', 'none')
+DEFAULT_QUEUE_SIZE = 16
+
+_STOP = object()
+
+def report_path(path: str, compression: str = DEFAULT_COMPRESSION) -> str:
+    """Final on-disk name for a report, with .gz appended when compressed."""
+    return f"{path}.gz" if compression == 'gzip' else path
+
+def write_report_atomic(path: str, report: Dict, compression: str = DEFAULT_COMPRESSION) -> str:
+    """Serialize a report to a temp file, fsync it and rename it into place."""
+    path = report_path(path, compression)
+    directory, filename = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        if compression == 'gzip':
+            with open(tmp_path, 'wb') as raw:
+                with gzip.GzipFile(filename=os.path.basename(path[:-3]), mode='wb', fileobj=raw, mtime=0) as f:
+                    f.write(json.dumps(report, separators=(',', ':')).encode())
+                raw.flush()
+                os.fsync(raw.fileno())
+        else:
+            with open(tmp_path, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return path
+
+def load_report(path: str) -> Dict:
+    """Read a report written by write_report_atomic, compressed or not."""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rt') as f:
+            return json.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+class ReportWriter:
+    """Single background thread draining a bounded queue of reports to disk.
+
+    Callers hand over ownership of the report dict; it must not be mutated
+    after submit(). When the queue is full, submit() blocks until the writer
+    catches up rather than dropping reports.
+    """
+
+    def __init__(self, compression: str = DEFAULT_COMPRESSION, max_pending: int = DEFAULT_QUEUE_SIZE):
+        self.compression = compression
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="prtd-report-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, path: str, report: Dict,
+               on_written: Optional[Callable[[str, Dict], None]] = None) -> str:
+        """Queue a report for writing. Returns the path it will appear at."""
+        if not self._thread.is_alive():
+            raise RuntimeError("Report writer is closed")
+        self._queue.put((path, report, on_written))
+        return report_path(path, self.compression)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                path, report, on_written = item
+                try:
+                    written = write_report_atomic(path, report, self.compression)
+                    if on_written is not None:
+                        on_written(written, report)
+                except Exception as e:
+                    print(f"⚠️  Could not write report {path}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued report is on disk."""
+        self._queue.join()
+
+    def close(self):
+        """Write what is queued, then stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+_writer: Optional[ReportWriter] = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> ReportWriter:
+    """Process-wide writer, started on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ReportWriter()
+        return _writer
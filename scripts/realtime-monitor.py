@@ -6,17 +6,62 @@ Continuously monitors GA4 real-time data for tracking validation
 
 import os
 import time
-import json
 import datetime
 from typing import Dict, List
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    RunRealtimeReportRequest,
-    Dimension,
-    Metric,
-    MinuteRange
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.query import ReportSpec, descending, event_filter, realtime_report
+from prtd_analytics.history import record_report
+from prtd_analytics.deals import DealCatalog
+from prtd_analytics.realtime import Breakdown, RealtimePlanner, merge_quality
+from prtd_analytics.writer import get_writer
+from prtd_analytics.sketches import SpaceSaving
+from prtd_analytics.uniques import DistinctCounters, save_day
+from prtd_analytics.rules import RuleSet, event_metrics
+
+# Values kept per tick for each high-cardinality dimension; the full
+# distribution lives in fixed-size session sketches instead
+TICK_TOP_N = 10
+
+# The only events that carry a click_id
+CLICK_EVENTS = ("click_external_deal", "conversion")
+
+# Each output needs one or two of these dimensions, never their cross product,
+# so the planner requests one narrow breakdown per output instead
+REALTIME_REPORT = realtime_report(
+    dimensions=["eventName", "country", "deviceCategory", "pagePath", "minutesAgo"],
+    metrics=["activeUsers", "eventCount"],
+    minutes_back=5
 )
-from google.oauth2 import service_account
+REALTIME_BREAKDOWNS = {
+    "totals": Breakdown((), ("activeUsers", "eventCount")),
+    "events": Breakdown(("eventName",), ("eventCount",)),
+    "countries": Breakdown(("country",), ("activeUsers",)),
+    "devices": Breakdown(("deviceCategory",), ("activeUsers",)),
+    # Per minute, so the session sketches can take each minute once
+    "pages": Breakdown(("pagePath", "minutesAgo"), ("eventCount",), order_by=(descending("eventCount"),)),
+    "activity": Breakdown(("country", "deviceCategory", "minutesAgo"), ("eventCount",)),
+}
+
+# Realtime reports report event-scoped custom dimensions as (not set), so deal
+# activity comes from today's standard report. It trails realtime by minutes,
+# so it is refreshed every few ticks rather than on each one
+DEAL_ACTIVITY_REFRESH = 300
+DEAL_ACTIVITY_REPORT = ReportSpec(
+    dimensions=("eventName", "customEvent:deal_id", "customEvent:category", "customEvent:vendor_id",
+                "customEvent:click_id"),
+    metrics=("eventCount",),
+    date_range=("today", "today")
+)
+DEAL_ACTIVITY_BREAKDOWNS = {
+    "events": Breakdown(("eventName", "customEvent:deal_id"), ("eventCount",)),
+    "attributes": Breakdown(("customEvent:deal_id", "customEvent:category", "customEvent:vendor_id"),
+                            ("eventCount",)),
+    # Every click_id so far today; conversion events repeat their click's id
+    "clicks": Breakdown(("eventName", "customEvent:click_id", "customEvent:deal_id", "customEvent:vendor_id"),
+                        ("eventCount",), filters=(event_filter("click_external_deal"),)),
+}
 
 class PRTDRealtimeMonitor:
     def __init__(self, property_id: str, credentials_path: str):
@@ -25,70 +70,62 @@ class PRTDRealtimeMonitor:
         self.property_name = f"properties/{property_id}"
         
         # Set up credentials
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             credentials_path,
             scopes=['https://www.googleapis.com/auth/analytics.readonly']
         )
         
         # Initialize the client
-        self.client = BetaAnalyticsDataClient(credentials=credentials)
+        self.client = validated_client(create_data_client(credentials))
+        
+        # Deal names from data/deals.json (reloaded only when the file changes)
+        self.deal_catalog = DealCatalog()
         
         # Event tracking state
         self.event_history = []
-        self.alert_thresholds = {
-            'click_external_deal': 1,  # Alert on any external clicks
-            'generate_lead': 1,        # Alert on partner form submissions
-            'conversion': 1,           # Alert on conversions
-            'page_view': 10,          # Alert if page views spike
+        self.heavy_hitters = {
+            "pages": SpaceSaving(),
+            "countries": SpaceSaving(),
+            "devices": SpaceSaving()
         }
+        # Last complete minute already added to the sketches
+        self.sketched_through = None
+        # Distinct click_ids today; each deal activity fetch re-reads the whole day,
+        # which the counters absorb without double counting
+        self.unique_clicks = DistinctCounters()
+        self.unique_clicks_error = None
+        # Alert rules from the "realtime" section of analytics-rules.json
+        self.alert_rules = RuleSet.load("realtime")
+        self.planner = RealtimePlanner(self.client, self.property_name)
+        # Last deal activity fetched, and today's click events per deal at that point
+        self.deal_activity = None
+        self.deal_activity_at = 0.0
+        self.click_counts = None
+        self.click_day = None
     
     def get_realtime_data(self) -> Dict:
         """Get current real-time analytics data."""
-        request = RunRealtimeReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="country"),
-                Dimension(name="deviceCategory"),
-                Dimension(name="pagePath"),
-                Dimension(name="pageTitle")
-            ],
-            metrics=[
-                Metric(name="activeUsers"),
-                Metric(name="eventCount")
-            ],
-            minute_ranges=[MinuteRange(start_minutes_ago=5, end_minutes_ago=0)]
-        )
-        
         try:
-            response = self.client.run_realtime_report(request=request)
-            return self._process_realtime_response(response)
+            reports = self.planner.run(REALTIME_REPORT, REALTIME_BREAKDOWNS)
+            return self._process_realtime_breakdowns(reports)
         except Exception as e:
             return {"error": f"Failed to get real-time data: {str(e)}"}
     
     def get_deal_activity(self) -> Dict:
-        """Get real-time deal-specific activity."""
-        request = RunRealtimeReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:deal_id"),
-                Dimension(name="customEvent:deal_category"),
-                Dimension(name="customEvent:partner"),
-                Dimension(name="customEvent:click_id")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="activeUsers")
-            ],
-            minute_ranges=[MinuteRange(start_minutes_ago=10, end_minutes_ago=0)]
-        )
+        """Get today's deal activity, refetched at most every DEAL_ACTIVITY_REFRESH seconds."""
+        if self.deal_activity is not None and time.time() - self.deal_activity_at < DEAL_ACTIVITY_REFRESH:
+            # Nothing new between refreshes
+            return dict(self.deal_activity, conversions=[], total_conversions=0)
         
         try:
-            response = self.client.run_realtime_report(request=request)
-            return self._process_deal_activity(response)
+            reports = self.planner.run(DEAL_ACTIVITY_REPORT, self._deal_activity_breakdowns())
+            activity = self._process_deal_activity(reports)
+            activity["data_quality"] = merge_quality(list(reports.values()))
         except Exception as e:
-            return {"error": f"Failed to get deal activity: {str(e)}"}
+            activity = {"error": f"Failed to get deal activity: {str(e)}"}
+        
+        self.deal_activity, self.deal_activity_at = activity, time.time()
+        return activity
     
     def monitor_events(self, duration_minutes: int = 30, check_interval: int = 30):
         """Monitor events for a specified duration."""
@@ -124,8 +161,8 @@ class PRTDRealtimeMonitor:
         print(f"\n✅ Monitoring complete. Processed {len(self.event_history)} data points.")
         return self.event_history
     
-    def _process_realtime_response(self, response) -> Dict:
-        """Process real-time API response."""
+    def _process_realtime_breakdowns(self, reports: Dict) -> Dict:
+        """Assemble the tick's totals and breakdowns from the planner's reports."""
         data = {
             "active_users": 0,
             "events": {},
@@ -135,44 +172,98 @@ class PRTDRealtimeMonitor:
             "total_events": 0
         }
         
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            country = row.dimension_values[1].value
-            device = row.dimension_values[2].value
-            page_path = row.dimension_values[3].value
-            page_title = row.dimension_values[4].value
-            
-            active_users = int(row.metric_values[0].value)
-            event_count = int(row.metric_values[1].value)
-            
-            # Aggregate data
-            data["active_users"] += active_users
-            data["total_events"] += event_count
-            
-            # Event breakdown
-            data["events"][event_name] = data["events"].get(event_name, 0) + event_count
-            data["countries"][country] = data["countries"].get(country, 0) + active_users
-            data["devices"][device] = data["devices"].get(device, 0) + active_users
-            data["pages"][page_path] = data["pages"].get(page_path, 0) + event_count
+        for _, (active_users, event_count) in reports["totals"].rows:
+            data["active_users"] += int(active_users)
+            data["total_events"] += int(event_count)
+        
+        # Event breakdown
+        for (event_name,), (event_count,) in reports["events"].rows:
+            data["events"][event_name] = data["events"].get(event_name, 0) + int(event_count)
         
+        # Only the heaviest values go into the tick (and the saved history)
+        for name in ("countries", "devices"):
+            tick = SpaceSaving()
+            for (value,), (users,) in reports[name].rows:
+                tick.add(value, int(users))
+            data[name] = dict(tick.top(TICK_TOP_N))
+        
+        pages = SpaceSaving()
+        for (page, _), (event_count,) in reports["pages"].rows:
+            pages.add(page, int(event_count))
+        data["pages"] = dict(pages.top(TICK_TOP_N))
+        
+        self._sketch_new_minutes(reports)
         return data
     
-    def _process_deal_activity(self, response) -> Dict:
-        """Process deal-specific activity."""
+    def _sketch_new_minutes(self, reports: Dict):
+        """Add the minutes completed since the last tick to the session sketches.
+        
+        Consecutive windows overlap, so adding whole windows would count each event
+        once per tick; the current, still-open minute waits for a later tick.
+        """
+        now = datetime.datetime.now().replace(second=0, microsecond=0)
+        latest = now - datetime.timedelta(minutes=1)
+        
+        def is_new(minutes_ago: str) -> bool:
+            minute = now - datetime.timedelta(minutes=int(minutes_ago))
+            return minute <= latest and (self.sketched_through is None or minute > self.sketched_through)
+        
+        for (page, minutes_ago), (event_count,) in reports["pages"].rows:
+            if is_new(minutes_ago):
+                self.heavy_hitters["pages"].add(page, int(event_count))
+        
+        for (country, device, minutes_ago), (event_count,) in reports["activity"].rows:
+            if is_new(minutes_ago):
+                self.heavy_hitters["countries"].add(country, int(event_count))
+                self.heavy_hitters["devices"].add(device, int(event_count))
+        
+        self.sketched_through = latest
+    
+    def _deal_activity_breakdowns(self) -> Dict:
+        """Deal activity breakdowns, leaving out click_ids when the property does not record them."""
+        cache = getattr(self.client, "cache", None)
+        metadata = cache.get(self.property_name) if cache is not None else None
+        if metadata is None or metadata.has_dimension("customEvent:click_id"):
+            return DEAL_ACTIVITY_BREAKDOWNS
+        
+        # Otherwise every click would read (not set) and the counters would stay at zero
+        if self.unique_clicks_error is None:
+            self.unique_clicks_error = "customEvent:click_id is not registered; unique clicks unavailable"
+            print(f"⚠️  {self.unique_clicks_error}")
+        return {name: b for name, b in DEAL_ACTIVITY_BREAKDOWNS.items() if name != "clicks"}
+    
+    def _count_unique_clicks(self, rows, today: datetime.date):
+        """Add today's click_ids to the distinct counters, starting new ones each day."""
+        if self.click_day is not None and self.click_day != today:
+            try:
+                save_day(self.unique_clicks, self.click_day)
+            except OSError as e:
+                print(f"⚠️  Could not save unique click counters: {str(e)}")
+            self.unique_clicks = DistinctCounters()
+        
+        for (_, click_id, deal_id, partner), _ in rows:
+            if click_id and click_id != "(not set)":
+                self.unique_clicks.add(
+                    click_id,
+                    deals=deal_id if deal_id != "(not set)" else None,
+                    partners=partner if partner != "(not set)" else None
+                )
+    
+    def _process_deal_activity(self, reports: Dict) -> Dict:
+        """Process today's deal activity; conversions are the click events added since the last fetch."""
         deals = {}
-        conversions = []
+        clicks = {}
         
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            deal_id = row.dimension_values[1].value
-            category = row.dimension_values[2].value
-            partner = row.dimension_values[3].value
-            click_id = row.dimension_values[4].value
-            
-            event_count = int(row.metric_values[0].value)
-            
+        # Category and partner per deal, from its most frequent combination
+        attributes = {}
+        for (deal_id, category, partner), (event_count,) in reports["attributes"].rows:
+            if deal_id not in attributes or event_count > attributes[deal_id][2]:
+                attributes[deal_id] = (category, partner, event_count)
+        
+        for (event_name, deal_id), (event_count,) in reports["events"].rows:
             if deal_id and deal_id != "(not set)":
                 if deal_id not in deals:
+                    category, partner, _ = attributes.get(deal_id, ("(not set)", "(not set)", 0))
                     deals[deal_id] = {
                         "category": category,
                         "partner": partner,
@@ -180,25 +271,43 @@ class PRTDRealtimeMonitor:
                         "total_events": 0
                     }
                 
-                deals[deal_id]["events"][event_name] = event_count
-                deals[deal_id]["total_events"] += event_count
-                
-                # Track conversions separately
-                if event_name in ["click_external_deal", "conversion"]:
+                deals[deal_id]["events"][event_name] = deals[deal_id]["events"].get(event_name, 0) + int(event_count)
+                deals[deal_id]["total_events"] += int(event_count)
+                if event_name in CLICK_EVENTS:
+                    clicks[(deal_id, event_name)] = int(event_count)
+        
+        today = datetime.date.today()
+        if "clicks" in reports:
+            self._count_unique_clicks(reports["clicks"].rows, today)
+        
+        # Counts are cumulative for the day; the first fetch only sets the baseline
+        conversions = []
+        if self.click_counts is not None:
+            previous = self.click_counts if self.click_day == today else {}
+            for (deal_id, event_name), count in clicks.items():
+                added = count - previous.get((deal_id, event_name), 0)
+                if added > 0:
                     conversions.append({
                         "deal_id": deal_id,
-                        "category": category,
-                        "partner": partner,
+                        "deal_title": None,
+                        "category": deals[deal_id]["category"],
+                        "partner": deals[deal_id]["partner"],
                         "event": event_name,
-                        "click_id": click_id,
-                        "count": event_count
+                        "count": added
                     })
+        self.click_counts, self.click_day = clicks, today
+        
+        # Join catalog details in one pass per tick
+        self.deal_catalog.enrich(deals)
+        for conv in conversions:
+            conv["deal_title"] = self.deal_catalog.label(conv["deal_id"])
         
         return {
             "deals": deals,
             "conversions": conversions,
             "total_deals": len(deals),
-            "total_conversions": len(conversions)
+            "total_conversions": len(conversions),
+            "unique_clicks": self.unique_clicks.total.estimate() if not self.unique_clicks_error else None
         }
     
     def _display_realtime_status(self, timestamp: str, realtime_data: Dict, deal_activity: Dict):
@@ -223,38 +332,51 @@ class PRTDRealtimeMonitor:
                 print(f"  • {event}: {count}")
         
         # Deal activity
-        if not deal_activity.get("error") and deal_activity.get("deals"):
-            print(f"\n🎯 Deal Activity:")
+        if not deal_activity.get("data_quality", {"exact": True})["exact"]:
+            print("⚠️  Deal activity is approximate: " + "; ".join(deal_activity["data_quality"]["notes"]))
+        
+        if deal_activity.get("error"):
+            print(f"⚠️  Deal activity unavailable: {deal_activity['error']}")
+        elif deal_activity.get("deals"):
+            print("\n🎯 Deal Activity (today):")
             print(f"  • Active Deals: {deal_activity['total_deals']}")
-            print(f"  • Conversions: {deal_activity['total_conversions']}")
+            print(f"  • New Conversions: {deal_activity['total_conversions']}")
             
             if deal_activity["conversions"]:
                 print("  🔥 Recent Conversions:")
                 for conv in deal_activity["conversions"][-3:]:  # Show last 3
-                    print(f"    → {conv['event']}: {conv['deal_id']} ({conv['category']})")
+                    print(f"    → {conv['event']}: {conv['deal_title']} ({conv['category']})")
         
-        # Countries
+        # Countries (already ranked, at most TICK_TOP_N entries)
         if realtime_data['countries']:
             print(f"\n🌍 Top Countries:")
-            sorted_countries = sorted(realtime_data['countries'].items(), 
-                                    key=lambda x: x[1], reverse=True)[:3]
-            for country, users in sorted_countries:
+            for country, users in list(realtime_data['countries'].items())[:3]:
                 print(f"  • {country}: {users} users")
+        
+        # Pages across the whole session
+        top_pages = self.heavy_hitters["pages"].top(5)
+        if top_pages:
+            print(f"\n📄 Top Pages (session):")
+            for page, events in top_pages:
+                print(f"  • {page}: {events} events")
     
     def _check_alerts(self, realtime_data: Dict, deal_activity: Dict):
         """Check for alerts based on thresholds."""
         alerts = []
         
-        # Check event thresholds
-        for event, threshold in self.alert_thresholds.items():
-            count = realtime_data.get('events', {}).get(event, 0)
-            if count >= threshold:
-                alerts.append(f"🚨 {event}: {count} events (threshold: {threshold})")
+        # Check every threshold rule at once; events not seen this tick count as zero
+        metrics = {
+            "active_users": realtime_data.get('active_users', 0),
+            "total_events": realtime_data.get('total_events', 0),
+            **event_metrics(realtime_data.get('events', {}))
+        }
+        for violation in self.alert_rules.evaluate(metrics, missing=0):
+            alerts.append(f"🚨 {violation['message']}")
         
         # Check for new conversions
         if deal_activity.get('conversions'):
             for conv in deal_activity['conversions']:
-                alerts.append(f"💰 CONVERSION: {conv['deal_id']} -> {conv['partner']}")
+                alerts.append(f"💰 CONVERSION: {conv['deal_title']} -> {conv['partner']}")
         
         # Display alerts
         if alerts:
@@ -294,6 +416,11 @@ class PRTDRealtimeMonitor:
             "event_breakdown": all_events,
             "total_conversions": len(all_conversions),
             "conversion_details": all_conversions,
+            "unique_clicks": ({"error": self.unique_clicks_error} if self.unique_clicks_error
+                              else self.unique_clicks.estimates()),
+            # Per-tick countries and devices count active users; the session sketches count events
+            "heavy_hitters": {name: sketch.summary(TICK_TOP_N) for name, sketch in self.heavy_hitters.items()},
+            "heavy_hitters_metric": "eventCount",
             "health_status": "🟢 HEALTHY" if total_events > 0 else "🟡 LOW_ACTIVITY"
         }
 
@@ -326,15 +453,25 @@ def main():
         # Generate summary
         summary = monitor.generate_summary_report()
         
+        # Fold this run's distinct clicks into the day's counters
+        if monitor.click_day and not monitor.unique_clicks_error:
+            try:
+                summary["unique_clicks_today"] = save_day(monitor.unique_clicks, monitor.click_day)
+            except OSError as e:
+                print(f"⚠️  Could not save unique click counters: {str(e)}")
+        
         # Save results
         timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
         output_file = f"/home/deploy/prtd/realtime-monitor-{timestamp}.json"
         
-        with open(output_file, 'w') as f:
-            json.dump({
-                "summary": summary,
-                "detailed_history": history
-            }, f, indent=2)
+        report = {
+            "summary": summary,
+            "detailed_history": history
+        }
+        output_file = get_writer().submit(
+            output_file, report,
+            on_written=lambda path, written: record_report("realtime", written, path)
+        )
         
         print(f"\n📁 Monitoring results saved to: {output_file}")
         
@@ -344,6 +481,14 @@ def main():
         print(f"Peak Users: {summary['peak_active_users']}")
         print(f"Total Events: {summary['total_events_observed']}")
         print(f"Conversions: {summary['total_conversions']}")
+        if "total" in summary["unique_clicks"]:
+            print(f"Unique Clicks: ~{summary['unique_clicks']['total']}")
+        
+        top_countries = summary["heavy_hitters"]["countries"][:3]
+        if top_countries:
+            print("Top Countries (session):")
+            for entry in top_countries:
+                print(f"  • {entry['value']}: {entry['count']} events")
         print(f"Status: {summary['health_status']}")
         
     except KeyboardInterrupt:
@@ -0,0 +1,108 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Click Reconciliation Job for PRTD
+Compares GA4 deal clicks with first-party click logs and reports per-deal loss
+"""
+
+import os
+import sys
+import argparse
+import datetime
+
+from prtd_analytics import DATA_DIR, DEFAULT_CREDENTIALS_PATH
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.clicklog import APP_LOG_PATH, CLICK_DB_PATH, ClickStore
+from prtd_analytics.deals import DealCatalog
+from prtd_analytics.reconcile import SETTLE_HOURS, ClickReconciler
+from prtd_analytics.writer import get_writer
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Reconcile GA4 deal clicks with first-party click logs")
+    parser.add_argument("--db", default=CLICK_DB_PATH, help="click count database")
+    parser.add_argument("--log", default=APP_LOG_PATH, help="app log to ingest first")
+    parser.add_argument("--no-ingest", action="store_true", help="skip reading new log lines")
+    parser.add_argument("--since", type=datetime.date.fromisoformat,
+                        help="re-reconcile from this UTC day instead of the last watermark")
+    parser.add_argument("--settle-hours", type=int, default=SETTLE_HOURS,
+                        help="leave the most recent hours to GA4 processing")
+    parser.add_argument("--days", type=int, default=7, help="report window in days")
+    parser.add_argument("--top", type=int, default=10, help="deals to list")
+    args = parser.parse_args()
+
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', DEFAULT_CREDENTIALS_PATH)
+    property_id = os.getenv('GA4_PROPERTY_ID')
+
+    if not property_id:
+        print("❌ GA4_PROPERTY_ID environment variable not set!")
+        sys.exit(1)
+
+    if not os.path.exists(credentials_path):
+        print(f"❌ Credentials file not found: {credentials_path}")
+        sys.exit(1)
+
+    store = ClickStore(args.db)
+    try:
+        if not args.no_ingest and os.path.exists(args.log):
+            ingested = store.ingest(args.log)
+            print(f"✅ Ingested {ingested['clicks']} new first-party clicks from {args.log}")
+
+        credentials = load_credentials(credentials_path, scopes=['https://www.googleapis.com/auth/analytics.readonly'])
+        reconciler = ClickReconciler(validated_client(create_data_client(credentials)),
+                                     f"properties/{property_id}", store, settle_hours=args.settle_hours)
+
+        since = None
+        if args.since:
+            since = datetime.datetime.combine(args.since, datetime.time(), datetime.timezone.utc)
+
+        try:
+            run = reconciler.run(since=since)
+        except Exception as e:
+            print(f"❌ Reconciliation failed: {str(e)}")
+            sys.exit(1)
+
+        if run["hours"]:
+            print(f"🔗 Reconciled {run['hours']} hours ({run['start']} → {run['end']} UTC)")
+            if not run["data_quality"]["exact"]:
+                print("⚠️  GA4 side is approximate: " + "; ".join(run["data_quality"]["notes"]))
+        else:
+            print("ℹ️  No new settled hours to reconcile")
+
+        summary = reconciler.summary(args.days, args.top)
+    finally:
+        store.close()
+
+    overall = summary["overall"]
+    print(f"\n{'=' * 60}")
+    print(f"🖱️  GA4 vs First-Party Clicks (last {args.days} days)")
+    print(f"{'=' * 60}")
+    print(f"Server clicks: {overall['server_clicks']:,}")
+    print(f"GA4 clicks: {overall['ga4_clicks']:,}")
+    if overall["loss_rate"] is not None:
+        print(f"GA4 loss rate: {overall['loss_rate']}% ({overall['missed_by_ga4']:,} clicks not in GA4)")
+    if overall["ga4_only"]:
+        print(f"⚠️  {overall['ga4_only']:,} GA4 clicks had no server-side record")
+
+    if summary["deals"]:
+        catalog = DealCatalog()
+        print("\n📉 Deals losing the most clicks:")
+        for deal_id, deal in summary["deals"].items():
+            rate = f"{deal['loss_rate']}%" if deal["loss_rate"] is not None else "n/a"
+            print(f"  • {catalog.label(deal_id)}: {deal['server_clicks']} server / "
+                  f"{deal['ga4_clicks']} GA4, loss {rate}")
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "property_id": property_id,
+        "run": run,
+        "summary": summary
+    }
+    output_file = get_writer().submit(
+        str(DATA_DIR / f"click-reconciliation-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"), report
+    )
+    print(f"\n📁 Results saved to: {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/home/deploy/prtd/analytics-env/bin/python
+"""
+Exploration Report Runner for PRTD
+Runs the GA4 exploration templates as automated reports and saves the results
+"""
+
+import os
+import sys
+import argparse
+import datetime
+
+from prtd_analytics import DATA_DIR, DEFAULT_CREDENTIALS_PATH
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.explorations import (
+    DEFAULT_CACHE_TTL,
+    DEFAULT_CONCURRENCY,
+    TEMPLATES_DIR,
+    ExplorationRunner,
+    load_templates
+)
+from prtd_analytics.writer import get_writer
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Run GA4 exploration templates as reports")
+    parser.add_argument("names", nargs="*", help="explorations to run (default: all)")
+    parser.add_argument("--templates", default=str(TEMPLATES_DIR), help="template directory")
+    parser.add_argument("--list", action="store_true", help="list runnable explorations and exit")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached results")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_CACHE_TTL, help="cache lifetime in seconds")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="parallel batches")
+    args = parser.parse_args()
+
+    explorations = load_templates(args.templates)
+
+    if args.list:
+        print(f"\n🧭 Explorations in {args.templates}")
+        print("=" * 60)
+        for name, exploration in explorations.items():
+            print(f"{name:<60} {len(exploration.spec.dimensions)} dims, {len(exploration.spec.metrics)} metrics")
+        return
+
+    unknown = [name for name in args.names if name not in explorations]
+    if unknown:
+        print(f"❌ Unknown explorations: {', '.join(unknown)} (see --list)")
+        sys.exit(1)
+
+    selected = [explorations[name] for name in args.names] if args.names else list(explorations.values())
+
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', DEFAULT_CREDENTIALS_PATH)
+    property_id = os.getenv('GA4_PROPERTY_ID')
+
+    if not property_id:
+        print("❌ GA4_PROPERTY_ID environment variable not set!")
+        sys.exit(1)
+
+    if not os.path.exists(credentials_path):
+        print(f"❌ Credentials file not found: {credentials_path}")
+        sys.exit(1)
+
+    credentials = load_credentials(credentials_path, scopes=['https://www.googleapis.com/auth/analytics.readonly'])
+    runner = ExplorationRunner(validated_client(create_data_client(credentials)), f"properties/{property_id}",
+                               cache_ttl=args.ttl, concurrency=args.concurrency)
+
+    print(f"🚀 Running {len(selected)} explorations...")
+    results = runner.run(selected, refresh=args.refresh)
+
+    print(f"\n{'=' * 60}")
+    print("🧭 PRTD Exploration Reports")
+    print(f"{'=' * 60}")
+    failed = 0
+    for name, result in results.items():
+        if "error" in result:
+            failed += 1
+            print(f"❌ {result['title']}: {result['error']}")
+            continue
+        source = "cached" if result["cached"] else "fetched"
+        approximate = " ⚠️ approximate" if result["data_quality"]["sampled"] or result["data_quality"]["other_row"] else ""
+        print(f"✅ {result['title']}: {result['row_count']:,} rows ({source}){approximate}")
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "property_id": property_id,
+        "explorations": results
+    }
+    output_file = get_writer().submit(
+        str(DATA_DIR / f"explorations-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"), report
+    )
+    print(f"\n📁 Results saved to: {output_file}")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
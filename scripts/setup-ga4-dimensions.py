@@ -4,11 +4,12 @@ GA4 Custom Dimensions Setup Script for PRTD
 Automatically creates all required custom dimensions via GA4 Admin API
 """
 
-import os
 import sys
+import argparse
 from google.analytics.admin_v1beta import AnalyticsAdminServiceClient
-from google.analytics.admin_v1beta.types import CustomDimension, CreateCustomDimensionRequest
-from google.oauth2 import service_account
+from google.analytics.admin_v1beta.types import CustomDimension
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.dimensions import DEFAULT_RATE, DEFAULT_WORKERS, DimensionReconciler, RateLimiter
 
 # Configuration
 PROPERTY_ID = "502239171"
@@ -93,7 +94,7 @@ CUSTOM_DIMENSIONS = [
 def initialize_client():
     """Initialize the Analytics Admin API client."""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             CREDENTIALS_PATH,
             scopes=['https://www.googleapis.com/auth/analytics.edit']
         )
@@ -104,131 +105,93 @@ def initialize_client():
         print(f"❌ Failed to initialize API client: {e}")
         sys.exit(1)
 
-def list_existing_dimensions(client):
-    """List existing custom dimensions to avoid duplicates."""
-    try:
-        property_name = f"properties/{PROPERTY_ID}"
-        existing_dimensions = client.list_custom_dimensions(parent=property_name)
-        
-        existing_params = {}
-        for dimension in existing_dimensions:
-            existing_params[dimension.parameter_name] = {
-                'name': dimension.name,
-                'display_name': dimension.display_name,
-                'description': dimension.description
-            }
-        
-        print(f"📋 Found {len(existing_params)} existing custom dimensions")
-        return existing_params
-        
-    except Exception as e:
-        print(f"❌ Failed to list existing dimensions: {e}")
-        return {}
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Reconcile PRTD custom dimensions across GA4 properties")
+    parser.add_argument("--list", "-l", action="store_true", help="list current dimensions and exit")
+    parser.add_argument("--plan", action="store_true", help="show the changes without applying them")
+    parser.add_argument("--property", dest="properties", action="append", default=[],
+                        help=f"property ID, repeatable (default {PROPERTY_ID})")
+    parser.add_argument("--properties-file", help="file with one property ID per line")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel API calls")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="max Admin API calls per second")
+    args = parser.parse_args()
 
-def create_custom_dimension(client, dimension_config):
-    """Create a single custom dimension."""
-    try:
-        property_name = f"properties/{PROPERTY_ID}"
-        
-        custom_dimension = CustomDimension(
-            parameter_name=dimension_config["parameter_name"],
-            display_name=dimension_config["display_name"],
-            description=dimension_config["description"],
-            scope=dimension_config["scope"]
-        )
-        
-        request = CreateCustomDimensionRequest(
-            parent=property_name,
-            custom_dimension=custom_dimension
-        )
-        
-        response = client.create_custom_dimension(request=request)
-        
-        print(f"✅ Created: {dimension_config['display_name']} ({dimension_config['parameter_name']})")
-        return response
-        
-    except Exception as e:
-        if "already exists" in str(e).lower() or "duplicate" in str(e).lower():
-            print(f"⚠️  Skipped: {dimension_config['display_name']} (already exists)")
-            return None
-        else:
-            print(f"❌ Failed to create {dimension_config['display_name']}: {e}")
-            return None
+    if args.properties_file:
+        with open(args.properties_file) as f:
+            args.properties += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    args.properties = list(dict.fromkeys(args.properties or [PROPERTY_ID]))
+    return args
 
 def main():
     """Main execution function."""
-    # Check for list option
-    if len(sys.argv) > 1 and sys.argv[1] in ['--list', '-l']:
+    args = parse_args()
+    
+    client = initialize_client()
+    reconciler = DimensionReconciler(client, workers=args.workers, limiter=RateLimiter(args.rate))
+    
+    try:
+        existing = reconciler.list_existing(args.properties)
+    except Exception as e:
+        print(f"❌ Failed to list existing dimensions: {e}")
+        sys.exit(1)
+    
+    if args.list:
         print("📋 GA4 Custom Dimensions for PRTD")
-        print(f"Property ID: {PROPERTY_ID}")
         print("=" * 60)
-        
-        client = initialize_client()
-        property_name = f"properties/{PROPERTY_ID}"
-        
-        try:
-            dimensions = client.list_custom_dimensions(parent=property_name)
-            dimensions_list = list(dimensions)
-            
-            if not dimensions_list:
-                print("❌ No custom dimensions found")
-                return
-            
-            for i, dimension in enumerate(dimensions_list, 1):
+        for property_id, dimensions in existing.items():
+            print(f"Property ID: {property_id}")
+            if not dimensions:
+                print("❌ No custom dimensions found\n")
+                continue
+            for i, dimension in enumerate(dimensions.values(), 1):
                 print(f"{i:2d}. {dimension.display_name} ({dimension.parameter_name})")
                 print(f"    {dimension.description}")
-                print()
-            
-            print(f"✅ Total: {len(dimensions_list)} custom dimensions active")
-        except Exception as e:
-            print(f"❌ Failed to list dimensions: {e}")
+            print(f"✅ Total: {len(dimensions)} custom dimensions active\n")
         return
     
-    print("🚀 Starting GA4 Custom Dimensions Setup for PRTD")
-    print(f"Property ID: {PROPERTY_ID}")
-    print(f"Dimensions to create: {len(CUSTOM_DIMENSIONS)}")
+    print("🚀 Reconciling GA4 Custom Dimensions for PRTD")
+    print(f"Properties: {', '.join(args.properties)}")
+    print(f"Dimensions per property: {len(CUSTOM_DIMENSIONS)}")
     print("=" * 60)
     
-    # Initialize API client
-    client = initialize_client()
+    plan = reconciler.plan(CUSTOM_DIMENSIONS, existing)
+    for property_id in args.properties:
+        changes = [item for item in plan if item.property_id == property_id and item.action != "unchanged"]
+        print(f"📋 properties/{property_id}: {len(changes) or 'no'} changes")
+        for item in changes:
+            icon = {"create": "➕", "update": "✏️ ", "conflict": "⚠️ "}[item.action]
+            print(f"  {icon} {item.describe()}")
     
-    # Check existing dimensions
-    existing_dimensions = list_existing_dimensions(client)
+    conflicts = [item for item in plan if item.action == "conflict"]
+    
+    if args.plan:
+        print("\n💡 Dry run only; rerun without --plan to apply")
+        return
     
-    # Create new dimensions
-    created_count = 0
-    skipped_count = 0
-    failed_count = 0
+    results = reconciler.apply(plan)
     
-    for dimension_config in CUSTOM_DIMENSIONS:
-        param_name = dimension_config["parameter_name"]
-        
-        # Check if dimension already exists
-        if param_name in existing_dimensions:
-            print(f"⚠️  Skipped: {dimension_config['display_name']} (already exists)")
-            skipped_count += 1
-            continue
-        
-        # Create the dimension
-        result = create_custom_dimension(client, dimension_config)
-        
-        if result:
-            created_count += 1
-        elif result is None and param_name in existing_dimensions:
-            skipped_count += 1
-        else:
-            failed_count += 1
+    applied = [item for item in results if item.result == "ok"]
+    # Created by someone else between listing and applying
+    present = [item for item in results if item.result == "exists"]
+    failed = [item for item in results if item.result not in ("ok", "exists")]
+    for item in failed:
+        print(f"❌ Failed {item.action} {item.parameter_name} on {item.property_id}: {item.result}")
     
     # Summary
     print("=" * 60)
-    print(f"📊 Setup Summary:")
-    print(f"  ✅ Created: {created_count} dimensions")
-    print(f"  ⚠️  Skipped: {skipped_count} dimensions (already exist)")
-    print(f"  ❌ Failed: {failed_count} dimensions")
-    print(f"  📋 Total: {created_count + skipped_count + failed_count}/{len(CUSTOM_DIMENSIONS)} processed")
+    print(f"📊 Reconcile Summary:")
+    print(f"  ✅ Created: {sum(1 for item in applied if item.action == 'create')} dimensions")
+    print(f"  ✏️  Updated: {sum(1 for item in applied if item.action == 'update')} dimensions")
+    if present:
+        print(f"  ♻️  Already present: {len(present)} dimensions (created concurrently)")
+    print(f"  ⚠️  Unchanged: {sum(1 for item in plan if item.action == 'unchanged')} dimensions")
+    print(f"  ❌ Failed: {len(failed)} dimensions")
+    if conflicts:
+        print(f"  🔒 Scope conflicts: {len(conflicts)} (GA4 cannot change a dimension's scope)")
     
-    if failed_count > 0:
-        print(f"\n⚠️  Some dimensions failed to create. Check error messages above.")
+    if failed:
+        print(f"\n⚠️  Some dimensions failed to apply. Check error messages above.")
         sys.exit(1)
     else:
         print(f"\n🎉 GA4 custom dimensions setup complete!")
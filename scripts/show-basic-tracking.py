@@ -7,29 +7,61 @@ Shows current analytics data and demonstrates what will be tracked
 import os
 import sys
 from datetime import datetime, timedelta
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    RunReportRequest,
-    Dimension,
-    Metric,
-    DateRange,
-    FilterExpression,
-    Filter
-)
-from google.oauth2 import service_account
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.query import FilterSpec, compile_request, descending, event_filter, field_filter, report
+from prtd_analytics.deals import DealCatalog
 
 # Configuration
 PROPERTY_ID = "502239171"
+PROPERTY_NAME = f"properties/{PROPERTY_ID}"
 CREDENTIALS_PATH = "/home/deploy/prtd-ga4-credentials.json"
 
+TOP_DEALS = 10
+
+CURRENT_EVENTS_REPORT = report(
+    dimensions=["eventName", "customEvent:slug", "customEvent:deal_id", "customEvent:category"],
+    metrics=["eventCount", "totalUsers"],
+    limit=50,
+    order_by=[descending("eventCount")]
+)
+
+# Ranked and totalled by GA4, so the top deals are right however many deals there are
+DEAL_RANKING_REPORT = report(
+    dimensions=["customEvent:slug"],
+    metrics=["eventCount", "totalUsers"],
+    filters=[field_filter("customEvent:slug", ".", match="partial_regexp")],  # Any non-empty slug
+    limit=TOP_DEALS,
+    order_by=[descending("eventCount")],
+    aggregations=["total"]
+)
+
+CONVERSION_REPORT = report(
+    dimensions=["eventName", "customEvent:vendor_id", "customEvent:cta_id"],
+    metrics=["eventCount", "totalUsers"],
+    filters=[event_filter("click_external_deal", "conversion", "generate_lead", "share")],
+    limit=30,
+    order_by=[descending("eventCount")]
+)
+
+def deal_breakdown_report(slugs):
+    """Category and per-event counts for the ranked deals only."""
+    return report(
+        dimensions=["customEvent:slug", "customEvent:category", "eventName"],
+        metrics=["eventCount"],
+        filters=[FilterSpec("customEvent:slug", slugs, match="in_list")],
+        order_by=[descending("eventCount")]
+    )
+
 def initialize_client():
     """Initialize the Analytics Data API client."""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             CREDENTIALS_PATH,
             scopes=['https://www.googleapis.com/auth/analytics.readonly']
         )
-        client = BetaAnalyticsDataClient(credentials=credentials)
+        client = validated_client(create_data_client(credentials))
         print(f"✅ Connected to GA4 property {PROPERTY_ID}")
         return client
     except Exception as e:
@@ -42,23 +74,7 @@ def get_current_events(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:deal_id"),
-                Dimension(name="customEvent:category")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            limit=50
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, CURRENT_EVENTS_REPORT))
         
         if not response.rows:
             print("ℹ️  No events found in the last 7 days")
@@ -98,69 +114,58 @@ def get_deal_performance(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:category"),
-                Dimension(name="eventName")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="customEvent:slug",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.PARTIAL_REGEXP,
-                        value="."  # Any non-empty slug
-                    )
-                )
-            ),
-            limit=20
-        )
+        ranking = client.run_report(request=compile_request(PROPERTY_NAME, DEAL_RANKING_REPORT))
         
-        response = client.run_report(request=request)
-        
-        if not response.rows:
+        if not ranking.rows:
             print("ℹ️  No deal-specific data found yet")
             print("💡 Visit deal pages to generate tracking data")
             return
         
-        # Group by deal
         deal_summary = {}
-        for row in response.rows:
+        for row in ranking.rows:
+            slug = row.dimension_values[0].value or "unknown"
+            deal_summary[slug] = {
+                'category': "unknown",
+                'events': {},
+                'total_events': int(row.metric_values[0].value),
+                'total_users': int(row.metric_values[1].value)
+            }
+        
+        # Event breakdown for just these deals; rows arrive largest first
+        breakdown = client.run_report(
+            request=compile_request(PROPERTY_NAME, deal_breakdown_report(tuple(deal_summary)))
+        )
+        for row in breakdown.rows:
             slug = row.dimension_values[0].value or "unknown"
-            category = row.dimension_values[1].value or "unknown"
+            category = row.dimension_values[1].value
             event_name = row.dimension_values[2].value
             event_count = int(row.metric_values[0].value)
-            users = int(row.metric_values[1].value)
             
             if slug not in deal_summary:
-                deal_summary[slug] = {
-                    'category': category,
-                    'events': {},
-                    'total_events': 0,
-                    'total_users': 0
-                }
-            
-            if event_name not in deal_summary[slug]['events']:
-                deal_summary[slug]['events'][event_name] = 0
-            
-            deal_summary[slug]['events'][event_name] += event_count
-            deal_summary[slug]['total_events'] += event_count
-            deal_summary[slug]['total_users'] += users
+                continue
+            if deal_summary[slug]['category'] == "unknown" and category:
+                deal_summary[slug]['category'] = category
+            deal_summary[slug]['events'][event_name] = deal_summary[slug]['events'].get(event_name, 0) + event_count
         
-        # Sort by total events
-        sorted_deals = sorted(deal_summary.items(), key=lambda x: x[1]['total_events'], reverse=True)
+        # Join titles, partners and prices from data/deals.json
+        DealCatalog().enrich(deal_summary)
         
-        print(f"Top {min(10, len(sorted_deals))} performing deals:")
+        all_deal_events = int(ranking.totals[0].metric_values[0].value) if ranking.totals else 0
+        top_events_total = sum(data['total_events'] for data in deal_summary.values())
+        print(f"Top {len(deal_summary)} of {max(ranking.row_count, len(deal_summary))} deals by events:")
+        if all_deal_events:
+            print(f"({top_events_total:,} of {all_deal_events:,} deal events, "
+                  f"{top_events_total / all_deal_events * 100:.0f}%)")
         print()
         
-        for slug, data in sorted_deals[:10]:
-            print(f"🏨 {slug} ({data['category']})")
+        for slug, data in deal_summary.items():
+            deal = data['deal']
+            if deal:
+                expired = " ⌛ expired" if deal['expired'] else ""
+                print(f"🏨 {deal['title'] or slug} ({data['category']})")
+                print(f"   Partner: {deal['partner']} | Price: {deal['price']} {deal['currency'] or ''}{expired}")
+            else:
+                print(f"🏨 {slug} ({data['category']}) - not in deals catalog")
             print(f"   Total Events: {data['total_events']:,} | Users: {data['total_users']:,}")
             
             # Show top events for this deal
@@ -179,31 +184,7 @@ def get_conversion_data(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:vendor_id"),
-                Dimension(name="customEvent:cta_id")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.IN_LIST,
-                        value="click_external_deal,conversion,generate_lead,share"
-                    )
-                )
-            ),
-            limit=30
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, CONVERSION_REPORT))
         
         if not response.rows:
             print("ℹ️  No conversion events found yet")
@@ -7,76 +7,107 @@ Shows what engagement tracking data looks like in GA4
 import os
 import sys
 from datetime import datetime, timedelta
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    RunReportRequest,
-    Dimension,
-    Metric,
-    DateRange,
-    FilterExpression,
-    Filter
-)
-from google.oauth2 import service_account
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.query import compile_request, descending, event_filter, field_filter, report
 
 # Configuration
 PROPERTY_ID = "502239171"
+PROPERTY_NAME = f"properties/{PROPERTY_ID}"
 CREDENTIALS_PATH = "/home/deploy/prtd-ga4-credentials.json"
 
+CONTENT_ENGAGEMENT_REPORT = report(
+    dimensions=[
+        "eventName",
+        "customEvent:slug",
+        "customEvent:category",
+        "customEvent:interaction_type",
+        "customEvent:content_piece"
+    ],
+    metrics=["eventCount", "averageSessionDuration", "engagementRate"],
+    filters=[event_filter("content_engagement")],
+    limit=20,
+    order_by=[descending("eventCount")],
+    aggregations=["total"]
+)
+
+IMAGE_ENGAGEMENT_REPORT = report(
+    dimensions=["eventName", "customEvent:slug", "customEvent:image_index", "customEvent:view_duration"],
+    metrics=["eventCount"],
+    filters=[field_filter("eventName", "image", match="contains")],
+    limit=15,
+    order_by=[descending("eventCount")],
+    aggregations=["total"]
+)
+
+SECTION_ENGAGEMENT_REPORT = report(
+    dimensions=[
+        "eventName",
+        "customEvent:slug",
+        "customEvent:time_in_section",
+        "customEvent:interaction_count"
+    ],
+    metrics=["eventCount", "totalUsers"],
+    filters=[event_filter("section_engagement")],
+    limit=15,
+    order_by=[descending("eventCount")],
+    aggregations=["total"]
+)
+
+ENGAGEMENT_SCORES_REPORT = report(
+    dimensions=[
+        "eventName",
+        "customEvent:slug",
+        "customEvent:engagement_score",
+        "customEvent:engagement_quality"
+    ],
+    metrics=["eventCount"],
+    filters=[event_filter("engagement_quality_score")],
+    limit=10,
+    order_by=[descending("eventCount")],
+    aggregations=["total"]
+)
+
 def initialize_client():
     """Initialize the Analytics Data API client."""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             CREDENTIALS_PATH,
             scopes=['https://www.googleapis.com/auth/analytics.readonly']
         )
-        client = BetaAnalyticsDataClient(credentials=credentials)
+        client = validated_client(create_data_client(credentials))
         print(f"✅ Connected to GA4 property {PROPERTY_ID}")
         return client
     except Exception as e:
         print(f"❌ Failed to initialize client: {e}")
         sys.exit(1)
 
+def describe_rows(response, label: str) -> str:
+    """'Found N <label>' using GA4's row count and total rather than the returned page."""
+    total = int(response.totals[0].metric_values[0].value) if response.totals else None
+    found = max(response.row_count, len(response.rows))
+    summary = f"Found {found} {label}"
+    if found > len(response.rows):
+        summary += f", showing the top {len(response.rows)}"
+    if total is not None:
+        summary += f" ({total:,} events in all)"
+    return summary + ":"
+
 def get_content_engagement_data(client):
     """Get content engagement tracking data."""
     print("\n📊 CONTENT ENGAGEMENT TRACKING DATA")
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:category"),
-                Dimension(name="customEvent:interaction_type"),
-                Dimension(name="customEvent:content_piece")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="averageSessionDuration"),
-                Metric(name="engagementRate")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.EXACT,
-                        value="content_engagement"
-                    )
-                )
-            ),
-            limit=20
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, CONTENT_ENGAGEMENT_REPORT))
         
         if not response.rows:
             print("ℹ️  No content engagement events found yet")
             print("💡 Visit a deal page and interact with images/text to generate data")
             return
         
-        print(f"Found {len(response.rows)} content engagement events:")
+        print(describe_rows(response, "content engagement events"))
         print()
         
         for row in response.rows:
@@ -101,38 +132,14 @@ def get_image_engagement_data(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:image_index"),
-                Dimension(name="customEvent:view_duration")
-            ],
-            metrics=[
-                Metric(name="eventCount")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.CONTAINS,
-                        value="image"
-                    )
-                )
-            ),
-            limit=15
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, IMAGE_ENGAGEMENT_REPORT))
         
         if not response.rows:
             print("ℹ️  No image engagement events found yet")
             print("💡 Hover over or click deal images to generate data")
             return
         
-        print(f"Found {len(response.rows)} image engagement events:")
+        print(describe_rows(response, "image engagement events"))
         print()
         
         for row in response.rows:
@@ -157,39 +164,14 @@ def get_section_engagement_data(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:time_in_section"),
-                Dimension(name="customEvent:interaction_count")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.EXACT,
-                        value="section_engagement"
-                    )
-                )
-            ),
-            limit=15
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, SECTION_ENGAGEMENT_REPORT))
         
         if not response.rows:
             print("ℹ️  No section engagement events found yet")
             print("💡 Scroll through deal page sections to generate data")
             return
         
-        print(f"Found {len(response.rows)} section engagement events:")
+        print(describe_rows(response, "section engagement events"))
         print()
         
         for row in response.rows:
@@ -215,38 +197,14 @@ def get_engagement_scores(client):
     print("=" * 60)
     
     try:
-        request = RunReportRequest(
-            property=f"properties/{PROPERTY_ID}",
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="customEvent:slug"),
-                Dimension(name="customEvent:engagement_score"),
-                Dimension(name="customEvent:engagement_quality")
-            ],
-            metrics=[
-                Metric(name="eventCount")
-            ],
-            date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
-            dimension_filter=FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(
-                        match_type=Filter.StringFilter.MatchType.EXACT,
-                        value="engagement_quality_score"
-                    )
-                )
-            ),
-            limit=10
-        )
-        
-        response = client.run_report(request=request)
+        response = client.run_report(request=compile_request(PROPERTY_NAME, ENGAGEMENT_SCORES_REPORT))
         
         if not response.rows:
             print("ℹ️  No engagement scores found yet")
             print("💡 Spend time on deal pages to generate engagement scores")
             return
         
-        print(f"Found {len(response.rows)} engagement scores:")
+        print(describe_rows(response, "engagement scores"))
         print()
         
         for row in response.rows:
@@ -0,0 +1,12 @@
+"""
+Test Setup for the PRTD Analytics Scripts
+Makes prtd_analytics importable and keeps data files out of /home/deploy
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('PRTD_DATA_DIR', tempfile.mkdtemp(prefix='prtd-tests-'))
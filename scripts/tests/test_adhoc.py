@@ -0,0 +1,67 @@
+"""Ad-hoc queries over an exported dataset group, filter and rank like the CLI promises."""
+
+import datetime
+
+import pytest
+
+from prtd_analytics.adhoc import LocalQuery, Measure, parse_filter, parse_measure, parse_order, run_query
+from prtd_analytics.columnar import export_shards
+
+ROWS = [
+    (["20261001", "click_external_deal", "marriott-spa", "hotels"], [5]),
+    (["20261001", "view_item", "marriott-spa", "hotels"], [50]),
+    (["20261002", "click_external_deal", "marriott-golf", "hotels"], [3]),
+    (["20261002", "click_external_deal", "delta-flight", "travel"], [7]),
+    (["20261003", "click_external_deal", "marriott-spa", "hotels"], [2]),
+]
+
+@pytest.fixture
+def root(tmp_path):
+    export_shards("deals", [{
+        "start": "2026-10-01", "end": "2026-10-03",
+        "dimensions": ["date", "eventName", "customEvent:slug", "customEvent:category"],
+        "metrics": ["eventCount"],
+        "rows": ROWS
+    }], root=tmp_path)
+    return tmp_path
+
+def _rows(table):
+    return [tuple(row.values()) for row in table.to_pylist()]
+
+def test_parse_cli_arguments():
+    assert parse_filter("eventName=click_external_deal").match == "exact"
+    assert parse_filter("eventName=view_item, select_item").values == ("view_item", "select_item")
+    assert (parse_filter("slug^=marriott").match, parse_filter("slug^=marriott").values) == ("begins_with", ("marriott",))
+    assert parse_filter("customEvent:slug*=spa").field == "slug"
+    assert parse_measure("max:eventCount") == Measure("eventCount", "max")
+    assert parse_measure("count") == Measure("", "count")
+    assert parse_order("-eventCount").desc and not parse_order("slug").desc
+
+    with pytest.raises(ValueError):
+        parse_filter("no operator here")
+
+def test_group_filter_and_rank(root):
+    query = LocalQuery("deals", group_by=["slug"], filters=[parse_filter("eventName=click_external_deal")],
+                       order_by=[parse_order("-eventCount"), parse_order("slug")])
+
+    assert _rows(run_query(query, root)) == [("delta-flight", 7), ("marriott-spa", 7), ("marriott-golf", 3)]
+
+def test_prefix_filter_date_bounds_order_and_limit(root):
+    query = LocalQuery("deals", group_by=["date"], measures=[Measure("eventCount"), Measure("", "count")],
+                       filters=[parse_filter("slug^=marriott")], since="2026-10-02",
+                       order_by=[parse_order("date")], limit=1)
+
+    assert _rows(run_query(query, root)) == [(datetime.date(2026, 10, 2), 3, 1)]
+
+def test_default_measure_and_in_list_filter(root):
+    query = LocalQuery("deals", group_by=["category"],
+                       filters=[parse_filter("eventName=click_external_deal,view_item")],
+                       order_by=[parse_order("-eventCount")])
+
+    assert _rows(run_query(query, root)) == [("hotels", 60), ("travel", 7)]
+
+def test_unknown_columns_are_reported(root):
+    with pytest.raises(ValueError, match="Unknown column"):
+        run_query(LocalQuery("deals", group_by=["partner"]), root)
+    with pytest.raises(ValueError, match="Cannot order by"):
+        run_query(LocalQuery("deals", group_by=["slug"], order_by=[parse_order("date")]), root)
@@ -0,0 +1,102 @@
+"""Click log entries parse as Node prints them and ingestion resumes where it stopped."""
+
+import datetime
+
+from prtd_analytics.clicklog import ClickLogReader, ClickStore, parse_click
+
+def _minute(iso: str) -> int:
+    return int(datetime.datetime.fromisoformat(iso).replace(tzinfo=datetime.timezone.utc).timestamp()) // 60
+
+ONE_LINE = ("Deal click tracked: { dealId: 'd1', dealSlug: 'marriott-spa', externalUrl: 'https://x.test/?a=1', "
+            "timestamp: '2026-10-01T12:30:15.000Z', clientIp: '10.0.0.1' }\n")
+
+MULTI_LINE = """Deal click tracked: {
+  dealId: 'd2',
+  dealSlug: 'delta-flight',
+  externalUrl: 'https://example.test/book?utm_source=prtd&timestamp=1999-01-01',
+  timestamp: '2026-10-01T12:31:59.000Z',
+  clientIp: undefined,
+  userAgent: "Mozilla/5.0 (it's a browser)"
+}
+"""
+
+def test_parse_single_quoted_fields():
+    click = parse_click(ONE_LINE.split(":", 1)[1])
+
+    assert (click.deal_id, click.slug, click.minute) == ("d1", "marriott-spa", _minute("2026-10-01T12:30:00"))
+
+def test_parse_double_and_backtick_quoted_values():
+    text = """{ dealId: "d'3", dealSlug: `it's "quoted"`, timestamp: '2026-10-01T00:00:00Z' }"""
+
+    click = parse_click(text)
+
+    assert (click.deal_id, click.slug) == ("d'3", 'it\'s "quoted"')
+
+def test_url_cannot_fake_the_timestamp():
+    click = parse_click(MULTI_LINE.split(":", 1)[1])
+
+    assert click.minute == _minute("2026-10-01T12:31:00")
+
+def test_parse_falls_back_to_slug_and_rejects_incomplete_entries():
+    assert parse_click("{ dealId: undefined, dealSlug: 's', timestamp: '2026-10-01T00:00:00Z' }").deal_id == "s"
+    assert parse_click("{ dealId: 'd1' }") is None
+    assert parse_click("{ dealId: 'd1', timestamp: 'yesterday' }") is None
+
+def test_reader_skips_other_output_and_reads_multi_line_entries(tmp_path):
+    log = tmp_path / "app.log"
+    log.write_text("ready on :3000\n" + ONE_LINE + "GET /deals 200\n" + MULTI_LINE)
+
+    clicks = list(ClickLogReader(str(log)))
+
+    assert [c.deal_id for c in clicks] == ["d1", "d2"]
+
+def test_reader_leaves_an_unfinished_entry_for_next_time(tmp_path):
+    log = tmp_path / "app.log"
+    partial = MULTI_LINE[:MULTI_LINE.index("  clientIp")]
+    log.write_text(ONE_LINE + partial)
+
+    reader = ClickLogReader(str(log))
+    assert [c.deal_id for c in reader] == ["d1"]
+    assert reader.offset == len(ONE_LINE)
+
+    log.write_text(ONE_LINE + MULTI_LINE)
+    resumed = ClickLogReader(str(log), reader.offset)
+    assert [c.deal_id for c in resumed] == ["d2"]
+
+def test_store_resumes_from_its_offset_and_survives_truncation(tmp_path):
+    log = tmp_path / "app.log"
+    store = ClickStore(str(tmp_path / "clicks.sqlite"))
+
+    log.write_text(ONE_LINE + ONE_LINE)
+    assert store.ingest(str(log))["clicks"] == 2
+
+    with open(log, "a") as f:
+        f.write(MULTI_LINE)
+    assert store.ingest(str(log))["clicks"] == 1
+    assert store.ingest(str(log))["clicks"] == 0
+
+    # copytruncate: the file shrinks in place and is read from the start
+    log.write_text(ONE_LINE)
+    result = store.ingest(str(log))
+    assert result["truncated"] and result["clicks"] == 1
+
+    since = datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc)
+    until = since + datetime.timedelta(days=1)
+    assert store.top_deals(since, until) == [("d1", "marriott-spa", 3), ("d2", "delta-flight", 1)]
+    store.close()
+
+def test_store_finishes_a_rotated_log_before_the_new_one(tmp_path):
+    log = tmp_path / "app.log"
+    store = ClickStore(str(tmp_path / "clicks.sqlite"))
+
+    log.write_text(ONE_LINE)
+    store.ingest(str(log))
+    with open(log, "a") as f:
+        f.write(ONE_LINE)
+    log.rename(tmp_path / "app.log.1")
+    log.write_text(MULTI_LINE)
+
+    result = store.ingest(str(log))
+
+    assert result["rotated"] and result["clicks"] == 2
+    store.close()
@@ -0,0 +1,71 @@
+"""Report specs compile to the request protos GA4 expects."""
+
+import pytest
+
+from google.analytics.data_v1beta.types import RunRealtimeReportRequest, RunReportRequest
+
+from prtd_analytics.query import (
+    FilterSpec,
+    ReportSpec,
+    canonical_hash,
+    compile_request,
+    descending,
+    event_filter,
+    field_filter,
+    realtime_report,
+    report
+)
+
+def test_standard_report_compiles_range_filters_order_and_totals():
+    spec = report(["eventName", "customEvent:slug"], ["eventCount"], days_back=14,
+                  filters=[event_filter("view_item"), field_filter("customEvent:slug", "marriott", "begins_with")],
+                  limit=10, order_by=[descending("eventCount")], aggregations=["total"])
+
+    request = compile_request("properties/1", spec)
+
+    assert isinstance(request, RunReportRequest)
+    assert [d.name for d in request.dimensions] == ["eventName", "customEvent:slug"]
+    assert (request.date_ranges[0].start_date, request.date_ranges[0].end_date) == ("14daysAgo", "today")
+    assert request.limit == 10
+    expressions = request.dimension_filter.and_group.expressions
+    assert expressions[0].filter.string_filter.value == "view_item"
+    assert expressions[1].filter.string_filter.match_type.name == "BEGINS_WITH"
+    assert request.order_bys[0].metric.metric_name == "eventCount"
+    assert request.order_bys[0].desc
+    assert [a.name for a in request.metric_aggregations] == ["TOTAL"]
+
+def test_dimension_order_and_in_list_filter():
+    spec = report(["date"], ["eventCount"], filters=[event_filter("view_item", "select_item")],
+                  order_by=[descending("date")])
+
+    request = compile_request("properties/1", spec)
+
+    assert list(request.dimension_filter.filter.in_list_filter.values) == ["view_item", "select_item"]
+    assert request.order_bys[0].dimension.dimension_name == "date"
+
+def test_realtime_report_uses_minute_range():
+    request = compile_request("properties/1", realtime_report(["country"], ["activeUsers"], minutes_back=5))
+
+    assert isinstance(request, RunRealtimeReportRequest)
+    assert (request.minute_ranges[0].start_minutes_ago, request.minute_ranges[0].end_minutes_ago) == (5, 0)
+
+def test_compiled_requests_are_memoized():
+    spec = report(["eventName"], ["eventCount"])
+
+    assert compile_request("properties/1", spec) is compile_request("properties/1", report(["eventName"], ["eventCount"]))
+
+def test_canonical_hash_ignores_in_list_order():
+    first = report(["eventName"], ["eventCount"], filters=[event_filter("a", "b")])
+    second = report(["eventName"], ["eventCount"], filters=[event_filter("b", "a")])
+
+    assert canonical_hash("properties/1", first) == canonical_hash("properties/1", second)
+    assert canonical_hash("properties/1", first) != canonical_hash("properties/2", first)
+
+@pytest.mark.parametrize("build", [
+    lambda: FilterSpec("eventName", ("a",), match="fuzzy"),
+    lambda: FilterSpec("eventName", ("a", "b")),
+    lambda: ReportSpec(["eventName"], ["eventCount"], aggregations=["median"]),
+])
+def test_invalid_specs_are_rejected(build):
+    with pytest.raises(ValueError):
+        build()
@@ -0,0 +1,79 @@
+"""GA4 and first-party clicks line up per deal and UTC hour."""
+
+import datetime
+
+from google.analytics.data_v1beta.types import DimensionValue, MetricValue, Row, RunReportResponse
+
+from prtd_analytics.clicklog import ClickStore
+from prtd_analytics.reconcile import RECONCILE_SQL, ClickReconciler, SCHEMA
+
+HOUR = 490000        # an arbitrary UTC epoch hour
+
+def _store(tmp_path, server_clicks):
+    """A click store with (minute, deal_id, clicks) rows and the reconcile tables."""
+    store = ClickStore(str(tmp_path / "clicks.sqlite"))
+    store.conn.executescript(SCHEMA)
+    store.conn.executemany("INSERT INTO click_counts (minute, deal_id, slug, clicks) VALUES (?, ?, '', ?)",
+                           server_clicks)
+    return store
+
+def _reconciled(conn):
+    return conn.execute("SELECT hour, deal_id, server_clicks, ga4_clicks FROM click_reconciliation "
+                        "ORDER BY hour, deal_id").fetchall()
+
+def test_sql_joins_both_sides_and_keeps_one_sided_rows(tmp_path):
+    store = _store(tmp_path, [
+        (HOUR * 60 + 5, "a", 2), (HOUR * 60 + 59, "a", 1),   # two minutes of one hour
+        (HOUR * 60 + 10, "b", 4),                              # no GA4 clicks
+        ((HOUR + 1) * 60, "a", 1),
+    ])
+    store.conn.executemany("INSERT INTO ga4_clicks (hour, deal_id, clicks) VALUES (?, ?, ?)", [
+        (HOUR, "a", 2), (HOUR, "c", 5),                        # c has no server clicks
+        (HOUR + 1, "a", 1),
+    ])
+
+    store.conn.execute(RECONCILE_SQL, {"start": HOUR, "end": HOUR + 2})
+
+    assert _reconciled(store.conn) == [
+        (HOUR, "a", 3, 2), (HOUR, "b", 4, 0), (HOUR, "c", 0, 5), (HOUR + 1, "a", 1, 1),
+    ]
+
+def test_sql_only_touches_the_requested_hours(tmp_path):
+    store = _store(tmp_path, [((HOUR - 1) * 60, "a", 1), (HOUR * 60, "a", 1), ((HOUR + 1) * 60, "a", 1)])
+    store.conn.executemany("INSERT INTO ga4_clicks (hour, deal_id, clicks) VALUES (?, ?, ?)",
+                           [(HOUR - 1, "z", 1), (HOUR + 1, "z", 1)])
+
+    store.conn.execute(RECONCILE_SQL, {"start": HOUR, "end": HOUR + 1})
+
+    assert _reconciled(store.conn) == [(HOUR, "a", 1, 0)]
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def run_report(self, request):
+        return RunReportResponse(
+            rows=[Row(dimension_values=[DimensionValue(value=v) for v in dims],
+                      metric_values=[MetricValue(value=str(clicks))]) for dims, clicks in self.rows],
+            row_count=len(self.rows)
+        )
+
+def test_run_converts_property_hours_and_summarises_loss(tmp_path):
+    # 14:00 UTC on 2026-10-01 is 10:00 in Puerto Rico (UTC-4, no DST)
+    hour = int(datetime.datetime(2026, 10, 1, 14, tzinfo=datetime.timezone.utc).timestamp()) // 3600
+    store = _store(tmp_path, [(hour * 60 + 1, "a", 10), (hour * 60 + 2, "b", 1)])
+    client = FakeClient([(("2026100110", "a"), 8), (("2026100110", "b"), 2), (("2026100110", "(not set)"), 3)])
+    reconciler = ClickReconciler(client, "properties/1", store, timezone="America/Puerto_Rico")
+    now = datetime.datetime.fromtimestamp((hour + 25) * 3600, datetime.timezone.utc)
+
+    result = reconciler.run(now=now, since=datetime.datetime.fromtimestamp(hour * 3600, datetime.timezone.utc))
+
+    assert result["hours"] == 1 and result["unattributed_ga4_clicks"] == 3
+    assert _reconciled(store.conn) == [(hour, "a", 10, 8), (hour, "b", 1, 2)]
+    assert reconciler.watermark() == hour + 1
+
+    summary = reconciler.summary(days=2, now=now)
+    assert summary["overall"] == {"server_clicks": 11, "ga4_clicks": 10, "missed_by_ga4": 2,
+                                  "ga4_only": 1, "loss_rate": 18.2}
+    assert summary["deals"]["a"]["loss_rate"] == 20.0
+    store.close()
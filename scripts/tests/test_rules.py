@@ -0,0 +1,69 @@
+"""Threshold rules fire on the right side of each bound and rank critical first."""
+
+import json
+
+import numpy as np
+import pytest
+
+from prtd_analytics.rules import HealthThreshold, RuleSet, event_metrics, load_rules
+
+RULES = {
+    "low_traffic": HealthThreshold("core.total_events", min_value=100, critical_min=10,
+                                   warning_message="Low traffic", critical_message="No traffic"),
+    "click_spike": HealthThreshold("funnel.click_rate", max_value=50, warning_message="Click rate spike"),
+    "no_views": HealthThreshold("events.view_item", critical_min=1),
+}
+
+def test_levels_per_bound():
+    rules = RuleSet(RULES)
+
+    assert rules.evaluate({"core.total_events": 500, "funnel.click_rate": 10, "events.view_item": 5}) == []
+
+    warning, = rules.evaluate({"core.total_events": 50})
+    assert (warning["rule"], warning["level"], warning["threshold"]) == ("low_traffic", "warning", 100)
+    assert warning["message"] == "Low traffic (50, below 100)"
+
+    spike, = rules.evaluate({"funnel.click_rate": 75})
+    assert spike["message"] == "Click rate spike (75, above 50)"
+
+def test_critical_violations_come_first_with_their_own_message():
+    violations = RuleSet(RULES).evaluate({"funnel.click_rate": 75, "core.total_events": 5, "events.view_item": 0})
+
+    assert [(v["rule"], v["level"]) for v in violations] == [
+        ("low_traffic", "critical"), ("no_views", "critical"), ("click_spike", "warning"),
+    ]
+    assert violations[0]["message"] == "No traffic (5, below 10)"
+    # Without messages, the metric name stands in
+    assert violations[1]["message"] == "events.view_item (0, below 1)"
+
+def test_missing_metrics_never_fire_unless_given_a_default():
+    rules = RuleSet(RULES)
+
+    assert rules.evaluate({}) == []
+    assert {v["rule"] for v in rules.evaluate({}, missing=0.0)} == {"low_traffic", "no_views"}
+
+def test_frame_evaluates_many_rows_at_once():
+    rules = RuleSet(RULES)
+    frame = rules.frame([{"core.total_events": 500}, {"core.total_events": 50}, {"core.total_events": 5}])
+
+    levels = rules.evaluate_frame(frame)[:, rules.names.index("low_traffic")]
+
+    assert levels.tolist() == [0, 1, 2]
+    assert np.isnan(frame[0, rules.metric_index["funnel.click_rate"]])
+
+def test_empty_rule_set():
+    assert RuleSet({}).evaluate({"core.total_events": 0}) == []
+
+def test_event_metrics_names():
+    assert event_metrics({"view_item": 3}) == {"events.view_item": 3}
+
+def test_load_rules_rejects_unknown_fields(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"health": {"typo": {"metric_name": "x", "min": 1}}}))
+
+    with pytest.raises(ValueError, match="unknown fields: min"):
+        load_rules("health", path)
+
+def test_shipped_rules_file_loads():
+    for section in ("health", "realtime"):
+        RuleSet.load(section)
@@ -0,0 +1,110 @@
+"""Exact fetches merge partitions, honour limits and keep aggregates."""
+
+import datetime
+
+from google.analytics.data_v1beta.types import DimensionValue, MetricValue, Row, RunReportResponse
+
+from prtd_analytics.query import PAGE_SIZE, descending, event_filter, report
+from prtd_analytics.sampling import ExactFetcher, _aggregate, _merge, split_by_date, split_by_event
+
+def _row(dimensions, metrics):
+    return Row(dimension_values=[DimensionValue(value=d) for d in dimensions],
+               metric_values=[MetricValue(value=str(m)) for m in metrics])
+
+class FakeClient:
+    """Serves `population` rows with offset/limit paging; reports over `sampled_range` are sampled."""
+
+    def __init__(self, population, sampled_range=None):
+        self.population = population
+        self.sampled_range = sampled_range
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(request)
+        end = request.offset + (request.limit or len(self.population))
+        date_range = (request.date_ranges[0].start_date, request.date_ranges[0].end_date)
+        metadata = {}
+        if date_range == self.sampled_range:
+            metadata = {"sampling_metadatas": [{"samples_read_count": 1, "sampling_space_size": 10}]}
+        return RunReportResponse(
+            rows=[_row(*row) for row in self.population[request.offset:end]],
+            row_count=len(self.population),
+            metadata=metadata,
+            totals=[_row([], [sum(m[0] for _, m in self.population)])] if request.metric_aggregations else []
+        )
+
+def test_merge_sums_metrics_of_matching_dimension_values():
+    merged = _merge({}, [_row(["a", "x"], [1, 2]), _row(["b", "x"], [5, 0])])
+    _merge(merged, [_row(["a", "x"], [3, 4]), _row(["c", "y"], [1.5, 1])])
+
+    assert merged == {("a", "x"): [4, 6], ("b", "x"): [5, 0], ("c", "y"): [1.5, 1]}
+
+def test_aggregate_recomputes_from_merged_rows():
+    rows = [(("a",), [4, 6]), (("b",), [5, 0])]
+
+    assert _aggregate(rows, ("total", "maximum", "minimum", "count")) == {
+        "total": [9, 6], "maximum": [5, 6], "minimum": [4, 0], "count": [2, 2]
+    }
+    assert _aggregate([], ("total",)) == {"total": []}
+
+def test_split_by_date_covers_the_range_without_gaps():
+    spec = report(["date", "eventName"], ["eventCount"], days_back=9)
+
+    pieces = split_by_date(spec, today=datetime.date(2026, 10, 10))
+
+    assert [p.date_range for p in pieces] == [
+        ("2026-10-01", "2026-10-02"), ("2026-10-03", "2026-10-05"),
+        ("2026-10-06", "2026-10-07"), ("2026-10-08", "2026-10-10"),
+    ]
+
+def test_user_metrics_without_date_are_not_split_by_date():
+    assert split_by_date(report(["eventName"], ["totalUsers"])) == []
+
+def test_split_by_event_pins_one_event_per_partition():
+    spec = report(["eventName"], ["eventCount"], filters=[event_filter("a", "b")])
+
+    pieces = split_by_event(spec, ["a", "b"])
+
+    assert [p.filters[-1].values for p in pieces] == [("a",), ("b",)]
+
+def test_limited_spec_stops_paging_at_its_limit():
+    client = FakeClient([([f"r{i}"], [i]) for i in range(50)])
+    spec = report(["x"], ["eventCount"], limit=12, order_by=[descending("eventCount")])
+
+    result = ExactFetcher(client, "properties/1", page_size=5).run(spec)
+
+    assert len(result.rows) == 12
+    assert [r.limit for r in client.requests] == [5, 5, 2]
+
+def test_unlimited_spec_pages_through_everything():
+    client = FakeClient([([f"r{i}"], [i]) for i in range(12)])
+
+    result = ExactFetcher(client, "properties/1", page_size=5).run(report(["x"], ["eventCount"]))
+
+    assert len(result.rows) == 12
+    assert result.exact and result.partitions == 1
+
+def test_split_report_merges_partitions_and_reapplies_top_n_and_totals():
+    population = [([f"2026100{d}", "view_item"], [d]) for d in range(1, 5)]
+    client = FakeClient(population, sampled_range=("3daysAgo", "today"))
+    spec = report(["date", "eventName"], ["eventCount"], days_back=3, limit=2,
+                  order_by=[descending("eventCount")], aggregations=["total"])
+
+    result = ExactFetcher(client, "properties/1").run(spec)
+
+    # Each of the four one-day partitions returns the whole fake population
+    assert result.partitions == 4
+    assert result.rows == [(("20261004", "view_item"), [16]), (("20261003", "view_item"), [12])]
+    assert result.aggregates == {"total": [40]}
+    # Partitions are fetched whole, not cut at the spec's limit
+    assert all(r.limit == PAGE_SIZE for r in client.requests[1:])
+    assert result.to_response().totals[0].metric_values[0].value == "40"
+
+def test_unsplit_report_keeps_ga4_totals():
+    client = FakeClient([([f"r{i}"], [i]) for i in range(10)])
+    spec = report(["x"], ["eventCount"], limit=3, aggregations=["total"])
+
+    result = ExactFetcher(client, "properties/1").run(spec)
+
+    assert len(result.rows) == 3
+    assert result.aggregates == {"total": [45]}
@@ -0,0 +1,103 @@
+"""Sketch estimates stay within their documented error bounds."""
+
+import datetime
+import random
+from collections import Counter
+
+import pytest
+
+from prtd_analytics.sketches import HyperLogLog, SpaceSaving
+from prtd_analytics.uniques import DistinctCounters, load_day, save_day
+
+def _skewed_stream(n: int, keys: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [f"/deal/{int(rng.paretovariate(1.2)) % keys}" for _ in range(n)]
+
+def test_space_saving_counts_bound_the_truth():
+    stream = _skewed_stream(20000, 2000)
+    truth = Counter(stream)
+    sketch = SpaceSaving(capacity=64)
+    for key in stream:
+        sketch.add(key)
+
+    assert len(sketch) == 64 and sketch.total == len(stream)
+    for key, count in sketch.counts.items():
+        assert count - sketch.error(key) <= truth[key] <= count
+        assert sketch.error(key) <= sketch.total / sketch.capacity
+
+    # Anything heavier than total/capacity is guaranteed to be kept
+    for key, count in truth.items():
+        if count > sketch.total / sketch.capacity:
+            assert key in sketch.counts
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = SpaceSaving(capacity=8)
+    sketch.update({"a": 5, "b": 3})
+    sketch.add("a", 2)
+
+    assert sketch.top(2) == [("a", 7), ("b", 3)]
+    assert sketch.error("a") == 0 and sketch.min_count() == 0
+
+def test_space_saving_merge_keeps_bounds():
+    first, second = _skewed_stream(5000, 500, seed=1), _skewed_stream(5000, 500, seed=2)
+    truth = Counter(first + second)
+    a, b = SpaceSaving(32), SpaceSaving(32)
+    for key in first:
+        a.add(key)
+    for key in second:
+        b.add(key)
+
+    merged = a.merge(b)
+
+    assert merged.total == 10000 and len(merged) <= 32
+    for key, count in merged.counts.items():
+        assert count - merged.error(key) <= truth[key] <= count
+
+def test_space_saving_round_trips():
+    sketch = SpaceSaving(4)
+    for key in "abcabcadeff":
+        sketch.add(key)
+
+    restored = SpaceSaving.from_dict(sketch.to_dict())
+
+    assert restored.summary(4) == sketch.summary(4)
+    restored.add("z")
+    assert restored.total == sketch.total + 1
+
+@pytest.mark.parametrize("distinct", [10, 1000, 50000])
+def test_hyperloglog_estimate_within_four_standard_errors(distinct):
+    sketch = HyperLogLog()
+    for i in range(distinct):
+        sketch.add(f"click-{i}")
+        sketch.add(f"click-{i}")       # repeats never add to the count
+
+    # 2^11 registers: about 2.3% standard error
+    assert abs(sketch.estimate() - distinct) <= max(1, 4 * 0.023 * distinct)
+
+def test_hyperloglog_merge_is_the_union():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(f"click-{i}" for i in range(0, 3000))
+    b.update(f"click-{i}" for i in range(2000, 5000))
+
+    union = a.merge(b)
+
+    assert abs(union.estimate() - 5000) <= 4 * 0.023 * 5000
+    assert HyperLogLog.from_dict(union.to_dict()).registers == union.registers
+    with pytest.raises(ValueError):
+        a.merge(HyperLogLog(precision=10))
+
+def test_daily_counters_merge_across_runs(tmp_path):
+    day = datetime.date(2026, 10, 1)
+    first, second = DistinctCounters(), DistinctCounters()
+    for i in range(300):
+        first.add(f"click-{i}", deals="d1", partners="marriott")
+    for i in range(200, 400):
+        second.add(f"click-{i}", deals="d2", partners="marriott")
+
+    save_day(first, day, tmp_path)
+    estimates = save_day(second, day, tmp_path)
+
+    assert abs(estimates["total"] - 400) <= 4 * 0.023 * 400
+    assert abs(estimates["partners"]["marriott"] - 400) <= 4 * 0.023 * 400
+    assert set(estimates["deals"]) == {"d1", "d2"}
+    assert load_day(day, tmp_path).estimates() == estimates
@@ -5,19 +5,19 @@ Validates GA4 tracking implementation via direct API calls
 """
 
 import os
-import json
 import datetime
 from pathlib import Path
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    RunReportRequest,
-    RunRealtimeReportRequest,
-    Dimension,
-    Metric,
-    DateRange,
-    MinuteRange
-)
-from google.oauth2 import service_account
+from prtd_analytics.auth import load_credentials
+from prtd_analytics.transport import create_data_client
+from prtd_analytics.metadata import validated_client
+from prtd_analytics.query import compile_request, realtime_report
+from prtd_analytics.history import record_report
+from prtd_analytics.attribution import AttributionLedger
+from prtd_analytics.metrics import DAYS_BACK, MetricsSnapshot, get_metrics_core
+from prtd_analytics.writer import get_writer
+
+DEAL_EVENTS = ('view_item', 'select_item', 'click_external_deal')
+PARTNER_EVENTS = ('click_external_deal', 'conversion')
 
 class PRTDAnalyticsValidator:
     def __init__(self, property_id: str, credentials_path: str):
@@ -26,13 +26,20 @@ class PRTDAnalyticsValidator:
         self.property_name = f"properties/{property_id}"
         
         # Set up credentials
-        credentials = service_account.Credentials.from_service_account_file(
+        credentials = load_credentials(
             credentials_path,
             scopes=['https://www.googleapis.com/auth/analytics.readonly']
         )
         
         # Initialize the client
-        self.client = BetaAnalyticsDataClient(credentials=credentials)
+        self.client = validated_client(create_data_client(credentials))
+        
+        # Shared with the health checker; whichever runs first fetches
+        self.metrics_core = get_metrics_core()
+    
+    def _snapshot(self, days_back: int) -> MetricsSnapshot:
+        """Event, funnel and attribution data for the window, fetched at most once per run."""
+        return self.metrics_core.get(self.client, self.property_name, days_back)
     
     def validate_core_events(self, days_back: int = 7) -> dict:
         """Validate core tracking events are firing."""
@@ -50,25 +57,9 @@ class PRTDAnalyticsValidator:
             'generate_lead'
         ]
         
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="eventCountPerUser")
-            ],
-            date_ranges=[DateRange(
-                start_date=f"{days_back}daysAgo",
-                end_date="today"
-            )],
-            dimension_filter=self._create_event_filter(expected_events)
-        )
-        
         try:
-            response = self.client.run_report(request=request)
-            return self._process_event_validation(response, expected_events)
+            event_counts = self._snapshot(days_back).event_counts(expected_events)
+            return self._process_event_validation(event_counts, expected_events)
         except Exception as e:
             return {"error": f"Failed to validate events: {str(e)}"}
     
@@ -76,26 +67,8 @@ class PRTDAnalyticsValidator:
         """Validate deal-specific tracking metrics."""
         print(f"📊 Validating deal tracking for last {days_back} days...")
         
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers"),
-                Metric(name="eventValue")
-            ],
-            date_ranges=[DateRange(
-                start_date=f"{days_back}daysAgo",
-                end_date="today"
-            )],
-            dimension_filter=self._create_deal_filter()
-        )
-        
         try:
-            response = self.client.run_report(request=request)
-            return self._process_deal_validation(response)
+            return self._process_deal_validation(self._snapshot(days_back).event_counts(DEAL_EVENTS))
         except Exception as e:
             return {"error": f"Failed to validate deal tracking: {str(e)}"}
     
@@ -105,30 +78,19 @@ class PRTDAnalyticsValidator:
         
         try:
             # First call: Get global metrics without dimensions
-            global_request = RunRealtimeReportRequest(
-                property=self.property_name,
-                dimensions=[],
-                metrics=[
-                    Metric(name="activeUsers"),
-                    Metric(name="eventCount")
-                ],
-                minute_ranges=[MinuteRange(start_minutes_ago=29, end_minutes_ago=0)]
+            global_spec = realtime_report(dimensions=[], metrics=["activeUsers", "eventCount"])
+            global_response = self.client.run_realtime_report(
+                request=compile_request(self.property_name, global_spec)
             )
-            global_response = self.client.run_realtime_report(request=global_request)
             
             # Second call: Get breakdown by country/device
-            breakdown_request = RunRealtimeReportRequest(
-                property=self.property_name,
-                dimensions=[
-                    Dimension(name="country"),
-                    Dimension(name="deviceCategory")
-                ],
-                metrics=[
-                    Metric(name="activeUsers")
-                ],
-                minute_ranges=[MinuteRange(start_minutes_ago=29, end_minutes_ago=0)]
+            breakdown_spec = realtime_report(
+                dimensions=["country", "deviceCategory"],
+                metrics=["activeUsers"]
+            )
+            breakdown_response = self.client.run_realtime_report(
+                request=compile_request(self.property_name, breakdown_spec)
             )
-            breakdown_response = self.client.run_realtime_report(request=breakdown_request)
             
             return self._process_realtime_data(global_response, breakdown_response)
         except Exception as e:
@@ -138,107 +100,31 @@ class PRTDAnalyticsValidator:
         """Validate the conversion funnel: View → Click → External Click."""
         print(f"🔄 Validating conversion funnel for last {days_back} days...")
         
-        funnel_events = ['view_item', 'select_item', 'click_external_deal']
-        
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName")
-            ],
-            metrics=[
-                Metric(name="eventCount"),
-                Metric(name="totalUsers")
-            ],
-            date_ranges=[DateRange(
-                start_date=f"{days_back}daysAgo",
-                end_date="today"
-            )],
-            dimension_filter=self._create_event_filter(funnel_events)
-        )
-        
         try:
-            response = self.client.run_report(request=request)
-            return self._process_funnel_validation(response)
+            snapshot = self._snapshot(days_back)
+            result = self._process_funnel_validation(snapshot.funnel())
         except Exception as e:
             return {"error": f"Failed to validate conversion funnel: {str(e)}"}
+        
+        # Per-deal breakdown is informational; its failure must not hide the site-wide funnel
+        try:
+            result["deal_funnel"] = snapshot.deal_funnel().summary()
+        except Exception as e:
+            result["deal_funnel"] = {"error": f"Failed to build per-deal funnel: {str(e)}"}
+        return result
     
     def validate_partner_attribution(self, days_back: int = 7) -> dict:
         """Validate partner attribution tracking."""
         print(f"🤝 Validating partner attribution for last {days_back} days...")
         
-        request = RunReportRequest(
-            property=self.property_name,
-            dimensions=[
-                Dimension(name="eventName"),
-                Dimension(name="sourceMedium")
-            ],
-            metrics=[
-                Metric(name="eventCount")
-            ],
-            date_ranges=[DateRange(
-                start_date=f"{days_back}daysAgo",
-                end_date="today"
-            )],
-            dimension_filter=self._create_partner_filter()
-        )
-        
         try:
-            response = self.client.run_report(request=request)
-            return self._process_partner_validation(response)
+            return self._process_partner_validation(self._snapshot(days_back).attribution())
         except Exception as e:
             return {"error": f"Failed to validate partner attribution: {str(e)}"}
     
-    def _create_event_filter(self, events: list):
-        """Create filter for specific events."""
-        from google.analytics.data_v1beta.types import FilterExpression, Filter, FilterExpressionList
-        
-        if len(events) == 1:
-            return FilterExpression(
-                filter=Filter(
-                    field_name="eventName",
-                    string_filter=Filter.StringFilter(value=events[0])
-                )
-            )
-        
-        # Multiple events - use OR filter
-        expressions = []
-        for event in events:
-            expressions.append(
-                FilterExpression(
-                    filter=Filter(
-                        field_name="eventName",
-                        string_filter=Filter.StringFilter(value=event)
-                    )
-                )
-            )
-        
-        return FilterExpression(
-            or_group=FilterExpressionList(
-                expressions=expressions
-            )
-        )
-    
-    def _create_deal_filter(self):
-        """Create filter for deal-related events."""
-        deal_events = ['view_item', 'select_item', 'click_external_deal']
-        return self._create_event_filter(deal_events)
-    
-    def _create_partner_filter(self):
-        """Create filter for partner attribution events."""
-        return self._create_event_filter(['click_external_deal', 'conversion'])
-    
-    def _process_event_validation(self, response, expected_events: list) -> dict:
-        """Process event validation response."""
-        found_events = set()
-        event_counts = {}
-        
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            event_count = int(row.metric_values[0].value)
-            
-            found_events.add(event_name)
-            event_counts[event_name] = event_counts.get(event_name, 0) + event_count
-        
+    def _process_event_validation(self, event_counts: dict, expected_events: list) -> dict:
+        """Process event validation counts."""
+        found_events = set(event_counts)
         missing_events = set(expected_events) - found_events
         
         return {
@@ -251,18 +137,8 @@ class PRTDAnalyticsValidator:
             "summary": f"Found {len(found_events)}/{len(expected_events)} expected events"
         }
     
-    def _process_deal_validation(self, response) -> dict:
+    def _process_deal_validation(self, deal_events: dict) -> dict:
         """Process deal tracking validation."""
-        deal_events = {}
-        total_events = 0
-        
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            event_count = int(row.metric_values[0].value)
-            
-            total_events += event_count
-            deal_events[event_name] = event_count
-        
         # Check for deal-specific events
         deal_specific_events = ['view_item', 'select_item', 'click_external_deal', 'conversion']
         deal_event_count = sum(deal_events.get(event, 0) for event in deal_specific_events)
@@ -305,70 +181,38 @@ class PRTDAnalyticsValidator:
             "status": "🟢 ACTIVE" if global_users > 0 else "🔴 INACTIVE"
         }
     
-    def _process_funnel_validation(self, response) -> dict:
+    def _process_funnel_validation(self, funnel: dict) -> dict:
         """Process conversion funnel validation."""
-        funnel_events = {}
-        
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            event_count = int(row.metric_values[0].value)
-            users = int(row.metric_values[1].value)
-            
-            funnel_events[event_name] = {
-                "events": event_count,
-                "users": users
-            }
-        
-        # Calculate funnel conversion rates
-        view_item = funnel_events.get('view_item', {}).get('events', 0)
-        select_item_events = funnel_events.get('select_item', {}).get('events', 0)
-        external_click = funnel_events.get('click_external_deal', {}).get('events', 0)
-
-        click_rate = (select_item_events / view_item * 100) if view_item > 0 else 0
-        conversion_rate = (external_click / view_item * 100) if view_item > 0 else 0
-        
         return {
-            "funnel_data": funnel_events,
-            "click_rate": f"{click_rate:.1f}%",
-            "conversion_rate": f"{conversion_rate:.1f}%",
-            "validation_status": "✅ PASS" if view_item > 0 else "❌ FAIL"
+            "funnel_data": funnel["funnel_data"],
+            "click_rate": f"{funnel['click_rate']:.1f}%",
+            "conversion_rate": f"{funnel['conversion_rate']:.1f}%",
+            "validation_status": "✅ PASS" if funnel["view_item_events"] > 0 else "❌ FAIL"
         }
     
-    def _process_partner_validation(self, response) -> dict:
+    def _process_partner_validation(self, ledger: AttributionLedger) -> dict:
         """Process partner attribution validation."""
-        source_data = {}
-        total_attributed_events = 0
-        
-        for row in response.rows:
-            event_name = row.dimension_values[0].value
-            source_medium = row.dimension_values[1].value
-            events = int(row.metric_values[0].value)
-            
-            total_attributed_events += events
-            
-            if source_medium not in source_data:
-                source_data[source_medium] = {
-                    "total_events": 0,
-                    "events": {}
-                }
-            
-            source_data[source_medium]["total_events"] += events
-            source_data[source_medium]["events"][event_name] = events
-        
-        # Look for PRTD/partner specific tracking
-        partner_sources = {k: v for k, v in source_data.items() if 'prtd' in k.lower() or 'partner' in k.lower()}
+        attribution = ledger.summary(events=PARTNER_EVENTS)
+        total_attributed_events = attribution["total_events"]
         
         return {
-            "source_attribution": source_data,
-            "partner_sources": partner_sources,
+            "source_attribution": attribution["source_medium"],
+            "partner_sources": attribution["prtd_sources"],
+            "partners": attribution["partners"],
+            "campaigns": attribution["campaigns"],
             "total_attributed_events": total_attributed_events,
+            "data_quality": attribution["data_quality"],
             "validation_status": "✅ PASS" if total_attributed_events > 0 else "⚠️  WARNING"
         }
 
-    def run_full_validation(self) -> dict:
-        """Run complete validation suite."""
+    def run_full_validation(self, fresh: bool = False) -> dict:
+        """Run complete validation suite; `fresh` refetches the shared snapshot."""
         print("🚀 Starting PRTD Analytics Validation Suite...\n")
         
+        if fresh:
+            # The validations below then read the snapshot fetched here
+            self.metrics_core.get(self.client, self.property_name, DAYS_BACK, refresh=True)
+        
         results = {
             "timestamp": datetime.datetime.now().isoformat(),
             "property_id": self.property_id,
@@ -431,6 +275,12 @@ class PRTDAnalyticsValidator:
         if funnel and 'conversion_rate' in funnel:
             print(f"  Conversion Rate: {funnel['conversion_rate']}")
         
+        underperformers = funnel.get('deal_funnel', {}).get('underperformers', [])
+        if underperformers:
+            print(f"\n📉 Deals converting far below their category:")
+            for deal in underperformers[:5]:
+                print(f"  {deal['deal']}: {deal['conversion_rate']}% vs {deal['category_rate']}% ({deal['category']})")
+        
         # Action items
         missing_events = core_events.get('missing_events', [])
         if missing_events:
@@ -467,8 +317,10 @@ def main():
     
     # Save results
     output_file = f"/home/deploy/prtd/analytics-validation-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    output_file = get_writer().submit(
+        output_file, results,
+        on_written=lambda path, report: record_report("validation", report, path)
+    )
     
     print(f"\n📁 Detailed results saved to: {output_file}")
 